@@ -0,0 +1,64 @@
+import re
+from html.parser import HTMLParser
+from typing import List
+
+# Comments the model leaves in place of code it didn't write
+PLACEHOLDER_RE = re.compile(
+    r"\.\.\.|\brest of\b|\badd more\b|\bTODO\b|\bsimilar (items|content|cards|rows)\b",
+    re.IGNORECASE,
+)
+
+
+class _DraftParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.tags: set[str] = set()
+        self.script_chars = 0
+        self.placeholder_comments: List[str] = []
+        self._in_script = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.tags.add(tag)
+        self._in_script = tag == "script"
+        if tag == "script" and any(name == "src" for name, _ in attrs):
+            # An external script counts as code too
+            self.script_chars += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "script":
+            self._in_script = False
+
+    def handle_data(self, data: str) -> None:
+        if self._in_script:
+            self.script_chars += len(data.strip())
+            # JavaScript comments aren't parsed as HTML comments
+            for comment in re.findall(r"//[^\n]*|/\*.*?\*/", data, re.DOTALL):
+                if PLACEHOLDER_RE.search(comment):
+                    self.placeholder_comments.append(comment.strip())
+
+    def handle_comment(self, data: str) -> None:
+        if PLACEHOLDER_RE.search(data):
+            self.placeholder_comments.append(data.strip())
+
+
+def find_draft_problems(html: str) -> List[str]:
+    """Reasons a generated app is clearly unfinished; empty if it looks complete.
+
+    Cheap structural checks only: a complete document (not cut off by the
+    token limit), some JavaScript (video apps must be interactive), and no
+    placeholder comments standing in for omitted code.
+    """
+    problems: List[str] = []
+    if not re.search(r"</html>\s*$", html, re.IGNORECASE):
+        problems.append("document is incomplete (no closing </html>)")
+
+    parser = _DraftParser()
+    parser.feed(html)
+    parser.close()
+    if "body" not in parser.tags:
+        problems.append("no <body>")
+    if parser.script_chars == 0:
+        problems.append("no JavaScript")
+    for comment in parser.placeholder_comments:
+        problems.append(f"placeholder comment: {comment[:60]}")
+    return problems
@@ -13,6 +13,17 @@ OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", None)
 
 # Image generation (optional)
 REPLICATE_API_KEY = os.environ.get("REPLICATE_API_KEY", None)
+REPLICATE_API_BASE_URL = os.environ.get("REPLICATE_API_BASE_URL", "https://api.replicate.com/v1")
+# How long the create request may block waiting for the image (Replicate allows up to 60s)
+REPLICATE_WAIT_SECONDS = int(os.environ.get("REPLICATE_WAIT_SECONDS", 30))
+# Overall deadline per image, after which the prediction is canceled
+REPLICATE_DEADLINE_SECONDS = float(os.environ.get("REPLICATE_DEADLINE_SECONDS", 60))
+# Concurrent image generation calls per provider, and retries after a rate limit
+IMAGE_GENERATION_CONCURRENCY = {
+    "dalle3": int(os.environ.get("DALLE3_CONCURRENCY", 8)),
+    "flux": int(os.environ.get("FLUX_CONCURRENCY", 16)),
+}
+IMAGE_GENERATION_MAX_RETRIES = int(os.environ.get("IMAGE_GENERATION_MAX_RETRIES", 2))
 
 # Debugging-related
 
@@ -23,3 +34,84 @@ DEBUG_DIR = os.environ.get("DEBUG_DIR", "")
 # Set to True when running in production (on the hosted version)
 # Used as a feature flag to enable or disable certain features
 IS_PROD = os.environ.get("IS_PROD", False)
+
+# Data access
+# "supabase" in production; "sqlite" is a local stand-in for tests and benchmarks
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "supabase")
+SQLITE_DATABASE_PATH = os.environ.get("SQLITE_DATABASE_PATH", ":memory:")
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 500))
+
+# Pricing catalogue cache (stale-while-revalidate)
+PRICING_CACHE_TTL_SECONDS = float(os.environ.get("PRICING_CACHE_TTL_SECONDS", 300))
+
+# Local verification of Supabase access tokens
+# HS256 projects sign with the JWT secret; asymmetric keys are read from the project's JWKS
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET", None)
+SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 1024))
+JWKS_REFRESH_SECONDS = float(os.environ.get("JWKS_REFRESH_SECONDS", 600))
+
+# Local content-addressed store for generated images. Stored images end up in
+# users' generated code, so the store is only enabled when the public base URL
+# of this backend is set explicitly (and the dir isn't empty)
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR", "/tmp/generated_images")
+IMAGE_STORE_MAX_BYTES = int(os.environ.get("IMAGE_STORE_MAX_BYTES", 2 * 1024**3))
+IMAGE_STORE_PUBLIC_URL = os.environ.get("IMAGE_STORE_PUBLIC_URL", "")
+IMAGE_STORE_ENABLED = bool(IMAGE_STORE_DIR and IMAGE_STORE_PUBLIC_URL)
+
+# Persistent prompt -> generated image cache (empty path disables it)
+# DALL-E and Replicate image URLs expire after about an hour, so without the
+# local image store keep the TTL below that
+IMAGE_CACHE_PATH = os.environ.get("IMAGE_CACHE_PATH", "/tmp/image_cache/cache.sqlite3")
+IMAGE_CACHE_MAX_ENTRIES = int(os.environ.get("IMAGE_CACHE_MAX_ENTRIES", 10000))
+IMAGE_CACHE_TTL_SECONDS = float(
+    os.environ.get("IMAGE_CACHE_TTL_SECONDS", 30 * 24 * 3600 if IMAGE_STORE_ENABLED else 3000)
+)
+
+# Chunked video uploads for video mode, referenced by asset ID
+VIDEO_UPLOAD_DIR = os.environ.get("VIDEO_UPLOAD_DIR", "/tmp/video_uploads")
+VIDEO_UPLOAD_MAX_BYTES = int(os.environ.get("VIDEO_UPLOAD_MAX_BYTES", 500 * 1024**2))
+VIDEO_UPLOAD_MAX_AGE_HOURS = float(os.environ.get("VIDEO_UPLOAD_MAX_AGE_HOURS", 24))
+# Per user: uploads open at once, and their combined size
+VIDEO_UPLOAD_MAX_PER_USER = int(os.environ.get("VIDEO_UPLOAD_MAX_PER_USER", 3))
+VIDEO_UPLOAD_MAX_USER_BYTES = int(
+    os.environ.get("VIDEO_UPLOAD_MAX_USER_BYTES", 2 * VIDEO_UPLOAD_MAX_BYTES)
+)
+
+# Video frame extraction and encoding run in a process pool
+VIDEO_WORKER_PROCESSES = int(os.environ.get("VIDEO_WORKER_PROCESSES", min(4, os.cpu_count() or 1)))
+# Video requests processed at once by each server worker; others wait their turn
+VIDEO_MAX_CONCURRENT_JOBS = int(os.environ.get("VIDEO_MAX_CONCURRENT_JOBS", 2))
+
+# Video prompts: total input tokens for the frames (Claude bills about w*h/750
+# per image), the JPEG size cap per frame, and whether to crop static edges
+VIDEO_TOKEN_BUDGET = int(os.environ.get("VIDEO_TOKEN_BUDGET", 24000))
+VIDEO_FRAME_MAX_BYTES = int(os.environ.get("VIDEO_FRAME_MAX_BYTES", 350 * 1024))
+VIDEO_CROP_STATIC_CHROME = os.environ.get("VIDEO_CROP_STATIC_CHROME", "").lower() in ("1", "true", "yes")
+# "frames" (one image per frame) or "grid" (contact sheets of consecutive frames)
+VIDEO_FRAME_MODE = os.environ.get("VIDEO_FRAME_MODE", "frames")
+VIDEO_GRID_FRAMES = int(os.environ.get("VIDEO_GRID_FRAMES", 4))
+VIDEO_GRID_MAX_FRAMES = int(os.environ.get("VIDEO_GRID_MAX_FRAMES", 48))
+
+# On-disk cache of encoded video frames, keyed by video content and
+# extraction parameters (empty dir disables it)
+VIDEO_FRAME_CACHE_DIR = os.environ.get("VIDEO_FRAME_CACHE_DIR", "/tmp/video_frame_cache")
+VIDEO_FRAME_CACHE_MAX_BYTES = int(os.environ.get("VIDEO_FRAME_CACHE_MAX_BYTES", 500 * 1024**2))
+
+# Video mode: generation passes (each refines the previous draft), and whether
+# to stop early once a draft passes validation (see codegen.validation)
+VIDEO_GENERATION_PASSES = int(os.environ.get("VIDEO_GENERATION_PASSES", 2))
+VIDEO_SKIP_VALID_REFINEMENT = os.environ.get("VIDEO_SKIP_VALID_REFINEMENT", "true").lower() == "true"
+
+# Generated videos, served from /video and named by a hash of their inputs
+VIDEO_OUTPUT_DIR = os.environ.get("VIDEO_OUTPUT_DIR", "/tmp/videos")
+VIDEO_OUTPUT_MAX_BYTES = int(os.environ.get("VIDEO_OUTPUT_MAX_BYTES", 2 * 1024**3))
+# Videos uploaded for scene graphs; not served, so keep it apart from VIDEO_OUTPUT_DIR
+SCENE_GRAPH_UPLOAD_DIR = os.environ.get("SCENE_GRAPH_UPLOAD_DIR", "/tmp/scene_graph_uploads")
+
+# Webpage-to-video: the page's main content is cut to this many tokens
+# before it is summarized into a script
+WEBPAGE_TEXT_MAX_TOKENS = int(os.environ.get("WEBPAGE_TEXT_MAX_TOKENS", 6000))
+# Webpage-to-video job state, shared by all server workers so any of them can
+# answer a status poll; not served, so keep it apart from VIDEO_OUTPUT_DIR
+WEBPAGE_VIDEO_JOB_DIR = os.environ.get("WEBPAGE_VIDEO_JOB_DIR", "/tmp/webpage_video_jobs")
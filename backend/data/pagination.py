@@ -0,0 +1,67 @@
+# /backend/data/pagination.py
+"""
+Keyset pagination of conversion history.
+
+Pages are ordered newest first by (created_at, id), and a page's cursor is
+the position of its last row. Cursors come back from clients, so decoded
+positions are validated before a backend puts them into a query; the
+Supabase backend interpolates them into a PostgREST filter string.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from data.repository import Repository, Row
+
+KeysetPosition = Tuple[str, str]
+
+
+class InvalidCursor(ValueError):
+    """A cursor that wasn't produced by `encode_cursor`, or was tampered with"""
+
+
+def check_position(created_at: str, row_id: str) -> KeysetPosition:
+    """The position unchanged if created_at is an ISO timestamp and row_id an int or UUID"""
+    try:
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+    except ValueError:
+        raise InvalidCursor(f"Invalid created_at in cursor: {created_at!r}")
+    if not row_id.isdigit():
+        try:
+            uuid.UUID(row_id)
+        except ValueError:
+            raise InvalidCursor(f"Invalid id in cursor: {row_id!r}")
+    return created_at, row_id
+
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """Encode the (created_at, id) position of a history row as an opaque cursor"""
+    raw = json.dumps([created_at, str(row_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> KeysetPosition:
+    """Decode and validate a cursor produced by `encode_cursor`"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursor("Malformed cursor")
+    return check_position(created_at, row_id)
+
+
+def list_conversion_page(
+    repository: Repository, user_id: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """One page of a user's history and the cursor of the next page (None on the last)"""
+    before = decode_cursor(cursor) if cursor else None
+    # Read one extra row to know whether another page exists
+    rows = repository.list_conversions(user_id, limit + 1, before=before)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
@@ -0,0 +1,247 @@
+# /backend/data/repository.py
+"""
+Data access layer
+=================
+
+All reads and writes of credit, payment and pricing data go through a single
+`Repository` instance per process. Backends are swappable:
+
+- "supabase": the production backend, built on the shared Supabase client
+- "sqlite": a local stand-in with the same tables, for tests and benchmarks
+
+Every query is timed so slow calls are visible in the logs and aggregate
+timings are available from `get_query_stats()`.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from config import DATA_BACKEND, SLOW_QUERY_THRESHOLD_MS, SQLITE_DATABASE_PATH
+
+Row = Dict[str, Any]
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class QueryStats:
+    """Aggregate timings for one named query"""
+
+    count: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+_query_stats: Dict[str, QueryStats] = {}
+
+
+@contextmanager
+def timed_query(name: str) -> Iterator[None]:
+    """Record the duration of a query under `name`"""
+    stats = _query_stats.setdefault(name, QueryStats())
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+            print(f"[DB] Slow query {name}: {elapsed_ms:.1f} ms")
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of timed_query for repository methods"""
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed_query(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def get_query_stats() -> Dict[str, Dict[str, float]]:
+    """Snapshot of per-query timings since process start"""
+    return {
+        name: {
+            "count": stats.count,
+            "errors": stats.errors,
+            "avg_ms": round(stats.avg_ms, 2),
+            "max_ms": round(stats.max_ms, 2),
+        }
+        for name, stats in _query_stats.items()
+    }
+
+
+class Repository(ABC):
+    """Backend-agnostic access to the credit system tables"""
+
+    # --- user_credits ---
+
+    @abstractmethod
+    def get_user_credits(self, user_id: str) -> Optional[Row]:
+        """Return the user's credit row, or None if there is none"""
+
+    @abstractmethod
+    def insert_user_credits(self, values: Row) -> List[Row]:
+        """Create a credit row"""
+
+    @abstractmethod
+    def update_user_credits(
+        self, user_id: str, values: Row, expected_remaining: Optional[int] = None
+    ) -> List[Row]:
+        """Update a user's credit row.
+
+        When `expected_remaining` is given the update only applies if
+        credits_remaining still has that value (optimistic locking); an empty
+        list means the row was changed concurrently.
+        """
+
+    # --- conversion_history ---
+
+    @abstractmethod
+    def insert_conversion(self, values: Row) -> List[Row]:
+        """Log a conversion (credit usage)"""
+
+    @abstractmethod
+    def list_conversions(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[Tuple[str, str]] = None,
+    ) -> List[Row]:
+        """Conversions newest first, optionally strictly before a (created_at, id) keyset position"""
+
+    @abstractmethod
+    def list_conversions_since(
+        self, user_id: str, since: Optional[str], columns: str
+    ) -> List[Row]:
+        """Selected columns of all conversions created at or after `since` (ISO timestamp, None for all)"""
+
+    @abstractmethod
+    def count_conversions(self, user_id: str) -> int:
+        """Number of conversions for a user"""
+
+    # --- payment_history ---
+
+    @abstractmethod
+    def list_payments(self, user_id: str) -> List[Row]:
+        """Purchases, newest first"""
+
+    @abstractmethod
+    def credit_checkout_session(self, payment: Row) -> bool:
+        """Log a purchase and add its credits to the user in one transaction.
+
+        Returns False, changing nothing, if the payment's stripe_session_id
+        was already logged.
+        """
+
+    # --- stripe_webhook_events ---
+
+    @abstractmethod
+    def record_webhook_event(self, event_id: str, event_type: str) -> bool:
+        """Record a webhook event ID; False if it was already recorded"""
+
+    @abstractmethod
+    def update_webhook_event(
+        self,
+        event_id: str,
+        values: Row,
+        expected_status: Optional[str] = None,
+        received_before: Optional[str] = None,
+    ) -> List[Row]:
+        """Update a recorded webhook event, optionally only if it still has
+        `expected_status` and was received before `received_before` (ISO timestamp)"""
+
+    # --- pricing ---
+
+    @abstractmethod
+    def list_pricing_plans(self) -> List[Row]:
+        """Active pricing plans ordered by sort_order"""
+
+    @abstractmethod
+    def get_pricing_plan(self, plan_id: str) -> Optional[Row]:
+        """An active pricing plan by ID"""
+
+    @abstractmethod
+    def list_pricing_config(self) -> List[Row]:
+        """All pricing_config key/value rows"""
+
+    @abstractmethod
+    def update_pricing_plan(self, plan_id: str, updates: Row) -> List[Row]:
+        """Update a pricing plan"""
+
+    @abstractmethod
+    def insert_pricing_plan(self, values: Row) -> List[Row]:
+        """Create a pricing plan"""
+
+    def close(self) -> None:
+        """Release any resources held by the backend"""
+
+
+_repository: Optional[Repository] = None
+_initialized = False
+
+
+def create_repository(backend: str = DATA_BACKEND) -> Optional[Repository]:
+    """Build a repository for the given backend name.
+
+    Returns None when the Supabase backend is selected but not configured,
+    which routes treat as development mode.
+    """
+    if backend == "sqlite":
+        from data.sqlite_repository import SQLiteRepository
+
+        return SQLiteRepository(SQLITE_DATABASE_PATH)
+
+    if backend == "supabase":
+        from data.supabase_client import get_supabase_client
+        from data.supabase_repository import SupabaseRepository
+
+        client = get_supabase_client()
+        return SupabaseRepository(client) if client else None
+
+    raise ValueError(f"Unknown data backend: {backend}")
+
+
+def init_repository(repository: Optional[Repository] = None) -> Optional[Repository]:
+    """Initialise the process-wide repository (called from the app lifespan).
+
+    Passing a repository explicitly swaps the backend, e.g. in tests.
+    """
+    global _repository, _initialized
+    _repository = repository if repository is not None else create_repository()
+    _initialized = True
+    return _repository
+
+
+def get_repository() -> Optional[Repository]:
+    """Get the process-wide repository, creating it on first use"""
+    if not _initialized:
+        init_repository()
+    return _repository
+
+
+def close_repository() -> None:
+    """Close the process-wide repository (called on app shutdown)"""
+    global _repository, _initialized
+    if _repository is not None:
+        _repository.close()
+    _repository = None
+    _initialized = False
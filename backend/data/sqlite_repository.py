@@ -0,0 +1,368 @@
+# /backend/data/sqlite_repository.py
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+from data.repository import Repository, Row, timed
+
+# Local stand-in for the Supabase tables used by the credit system.
+# Array and JSON columns are stored as JSON text.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_credits (
+  id TEXT PRIMARY KEY,
+  user_id TEXT UNIQUE NOT NULL,
+  credits_remaining INTEGER NOT NULL DEFAULT 2,
+  credits_used INTEGER NOT NULL DEFAULT 0,
+  plan TEXT NOT NULL DEFAULT 'free',
+  last_purchase_date TEXT,
+  last_used_date TEXT,
+  created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversion_history (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  model_used TEXT,
+  framework TEXT,
+  input_type TEXT,
+  feature_type TEXT,
+  credits_used INTEGER DEFAULT 1,
+  created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversion_history_user_created_id
+  ON conversion_history(user_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS payment_history (
+  id TEXT PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  amount REAL,
+  credits_purchased INTEGER,
+  plan TEXT,
+  stripe_session_id TEXT,
+  payment_date TEXT,
+  status TEXT DEFAULT 'completed'
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_history_stripe_session_id
+  ON payment_history(stripe_session_id)
+  WHERE stripe_session_id IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+  event_id TEXT PRIMARY KEY,
+  event_type TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'received',
+  error TEXT,
+  received_at TEXT,
+  processed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS pricing_plans (
+  id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  credits INTEGER NOT NULL,
+  price_cents INTEGER NOT NULL,
+  price_dollars REAL GENERATED ALWAYS AS (price_cents / 100.0) VIRTUAL,
+  description TEXT,
+  features TEXT,
+  is_recommended INTEGER DEFAULT 0,
+  is_custom INTEGER DEFAULT 0,
+  stripe_price_id TEXT,
+  sort_order INTEGER DEFAULT 0,
+  is_active INTEGER DEFAULT 1,
+  created_at TEXT,
+  updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS pricing_config (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL,
+  description TEXT
+);
+"""
+
+_JSON_COLUMNS = {"features"}
+_BOOL_COLUMNS = {"is_recommended", "is_custom", "is_active"}
+_CONVERSION_COLUMNS = {
+    "id", "user_id", "model_used", "framework", "input_type",
+    "feature_type", "credits_used", "created_at",
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by a local SQLite file (or ":memory:")"""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # --- helpers ---
+
+    def _to_row(self, row: sqlite3.Row) -> Row:
+        result: Row = dict(row)
+        for key in _JSON_COLUMNS & result.keys():
+            if result[key] is not None:
+                result[key] = json.loads(result[key])
+        for key in _BOOL_COLUMNS & result.keys():
+            if result[key] is not None:
+                result[key] = bool(result[key])
+        return result
+
+    def _encode(self, values: Row) -> Row:
+        return {
+            key: json.dumps(value) if key in _JSON_COLUMNS and value is not None else value
+            for key, value in values.items()
+        }
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Row]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_row(row) for row in rows]
+
+    def _insert(self, table: str, values: Row) -> List[Row]:
+        values = self._encode(values)
+        columns = ", ".join(values.keys())
+        placeholders = ", ".join("?" for _ in values)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                tuple(values.values()),
+            )
+            self._conn.commit()
+        key = "key" if table == "pricing_config" else "id"
+        return self._query(f"SELECT * FROM {table} WHERE {key} = ?", (values[key],))
+
+    def _update(self, table: str, values: Row, where: Row) -> List[Row]:
+        values = self._encode(values)
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        conditions = " AND ".join(f"{column} = ?" for column in where)
+        with self._lock:
+            ids = [
+                row[0]
+                for row in self._conn.execute(
+                    f"SELECT id FROM {table} WHERE {conditions}", tuple(where.values())
+                ).fetchall()
+            ]
+            if ids:
+                self._conn.execute(
+                    f"UPDATE {table} SET {assignments} WHERE {conditions}",
+                    tuple(values.values()) + tuple(where.values()),
+                )
+                self._conn.commit()
+        if not ids:
+            return []
+        placeholders = ", ".join("?" for _ in ids)
+        return self._query(f"SELECT * FROM {table} WHERE id IN ({placeholders})", tuple(ids))
+
+    # --- user_credits ---
+
+    @timed("user_credits.get")
+    def get_user_credits(self, user_id: str) -> Optional[Row]:
+        rows = self._query("SELECT * FROM user_credits WHERE user_id = ? LIMIT 1", (user_id,))
+        return rows[0] if rows else None
+
+    @timed("user_credits.insert")
+    def insert_user_credits(self, values: Row) -> List[Row]:
+        now = _now()
+        return self._insert(
+            "user_credits",
+            {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **values},
+        )
+
+    @timed("user_credits.update")
+    def update_user_credits(
+        self, user_id: str, values: Row, expected_remaining: Optional[int] = None
+    ) -> List[Row]:
+        where: Row = {"user_id": user_id}
+        if expected_remaining is not None:
+            where["credits_remaining"] = expected_remaining
+        return self._update("user_credits", {**values, "updated_at": _now()}, where)
+
+    # --- conversion_history ---
+
+    @timed("conversion_history.insert")
+    def insert_conversion(self, values: Row) -> List[Row]:
+        return self._insert(
+            "conversion_history",
+            {"id": str(uuid.uuid4()), "created_at": _now(), **values},
+        )
+
+    @timed("conversion_history.list")
+    def list_conversions(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[Tuple[str, str]] = None,
+    ) -> List[Row]:
+        if before:
+            created_at, row_id = before
+            return self._query(
+                "SELECT * FROM conversion_history WHERE user_id = ? "
+                "AND (created_at < ? OR (created_at = ? AND id < ?)) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, created_at, created_at, row_id, limit),
+            )
+        return self._query(
+            "SELECT * FROM conversion_history WHERE user_id = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (user_id, limit),
+        )
+
+    @timed("conversion_history.list_since")
+    def list_conversions_since(
+        self, user_id: str, since: Optional[str], columns: str
+    ) -> List[Row]:
+        selected = [column.strip() for column in columns.split(",")]
+        if not set(selected) <= _CONVERSION_COLUMNS:
+            raise ValueError(f"Unknown conversion_history columns: {columns}")
+        sql = f"SELECT {', '.join(selected)} FROM conversion_history WHERE user_id = ?"
+        params: Tuple[Any, ...] = (user_id,)
+        if since:
+            sql += " AND created_at >= ?"
+            params += (since,)
+        return self._query(sql, params)
+
+    @timed("conversion_history.count")
+    def count_conversions(self, user_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM conversion_history WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return int(row[0])
+
+    # --- payment_history ---
+
+    @timed("payment_history.list")
+    def list_payments(self, user_id: str) -> List[Row]:
+        return self._query(
+            "SELECT * FROM payment_history WHERE user_id = ? ORDER BY payment_date DESC",
+            (user_id,),
+        )
+
+    @timed("payment_history.credit_session")
+    def credit_checkout_session(self, payment: Row) -> bool:
+        now = _now()
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO payment_history (id, user_id, amount, credits_purchased, plan, "
+                    "stripe_session_id, payment_date, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT DO NOTHING",
+                    (
+                        str(uuid.uuid4()),
+                        payment["user_id"],
+                        payment["amount"],
+                        payment["credits_purchased"],
+                        payment["plan"],
+                        payment["stripe_session_id"],
+                        payment["payment_date"],
+                        payment.get("status", "completed"),
+                    ),
+                )
+                if cursor.rowcount == 0:
+                    self._conn.rollback()
+                    return False
+                self._conn.execute(
+                    "INSERT INTO user_credits (id, user_id, credits_remaining, credits_used, plan, "
+                    "last_purchase_date, created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET "
+                    "credits_remaining = credits_remaining + excluded.credits_remaining, "
+                    "plan = excluded.plan, last_purchase_date = excluded.last_purchase_date, "
+                    "updated_at = excluded.updated_at",
+                    (
+                        str(uuid.uuid4()),
+                        payment["user_id"],
+                        payment["credits_purchased"],
+                        payment["plan"],
+                        payment["payment_date"],
+                        now,
+                        now,
+                    ),
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return True
+
+    # --- stripe_webhook_events ---
+
+    @timed("stripe_webhook_events.record")
+    def record_webhook_event(self, event_id: str, event_type: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO stripe_webhook_events (event_id, event_type, status, received_at) "
+                "VALUES (?, ?, 'received', ?)",
+                (event_id, event_type, _now()),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    @timed("stripe_webhook_events.update")
+    def update_webhook_event(
+        self,
+        event_id: str,
+        values: Row,
+        expected_status: Optional[str] = None,
+        received_before: Optional[str] = None,
+    ) -> List[Row]:
+        where: Row = {"event_id": event_id}
+        if expected_status is not None:
+            where["status"] = expected_status
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        conditions = " AND ".join(f"{column} = ?" for column in where)
+        params = tuple(values.values()) + tuple(where.values())
+        if received_before is not None:
+            conditions += " AND received_at < ?"
+            params += (received_before,)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE stripe_webhook_events SET {assignments} WHERE {conditions}", params
+            )
+            self._conn.commit()
+        if cursor.rowcount == 0:
+            return []
+        return self._query(
+            "SELECT * FROM stripe_webhook_events WHERE event_id = ?", (event_id,)
+        )
+
+    # --- pricing ---
+
+    @timed("pricing_plans.list")
+    def list_pricing_plans(self) -> List[Row]:
+        return self._query("SELECT * FROM pricing_plans WHERE is_active = 1 ORDER BY sort_order")
+
+    @timed("pricing_plans.get")
+    def get_pricing_plan(self, plan_id: str) -> Optional[Row]:
+        rows = self._query(
+            "SELECT * FROM pricing_plans WHERE id = ? AND is_active = 1 LIMIT 1", (plan_id,)
+        )
+        return rows[0] if rows else None
+
+    @timed("pricing_config.list")
+    def list_pricing_config(self) -> List[Row]:
+        return self._query("SELECT * FROM pricing_config")
+
+    @timed("pricing_plans.update")
+    def update_pricing_plan(self, plan_id: str, updates: Row) -> List[Row]:
+        return self._update("pricing_plans", {**updates, "updated_at": _now()}, {"id": plan_id})
+
+    @timed("pricing_plans.insert")
+    def insert_pricing_plan(self, values: Row) -> List[Row]:
+        now = _now()
+        return self._insert("pricing_plans", {"created_at": now, "updated_at": now, **values})
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
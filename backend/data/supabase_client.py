@@ -1,5 +1,6 @@
-# /backend/db/supabase_client.py
+# /backend/data/supabase_client.py
 import os
+import httpx
 from supabase import create_client, Client
 from typing import Optional
 
@@ -7,13 +8,17 @@ from typing import Optional
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 
-# Create Supabase client singleton
+# Process-wide Supabase client, created lazily (or eagerly from the app lifespan)
 _supabase_client: Optional[Client] = None
 
 def get_supabase_client() -> Optional[Client]:
-    """Get or create Supabase client singleton"""
+    """Get or create the shared Supabase client singleton.
+
+    Every route and the data repository go through this function, so each
+    worker holds exactly one client and one HTTP connection pool.
+    """
     global _supabase_client
-    
+
     if _supabase_client is None:
         if SUPABASE_URL and SUPABASE_SERVICE_KEY:
             try:
@@ -25,8 +30,20 @@ def get_supabase_client() -> Optional[Client]:
         else:
             print("⚠️  Supabase not configured - running in development mode")
             return None
-    
+
     return _supabase_client
 
-# Export the client
-supabase = get_supabase_client()
\ No newline at end of file
+def close_supabase_client() -> None:
+    """Release the shared client's connection pool (called on app shutdown)"""
+    global _supabase_client
+
+    if _supabase_client is not None:
+        try:
+            # The client is synchronous: its PostgREST session is an
+            # httpx.Client, closed with close() rather than awaited
+            session = _supabase_client.postgrest.session
+            if isinstance(session, httpx.Client):
+                session.close()
+        except Exception as e:
+            print(f"Error closing Supabase client: {str(e)}")
+        _supabase_client = None
@@ -0,0 +1,145 @@
+# /backend/data/supabase_repository.py
+from typing import List, Optional, Tuple
+
+from supabase import Client
+
+from data.pagination import check_position
+from data.repository import Repository, Row, timed
+from data.supabase_client import close_supabase_client
+
+
+class SupabaseRepository(Repository):
+    """Repository backed by the shared Supabase (PostgREST) client.
+
+    Note: the Supabase Python client is synchronous.
+    """
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    @timed("user_credits.get")
+    def get_user_credits(self, user_id: str) -> Optional[Row]:
+        response = self.client.table("user_credits").select("*").eq("user_id", user_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    @timed("user_credits.insert")
+    def insert_user_credits(self, values: Row) -> List[Row]:
+        return self.client.table("user_credits").insert(values).execute().data or []
+
+    @timed("user_credits.update")
+    def update_user_credits(
+        self, user_id: str, values: Row, expected_remaining: Optional[int] = None
+    ) -> List[Row]:
+        query = self.client.table("user_credits").update(values).eq("user_id", user_id)
+        if expected_remaining is not None:
+            query = query.eq("credits_remaining", expected_remaining)
+        return query.execute().data or []
+
+    @timed("conversion_history.insert")
+    def insert_conversion(self, values: Row) -> List[Row]:
+        return self.client.table("conversion_history").insert(values).execute().data or []
+
+    @timed("conversion_history.list")
+    def list_conversions(
+        self,
+        user_id: str,
+        limit: int,
+        before: Optional[Tuple[str, str]] = None,
+    ) -> List[Row]:
+        query = self.client.table("conversion_history").select("*").eq("user_id", user_id)
+        if before:
+            # Interpolated into the filter string, so only well-formed values
+            created_at, row_id = check_position(*before)
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+            )
+        response = query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute()
+        return response.data or []
+
+    @timed("conversion_history.list_since")
+    def list_conversions_since(
+        self, user_id: str, since: Optional[str], columns: str
+    ) -> List[Row]:
+        query = self.client.table("conversion_history").select(columns).eq("user_id", user_id)
+        if since:
+            query = query.gte("created_at", since)
+        return query.execute().data or []
+
+    @timed("conversion_history.count")
+    def count_conversions(self, user_id: str) -> int:
+        # head=True makes Postgres count without shipping any rows
+        response = self.client.table("conversion_history").select("id", count="exact", head=True).eq("user_id", user_id).execute()
+        return response.count or 0
+
+    @timed("payment_history.list")
+    def list_payments(self, user_id: str) -> List[Row]:
+        response = self.client.table("payment_history").select("*").eq("user_id", user_id).order("payment_date", desc=True).execute()
+        return response.data or []
+
+    @timed("payment_history.credit_session")
+    def credit_checkout_session(self, payment: Row) -> bool:
+        # A Postgres function, so the payment log and the credit update
+        # commit together (see migrations/create_credit_checkout_session.sql)
+        response = self.client.rpc(
+            "credit_checkout_session",
+            {
+                "p_user_id": payment["user_id"],
+                "p_stripe_session_id": payment["stripe_session_id"],
+                "p_plan": payment["plan"],
+                "p_credits": payment["credits_purchased"],
+                "p_amount": payment["amount"],
+                "p_payment_date": payment["payment_date"],
+            },
+        ).execute()
+        return bool(response.data)
+
+    @timed("stripe_webhook_events.record")
+    def record_webhook_event(self, event_id: str, event_type: str) -> bool:
+        # ignore_duplicates turns the insert into ON CONFLICT DO NOTHING, so
+        # only a newly recorded event comes back in the response
+        response = self.client.table("stripe_webhook_events").upsert(
+            {"event_id": event_id, "event_type": event_type, "status": "received"},
+            on_conflict="event_id",
+            ignore_duplicates=True,
+        ).execute()
+        return bool(response.data)
+
+    @timed("stripe_webhook_events.update")
+    def update_webhook_event(
+        self,
+        event_id: str,
+        values: Row,
+        expected_status: Optional[str] = None,
+        received_before: Optional[str] = None,
+    ) -> List[Row]:
+        query = self.client.table("stripe_webhook_events").update(values).eq("event_id", event_id)
+        if expected_status is not None:
+            query = query.eq("status", expected_status)
+        if received_before is not None:
+            query = query.lt("received_at", received_before)
+        return query.execute().data or []
+
+    @timed("pricing_plans.list")
+    def list_pricing_plans(self) -> List[Row]:
+        response = self.client.table("pricing_plans").select("*").eq("is_active", True).order("sort_order").execute()
+        return response.data or []
+
+    @timed("pricing_plans.get")
+    def get_pricing_plan(self, plan_id: str) -> Optional[Row]:
+        response = self.client.table("pricing_plans").select("*").eq("id", plan_id).eq("is_active", True).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    @timed("pricing_config.list")
+    def list_pricing_config(self) -> List[Row]:
+        return self.client.table("pricing_config").select("*").execute().data or []
+
+    @timed("pricing_plans.update")
+    def update_pricing_plan(self, plan_id: str, updates: Row) -> List[Row]:
+        return self.client.table("pricing_plans").update(updates).eq("id", plan_id).execute().data or []
+
+    @timed("pricing_plans.insert")
+    def insert_pricing_plan(self, values: Row) -> List[Row]:
+        return self.client.table("pricing_plans").insert(values).execute().data or []
+
+    def close(self) -> None:
+        close_supabase_client()
@@ -0,0 +1,193 @@
+"""
+Local content-addressed store for generated images.
+
+Provider URLs expire (DALL-E) or live on third-party CDNs (Replicate), so
+generated images are downloaded once and served from our own
+/generated-images route. Files are named by the SHA-256 of their content,
+which dedups identical images and lets clients cache them forever. When the
+store grows past its size limit the least recently used files are evicted.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from config import (
+    IMAGE_STORE_DIR,
+    IMAGE_STORE_ENABLED,
+    IMAGE_STORE_MAX_BYTES,
+    IMAGE_STORE_PUBLIC_URL,
+)
+
+IMAGE_ROUTE = "/generated-images"
+CONTENT_TYPES: Dict[str, str] = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+EXTENSIONS = {content_type: extension for extension, content_type in CONTENT_TYPES.items()}
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp|gif)$")
+# Largest image we are willing to download
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+
+class BlobStore:
+    def __init__(self, directory: str, max_bytes: int = IMAGE_STORE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """(path, size, last used) of every blob"""
+        blobs: List[Tuple[str, int, float]] = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if BLOB_NAME_RE.match(name):
+                    stat = os.stat(os.path.join(root, name))
+                    blobs.append((os.path.join(root, name), stat.st_size, stat.st_mtime))
+        return blobs
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Path of a stored blob, or None if the name is invalid or evicted"""
+        if not BLOB_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name[:2], name)
+        return path if os.path.isfile(path) else None
+
+    def put(self, data: bytes, content_type: str) -> str:
+        """Store `data` and return its blob name; identical content is stored once"""
+        extension = EXTENSIONS.get(content_type.split(";")[0].strip().lower())
+        if extension is None:
+            raise ValueError(f"Unsupported image type: {content_type}")
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = os.path.join(self.directory, name[:2], name)
+
+        with self._lock:
+            if os.path.isfile(path):
+                # Already stored; mark it as recently used
+                os.utime(path)
+                return name
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return name
+
+    def touch(self, name: str) -> bool:
+        """Mark a blob as recently used; False if it no longer exists"""
+        path = self.path_for(name)
+        if not path:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _evict(self) -> None:
+        # Evict down to 90% of the limit so we don't evict on every write
+        target = self.max_bytes * 0.9
+        blobs = sorted(self._scan(), key=lambda blob: blob[2])
+        self._total_bytes = sum(size for _, size, _ in blobs)
+        for path, size, _ in blobs:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def content_type_for(name: str) -> str:
+        return CONTENT_TYPES[name.rsplit(".", 1)[1]]
+
+    def url_for(self, name: str) -> str:
+        return f"{IMAGE_STORE_PUBLIC_URL.rstrip('/')}{IMAGE_ROUTE}/{name}"
+
+    def name_from_url(self, url: str) -> Optional[str]:
+        """The blob name if `url` points into this store"""
+        prefix = f"{IMAGE_STORE_PUBLIC_URL.rstrip('/')}{IMAGE_ROUTE}/"
+        if not url.startswith(prefix):
+            return None
+        name = url[len(prefix):]
+        return name if BLOB_NAME_RE.match(name) else None
+
+
+_blob_store: Optional[BlobStore] = None
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Process-wide image store, or None unless IMAGE_STORE_DIR and IMAGE_STORE_PUBLIC_URL are set"""
+    global _blob_store
+    if _blob_store is None and IMAGE_STORE_ENABLED:
+        _blob_store = BlobStore(IMAGE_STORE_DIR)
+    return _blob_store
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=30, follow_redirects=True)
+    return _client
+
+
+async def close_blob_store_client() -> None:
+    """Close the shared download client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+
+async def read_limited(response: httpx.Response, max_bytes: int) -> bytes:
+    """Body of a streamed response, failing as soon as it exceeds max_bytes"""
+    content_length = response.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ValueError(f"Response too large ({content_length} bytes)")
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        size += len(chunk)
+        if size > max_bytes:
+            raise ValueError(f"Response larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def store_remote_image(url: str) -> Optional[str]:
+    """Download a generated image into the store and return its local URL.
+
+    Returns None if the store is disabled or the download fails, in which
+    case the caller should keep using the provider URL.
+    """
+    store = get_blob_store()
+    if not store:
+        return None
+    try:
+        async with _get_client().stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if content_type.split(";")[0].strip().lower() not in EXTENSIONS:
+                raise ValueError(f"Not a supported image type: {content_type or 'none'}")
+            data = await read_limited(response, MAX_IMAGE_BYTES)
+        name = await asyncio.to_thread(store.put, data, content_type)
+        return store.url_for(name)
+    except Exception as e:
+        print(f"Failed to store generated image {url}: {e}")
+        return None
+
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from config import IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_PATH, IMAGE_CACHE_TTL_SECONDS
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so equivalent alt texts share an entry"""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip(".!").strip().lower()
+
+
+def cache_key(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Persistent prompt -> image URL cache shared across requests.
+
+    Entries live in a small SQLite index on disk. Expired entries are dropped
+    on read and the least recently used ones are evicted once the cache holds
+    more than `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = IMAGE_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = IMAGE_CACHE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS image_cache (
+              key TEXT PRIMARY KEY,
+              model TEXT NOT NULL,
+              prompt TEXT NOT NULL,
+              url TEXT NOT NULL,
+              created_at REAL NOT NULL,
+              last_used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_image_cache_last_used_at
+              ON image_cache(last_used_at);
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, prompts: List[str], model: str) -> Dict[str, str]:
+        """Cached URLs for the given prompts (missing or expired prompts are left out)"""
+        keys = {cache_key(prompt, model): prompt for prompt in prompts}
+        if not keys:
+            return {}
+
+        now = time.time()
+        placeholders = ", ".join("?" for _ in keys)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, url FROM image_cache WHERE key IN ({placeholders}) AND created_at > ?",
+                (*keys, now - self.ttl_seconds),
+            ).fetchall()
+            if rows:
+                self._conn.executemany(
+                    "UPDATE image_cache SET last_used_at = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows],
+                )
+                self._conn.commit()
+
+        found = {keys[key]: url for key, url in rows}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, urls: Dict[str, Union[str, None]], model: str) -> None:
+        """Store generated URLs; failed generations (None) are not cached"""
+        now = time.time()
+        rows = [
+            (cache_key(prompt, model), model, prompt, url, now, now)
+            for prompt, url in urls.items()
+            if url
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_cache (key, model, prompt, url, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM image_cache WHERE created_at <= ?", (now - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM image_cache WHERE key IN ("
+            "SELECT key FROM image_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM image_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_image_cache: Optional[ImageCache] = None
+
+
+def get_image_cache() -> Optional[ImageCache]:
+    """Process-wide image cache, or None when IMAGE_CACHE_PATH is empty"""
+    global _image_cache
+    if _image_cache is None and IMAGE_CACHE_PATH:
+        _image_cache = ImageCache(IMAGE_CACHE_PATH)
+    return _image_cache
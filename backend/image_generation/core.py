@@ -1,66 +1,265 @@
 #/root/screenshot-to-code/backend/image_generation/core.py
 import asyncio
+import math
 import re
-from typing import Dict, List, Literal, Union
+from typing import Dict, List, Literal, Optional, Set, Tuple, Union
+import openai
 from openai import AsyncOpenAI
-from bs4 import BeautifulSoup
 
+from image_generation.blob_store import get_blob_store, store_remote_image
+from image_generation.cache import ImageCache, get_image_cache
+from image_generation.img_tags import ImgTag, rewrite_img_tags, scan_img_tags
+from image_generation.local import is_local_image, render_placeholder_image
+from image_generation.pool import RateLimitedError, get_provider_pool
 from image_generation.replicate import call_replicate
 
+# Output sizes each provider supports, as (size parameter, width, height)
+DALLE3_SIZES = [("1024x1024", 1, 1), ("1792x1024", 1792, 1024), ("1024x1792", 1024, 1792)]
+FLUX_ASPECT_RATIOS = [
+    (f"{w}:{h}", w, h)
+    for w, h in [(1, 1), (16, 9), (21, 9), (3, 2), (2, 3), (4, 5), (5, 4), (3, 4), (4, 3), (9, 16), (9, 21)]
+]
+
+
+def closest_image_size(model: Literal["dalle3", "flux"], width: int, height: int) -> str:
+    """The provider size (DALL-E) or aspect ratio (Flux) closest to the target's aspect ratio"""
+    options = DALLE3_SIZES if model == "dalle3" else FLUX_ASPECT_RATIOS
+    target = math.log(max(width, 1) / max(height, 1))
+    return min(options, key=lambda option: abs(math.log(option[1] / option[2]) - target))[0]
+
 
 async def process_tasks(
     prompts: List[str],
     api_key: str,
     base_url: str | None,
     model: Literal["dalle3", "flux"],
+    use_cache: bool = True,
+    first_priority: int = 0,
+    dimensions: Optional[Dict[str, Tuple[int, int]]] = None,
 ):
     import time
 
     start_time = time.time()
+
+    # Request each image at the supported size closest to where it will be shown
+    sizes = {
+        prompt: closest_image_size(model, *(dimensions or {}).get(prompt, (1, 1)))
+        for prompt in prompts
+    }
+    prompts_by_size: Dict[str, List[str]] = {}
+    for prompt in prompts:
+        prompts_by_size.setdefault(sizes[prompt], []).append(prompt)
+
+    # Reuse images generated for the same prompt and size by earlier requests
+    cache: Optional[ImageCache] = get_image_cache() if use_cache else None
+    cached_urls: Dict[str, str] = {}
+    if cache:
+        try:
+            for size, size_prompts in prompts_by_size.items():
+                cached_urls.update(
+                    await asyncio.to_thread(cache.get_many, size_prompts, f"{model}:{size}")
+                )
+        except Exception as e:
+            print(f"Image cache lookup failed: {e}")
+
+    # Locally stored images may have been evicted since they were cached
+    blob_store = get_blob_store()
+    if blob_store:
+        for prompt, url in list(cached_urls.items()):
+            name = blob_store.name_from_url(url)
+            if name and not blob_store.touch(name):
+                del cached_urls[prompt]
+    uncached_prompts = [prompt for prompt in prompts if prompt not in cached_urls]
+
+    # Calls go through the provider's pool: capped concurrency, paced by its
+    # rate limits, and earlier prompts (higher up the page) first
+    pool = get_provider_pool(model)
+    priorities = {prompt: first_priority + index for index, prompt in enumerate(prompts)}
     if model == "dalle3":
-        tasks = [generate_image_dalle(prompt, api_key, base_url) for prompt in prompts]
+        tasks = [
+            pool.run(
+                priorities[prompt],
+                lambda prompt=prompt: generate_image_dalle(
+                    prompt, api_key, base_url, size=sizes[prompt]
+                ),
+            )
+            for prompt in uncached_prompts
+        ]
     else:
-        tasks = [generate_image_replicate(prompt, api_key) for prompt in prompts]
+        tasks = [
+            pool.run(
+                priorities[prompt],
+                lambda prompt=prompt: generate_image_replicate(
+                    prompt, api_key, aspect_ratio=sizes[prompt]
+                ),
+            )
+            for prompt in uncached_prompts
+        ]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     end_time = time.time()
     generation_time = end_time - start_time
     print(f"Image generation time: {generation_time:.2f} seconds")
 
-    processed_results: List[Union[str, None]] = []
-    for result in results:
+    generated_urls: Dict[str, Union[str, None]] = {}
+    for prompt, result in zip(uncached_prompts, results):
         if isinstance(result, BaseException):
             print(f"An exception occurred: {result}")
-            processed_results.append(None)
+            generated_urls[prompt] = None
         else:
-            processed_results.append(result)
+            generated_urls[prompt] = result
+
+    # Keep our own copy of each image; provider URLs expire or live on third-party CDNs
+    if blob_store:
+        stored_urls = await asyncio.gather(
+            *(store_remote_image(url) for url in generated_urls.values() if url)
+        )
+        local_urls = iter(stored_urls)
+        for prompt, url in generated_urls.items():
+            if url:
+                generated_urls[prompt] = next(local_urls) or url
+
+    if cache:
+        try:
+            for size, size_prompts in prompts_by_size.items():
+                await asyncio.to_thread(
+                    cache.put_many,
+                    {prompt: generated_urls[prompt] for prompt in size_prompts if prompt in generated_urls},
+                    f"{model}:{size}",
+                )
+        except Exception as e:
+            print(f"Image cache update failed: {e}")
+        print(f"Image cache: {len(cached_urls)}/{len(prompts)} hits, {cache.stats()}")
+
+    processed_results: List[Union[str, None]] = [
+        cached_urls[prompt] if prompt in cached_urls else generated_urls[prompt]
+        for prompt in prompts
+    ]
 
     return processed_results
 
 
+class ImageGenerationCoalescer:
+    """Request-scoped single-flight image generation.
+
+    Variants of one request often contain the same placeholder alt texts. The
+    first variant to ask for a prompt starts its generation; later variants
+    await the same result instead of calling the provider again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple[str, str], "asyncio.Future[Union[str, None]]"] = {}
+        # Keep references so running generations aren't garbage collected
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    def prefetch(
+        self,
+        prompts: List[str],
+        api_key: str,
+        base_url: str | None,
+        model: Literal["dalle3", "flux"],
+        first_priority: int = 0,
+        dimensions: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> None:
+        """Start generating any prompts that aren't already in flight.
+
+        Prompts are shared by alt text: if variants show the same alt text at
+        different sizes, the first requested size is used for all of them.
+        """
+        loop = asyncio.get_running_loop()
+        new_prompts = [
+            prompt
+            for prompt in dict.fromkeys(prompts)
+            if (model, prompt) not in self._in_flight
+        ]
+        for prompt in new_prompts:
+            self._in_flight[(model, prompt)] = loop.create_future()
+        if new_prompts:
+            # Run in its own task so cancelling one variant doesn't cancel the
+            # generation the other variants are waiting on
+            task = asyncio.create_task(
+                self._generate(
+                    new_prompts, api_key, base_url, model, first_priority, dimensions
+                )
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def process_tasks(
+        self,
+        prompts: List[str],
+        api_key: str,
+        base_url: str | None,
+        model: Literal["dalle3", "flux"],
+        first_priority: int = 0,
+        dimensions: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> List[Union[str, None]]:
+        self.prefetch(prompts, api_key, base_url, model, first_priority, dimensions)
+        futures = [self._in_flight[(model, prompt)] for prompt in prompts]
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+
+    async def _generate(
+        self,
+        prompts: List[str],
+        api_key: str,
+        base_url: str | None,
+        model: Literal["dalle3", "flux"],
+        first_priority: int,
+        dimensions: Optional[Dict[str, Tuple[int, int]]],
+    ) -> None:
+        results: List[Union[str, None]] = [None] * len(prompts)
+        try:
+            results = await process_tasks(
+                prompts,
+                api_key,
+                base_url,
+                model,
+                first_priority=first_priority,
+                dimensions=dimensions,
+            )
+        except Exception as e:
+            print(f"Image generation failed: {e}")
+        finally:
+            for prompt, result in zip(prompts, results):
+                self._in_flight[(model, prompt)].set_result(result)
+                # Let a later variant retry prompts that failed
+                if result is None:
+                    del self._in_flight[(model, prompt)]
+
+
 async def generate_image_dalle(
-    prompt: str, api_key: str, base_url: str | None
+    prompt: str, api_key: str, base_url: str | None, size: str = "1024x1024"
 ) -> Union[str, None]:
-    client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-    res = await client.images.generate(
-        model="dall-e-3",
-        quality="standard",
-        style="natural",
-        n=1,
-        size="1024x1024",
-        prompt=prompt,
-    )
-    await client.close()
+    # Retries are left to the provider pool, which knows about the rate limits
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    pool = get_provider_pool("dalle3")
+    try:
+        raw_response = await client.images.with_raw_response.generate(
+            model="dall-e-3",
+            quality="standard",
+            style="natural",
+            n=1,
+            size=size,  # type: ignore
+            prompt=prompt,
+        )
+        pool.observe(raw_response.headers)
+        res = raw_response.parse()
+    except openai.RateLimitError as e:
+        raise RateLimitedError(str(e), e.response.headers)
+    finally:
+        await client.close()
     return res.data[0].url
 
 
-async def generate_image_replicate(prompt: str, api_key: str) -> str:
+async def generate_image_replicate(
+    prompt: str, api_key: str, aspect_ratio: str = "1:1"
+) -> str:
 
     # We use Flux Schnell
     return await call_replicate(
         {
             "prompt": prompt,
             "num_outputs": 1,
-            "aspect_ratio": "1:1",
+            "aspect_ratio": aspect_ratio,
             "output_format": "png",
             "output_quality": 100,
         },
@@ -82,14 +281,13 @@ def extract_dimensions(url: str):
 
 
 def create_alt_url_mapping(code: str) -> Dict[str, str]:
-    soup = BeautifulSoup(code, "html.parser")
-    images = soup.find_all("img")
-
     mapping: Dict[str, str] = {}
 
-    for image in images:
-        if not image["src"].startswith("https://placehold.co"):
-            mapping[image["alt"]] = image["src"]
+    for image in scan_img_tags(code):
+        src = image.get("src")
+        alt = image.get("alt")
+        if src is not None and alt is not None and not src.startswith("https://placehold.co"):
+            mapping[alt] = src
 
     return mapping
 
@@ -100,35 +298,52 @@ async def generate_images(
     base_url: Union[str, None],
     image_cache: Dict[str, str],
     model: Literal["dalle3", "flux"] = "dalle3",
+    coalescer: Optional[ImageGenerationCoalescer] = None,
 ) -> str:
     # Find all images
-    soup = BeautifulSoup(code, "html.parser")
-    images = soup.find_all("img")
+    images = list(scan_img_tags(code))
 
     # Extract alt texts as image prompts
     alts: List[str | None] = []
+    dimensions: Dict[str, Tuple[int, int]] = {}
+    has_local_images = False
     for img in images:
         # Only include URL if the image starts with https://placehold.co
         # and it's not already in the image_cache
-        if (
-            img.get("src", None)
-            and img["src"].startswith("https://placehold.co")
-            and image_cache.get(img.get("alt")) is None
-        ):
-            alts.append(img.get("alt", None))
+        src = img.get("src") or ""
+        alt = img.get("alt")
+        if not src.startswith("https://placehold.co"):
+            continue
+        width, height = extract_dimensions(src)
+        if is_local_image(width, height):
+            # Tiny images (icons, avatars) are rendered locally, not generated
+            has_local_images = True
+            continue
+        if alt is None or image_cache.get(alt) is None:
+            alts.append(alt)
+            if alt is not None:
+                dimensions.setdefault(alt, (width, height))
 
     # Exclude images with no alt text
     filtered_alts: List[str] = [alt for alt in alts if alt is not None]
 
-    # Remove duplicates
-    prompts = list(set(filtered_alts))
+    # Remove duplicates (keeping document order, which sets generation priority)
+    prompts = list(dict.fromkeys(filtered_alts))
 
     # Return early if there are no images to replace
-    if len(prompts) == 0:
+    if len(prompts) == 0 and not has_local_images:
         return code
 
-    # Generate images
-    results = await process_tasks(prompts, api_key, base_url, model)
+    # Generate images (shared with the request's other variants if a coalescer is given)
+    results: List[Union[str, None]] = []
+    if coalescer and prompts:
+        results = await coalescer.process_tasks(
+            prompts, api_key, base_url, model, dimensions=dimensions
+        )
+    elif prompts:
+        results = await process_tasks(
+            prompts, api_key, base_url, model, dimensions=dimensions
+        )
 
     # Create a dict mapping alt text to image URL
     mapped_image_urls = dict(zip(prompts, results))
@@ -137,23 +352,25 @@ async def generate_images(
     mapped_image_urls = {**mapped_image_urls, **image_cache}
 
     # Replace old image URLs with the generated URLs
-    for img in images:
+    def replace_image(img: ImgTag) -> Optional[Dict[str, str]]:
+        src = img.get("src")
         # Skip images that don't start with https://placehold.co (leave them alone)
-        if not img["src"].startswith("https://placehold.co"):
-            continue
-
-        new_url = mapped_image_urls[img.get("alt")]
+        if not src or not src.startswith("https://placehold.co"):
+            return None
 
-        if new_url:
-            # Set width and height attributes
-            width, height = extract_dimensions(img["src"])
-            img["width"] = width
-            img["height"] = height
-            # Replace img['src'] with the mapped image URL
-            img["src"] = new_url
+        width, height = extract_dimensions(src)
+        alt = img.get("alt")
+        if is_local_image(width, height):
+            new_url = render_placeholder_image(alt or "", width, height)
         else:
-            print("Image generation failed for alt text:" + img.get("alt"))
+            new_url = mapped_image_urls.get(alt) if alt is not None else None
+
+        if not new_url:
+            print(f"Image generation failed for alt text: {img.get('alt')}")
+            return None
+
+        # Set width and height attributes and point src at the generated image
+        return {"src": new_url, "width": str(width), "height": str(height)}
 
-    # Return the modified HTML
-    # (need to prettify it because BeautifulSoup messes up the formatting)
-    return soup.prettify()
+    # Only the patched attributes change; the rest of the code keeps its formatting
+    return rewrite_img_tags(code, replace_image)
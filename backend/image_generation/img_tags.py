@@ -0,0 +1,104 @@
+"""
+Lightweight scanner and in-place rewriter for <img> tags.
+
+Unlike parsing the document with BeautifulSoup and re-serializing it, this
+only touches the attributes being changed: everything else in the model's
+output, including its formatting, is passed through byte for byte.
+"""
+
+import html
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+# Comments and raw-text elements are matched as whole tokens so <img> tags
+# inside them are skipped, as an HTML parser would. Quoted attribute values
+# may contain ">".
+TOKEN_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(script|style|textarea|title)\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>.*?</\1\s*>"
+    r"|(?P<img><img\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>)",
+    re.IGNORECASE | re.DOTALL,
+)
+ATTRIBUTE_RE = re.compile(
+    r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?"""
+)
+
+
+@dataclass
+class ImgTag:
+    """An <img> tag found in a document"""
+
+    start: int
+    end: int
+    text: str
+    # name -> (unescaped value, span of the whole attribute within `text`)
+    attributes: Dict[str, Tuple[str, Tuple[int, int]]] = field(default_factory=dict)
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        attribute = self.attributes.get(name)
+        return attribute[0] if attribute else default
+
+
+def parse_img_tag(text: str, start: int = 0) -> ImgTag:
+    """Parse the attributes of a single <img ...> tag"""
+    tag = ImgTag(start=start, end=start + len(text), text=text)
+    body_end = len(text) - 2 if text.endswith("/>") else len(text) - 1
+    for match in ATTRIBUTE_RE.finditer(text, 4, body_end):
+        name = match.group(1).lower()
+        value = next((group for group in match.groups()[1:] if group is not None), "")
+        # Like browsers, the first occurrence of a duplicated attribute wins
+        if name not in tag.attributes:
+            tag.attributes[name] = (html.unescape(value), match.span())
+    return tag
+
+
+def scan_img_tags(code: str) -> Iterator[ImgTag]:
+    """Yield every <img> tag in the document, in order"""
+    for match in TOKEN_RE.finditer(code):
+        if match.group("img"):
+            yield parse_img_tag(match.group("img"), match.start())
+
+
+def _patch_tag(tag: ImgTag, updates: Dict[str, str]) -> str:
+    text = tag.text
+    inserts: list[str] = []
+    replacements: list[Tuple[Tuple[int, int], str]] = []
+    for name, value in updates.items():
+        attribute = f'{name}="{html.escape(value)}"'
+        if name in tag.attributes:
+            replacements.append((tag.attributes[name][1], attribute))
+        else:
+            inserts.append(attribute)
+
+    # Apply from the end so earlier spans stay valid
+    for (start, end), attribute in sorted(replacements, reverse=True):
+        text = text[:start] + attribute + text[end:]
+
+    if inserts:
+        body_end = len(text) - 2 if text.endswith("/>") else len(text) - 1
+        body = text[:body_end].rstrip()
+        text = body + " " + " ".join(inserts) + text[len(body):]
+    return text
+
+
+def rewrite_img_tags(
+    code: str, rewrite: Callable[[ImgTag], Optional[Dict[str, str]]]
+) -> str:
+    """Patch <img> attributes in place.
+
+    `rewrite` returns the attributes to set on a tag (or None to leave it
+    alone). Existing attributes are replaced where they are, new ones are
+    appended; the rest of the document is untouched.
+    """
+    parts: list[str] = []
+    position = 0
+    for tag in scan_img_tags(code):
+        updates = rewrite(tag)
+        if not updates:
+            continue
+        parts.append(code[position : tag.start])
+        parts.append(_patch_tag(tag, updates))
+        position = tag.end
+    parts.append(code[position:])
+    return "".join(parts)
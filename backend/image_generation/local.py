@@ -0,0 +1,68 @@
+"""
+Procedural placeholders for images too small to be worth generating.
+
+Icons and avatars of a few dozen pixels look the same whether they come from
+DALL-E or from an SVG gradient, so they are rendered locally instead: instant,
+free and deterministic for a given prompt.
+"""
+
+import base64
+import hashlib
+import html
+import re
+
+# Images smaller than this (on their longest side) are rendered locally
+LOCAL_IMAGE_MAX_SIZE = 64
+
+PERSON_WORDS = {
+    "avatar", "profile", "person", "man", "woman", "user", "author",
+    "headshot", "portrait", "face", "customer", "member", "team",
+}
+STOP_WORDS = PERSON_WORDS | {
+    "a", "an", "the", "of", "for", "and", "with", "picture", "photo",
+    "image", "icon", "small", "round", "circular", "pic",
+}
+
+
+def is_local_image(width: int, height: int) -> bool:
+    return max(width, height) < LOCAL_IMAGE_MAX_SIZE
+
+
+def _initials(prompt: str) -> str:
+    words = re.findall(r"[A-Za-z][A-Za-z'-]*", prompt)
+    names = [word for word in words if word[0].isupper() and word.lower() not in STOP_WORDS]
+    if names:
+        return "".join(word[0] for word in names[:2]).upper()
+    other = [word for word in words if word.lower() not in STOP_WORDS]
+    return other[0][0].upper() if other else "?"
+
+
+def render_placeholder_image(prompt: str, width: int, height: int) -> str:
+    """An SVG data URL for the prompt: an initials avatar for people, a gradient otherwise"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    hue = digest[0] * 360 // 256
+    second_hue = (hue + 40 + digest[1] % 80) % 360
+
+    words = {word.lower() for word in re.findall(r"[A-Za-z]+", prompt)}
+    if words & PERSON_WORDS:
+        radius = min(width, height) / 2
+        font_size = round(radius * 0.9, 1)
+        body = (
+            f'<circle cx="{width / 2}" cy="{height / 2}" r="{radius}" fill="hsl({hue},55%,50%)"/>'
+            f'<text x="50%" y="50%" dy=".35em" text-anchor="middle" fill="#fff" '
+            f'font-family="sans-serif" font-size="{font_size}">{html.escape(_initials(prompt))}</text>'
+        )
+    else:
+        body = (
+            '<defs><linearGradient id="g" x1="0" y1="0" x2="1" y2="1">'
+            f'<stop offset="0" stop-color="hsl({hue},70%,60%)"/>'
+            f'<stop offset="1" stop-color="hsl({second_hue},70%,45%)"/>'
+            "</linearGradient></defs>"
+            '<rect width="100%" height="100%" rx="4" fill="url(#g)"/>'
+        )
+
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">{body}</svg>'
+    )
+    return "data:image/svg+xml;base64," + base64.b64encode(svg.encode("utf-8")).decode("ascii")
@@ -0,0 +1,183 @@
+"""
+Per-provider scheduling for image generation calls.
+
+Each provider gets a pool that caps the number of concurrent calls, spaces
+out call starts according to the rate-limit headers the provider sends back,
+and retries calls that were rejected with a rate limit. Waiting calls are
+started in priority order, so images near the top of the page (lower
+priority numbers) are generated first.
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple, TypeVar
+
+from config import IMAGE_GENERATION_CONCURRENCY, IMAGE_GENERATION_MAX_RETRIES
+
+T = TypeVar("T")
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)?")
+# A whole value made of duration parts, e.g. "6m0s"; anything else isn't a duration
+FULL_DURATION_RE = re.compile(r"(?:\d+(?:\.\d+)?(?:ms|h|m|s)?)+")
+# Used when a 429 doesn't say how long to wait
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+class RateLimitedError(Exception):
+    """The provider rejected the call because of a rate limit"""
+
+    def __init__(self, message: str, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Seconds in a rate-limit header value, e.g. "20", "1.5", "20ms" or "6m0s" """
+    value = value.strip()
+    if not FULL_DURATION_RE.fullmatch(value):
+        return None
+    return sum(
+        float(amount) * {"ms": 0.001, "h": 3600, "m": 60}.get(unit, 1)
+        for amount, unit in DURATION_RE.findall(value)
+    )
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Seconds to wait for a Retry-After value: a duration or an HTTP date"""
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return seconds
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class ProviderPool:
+    def __init__(self, name: str, max_concurrency: int, max_retries: int = IMAGE_GENERATION_MAX_RETRIES):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self._active = 0
+        # (priority, sequence, future) of calls waiting for a slot
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._sequence = itertools.count()
+
+        # Pacing derived from rate-limit headers; the interval only applies
+        # until the rate-limit window it was derived from resets
+        self._interval = 0.0
+        self._interval_until = 0.0
+        self._next_start = 0.0
+        self._blocked_until = 0.0
+
+    # --- slots ---
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were handed a slot just as we were cancelled; pass it on
+                self._release()
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    async def _wait_for_turn(self) -> None:
+        now = time.monotonic()
+        start = max(now, self._next_start, self._blocked_until)
+        interval = self._interval if start < self._interval_until else 0.0
+        self._next_start = start + interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    # --- rate limits ---
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Adjust pacing from a provider response's rate-limit headers"""
+        now = time.monotonic()
+        retry_after = headers.get("retry-after")
+        if retry_after is not None:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                self._blocked_until = max(self._blocked_until, now + seconds)
+
+        remaining = headers.get("x-ratelimit-remaining-requests") or headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset")
+        if remaining is None or reset is None:
+            return
+        reset_seconds = parse_duration(reset)
+        if reset_seconds is None:
+            return
+        try:
+            remaining_requests = int(remaining)
+        except ValueError:
+            return
+
+        if remaining_requests <= 0:
+            self._blocked_until = max(self._blocked_until, now + reset_seconds)
+        else:
+            # Spread the remaining budget evenly over the window (relaxing the
+            # pacing again as headers show more quota)
+            self._interval = reset_seconds / remaining_requests
+            self._interval_until = now + reset_seconds
+
+    # --- calls ---
+
+    async def run(self, priority: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Run `call` when a slot is free, retrying it if it is rate limited"""
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                await self._wait_for_turn()
+                return await call()
+            except RateLimitedError as e:
+                self.observe(e.headers)
+                if "retry-after" not in e.headers:
+                    self._blocked_until = max(
+                        self._blocked_until,
+                        time.monotonic() + DEFAULT_RETRY_AFTER_SECONDS * 2**attempt,
+                    )
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                print(f"[{self.name}] Rate limited, retrying ({attempt}/{self.max_retries})")
+            finally:
+                self._release()
+
+
+_pools: Dict[str, ProviderPool] = {}
+
+
+def get_provider_pool(provider: str) -> ProviderPool:
+    """Process-wide pool for an image provider ("dalle3" or "flux")"""
+    if provider not in _pools:
+        _pools[provider] = ProviderPool(provider, IMAGE_GENERATION_CONCURRENCY.get(provider, 4))
+    return _pools[provider]
@@ -1,8 +1,78 @@
 import asyncio
+import time
+from typing import Any, Dict, Optional
+
 import httpx
 
+from config import (
+    REPLICATE_API_BASE_URL,
+    REPLICATE_DEADLINE_SECONDS,
+    REPLICATE_WAIT_SECONDS,
+)
+from image_generation.pool import RateLimitedError, get_provider_pool
+
+FLUX_SCHNELL_PATH = "/models/black-forest-labs/flux-schnell/predictions"
+
+# Polling backoff, used when the prediction isn't done within the Prefer: wait window
+INITIAL_POLL_INTERVAL = 0.25
+MAX_POLL_INTERVAL = 2.0
+POLL_BACKOFF = 1.5
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_replicate_client() -> httpx.AsyncClient:
+    """Shared, connection-pooled client for all Replicate calls"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            # Prefer: wait holds the create request open until the prediction finishes
+            timeout=httpx.Timeout(10.0, read=REPLICATE_WAIT_SECONDS + 10.0),
+        )
+    return _client
+
+
+async def close_replicate_client() -> None:
+    """Close the shared client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
 
-async def call_replicate(input: dict[str, str | int], api_token: str) -> str:
+def _prediction_output(prediction: Dict[str, Any]) -> Optional[str]:
+    """The image URL of a finished prediction, or None while it is still running"""
+    status = prediction.get("status")
+    if status == "succeeded":
+        output = prediction["output"]
+        return output[0] if isinstance(output, list) else output
+    elif status in ("error", "failed"):
+        raise ValueError(f"Inference errored out: {prediction.get('error') or 'Unknown error'}")
+    elif status == "canceled":
+        raise ValueError("Inference was canceled")
+    return None
+
+
+async def _cancel_prediction(
+    client: httpx.AsyncClient, prediction_id: str, headers: Dict[str, str]
+) -> None:
+    try:
+        await client.post(
+            f"{REPLICATE_API_BASE_URL}/predictions/{prediction_id}/cancel",
+            headers=headers,
+        )
+    except Exception as e:
+        print(f"Failed to cancel Replicate prediction {prediction_id}: {e}")
+
+
+async def call_replicate(
+    input: dict[str, str | int],
+    api_token: str,
+    deadline_seconds: float = REPLICATE_DEADLINE_SECONDS,
+) -> str:
+    deadline = time.monotonic() + deadline_seconds
+    wait_seconds = max(1, min(REPLICATE_WAIT_SECONDS, int(deadline_seconds)))
     headers = {
         "Authorization": f"Bearer {api_token}",
         "Content-Type": "application/json",
@@ -10,56 +80,57 @@ async def call_replicate(input: dict[str, str | int], api_token: str) -> str:
 
     data = {"input": input}
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                "https://api.replicate.com/v1/models/black-forest-labs/flux-schnell/predictions",
+    client = get_replicate_client()
+    prediction_id: Optional[str] = None
+    try:
+        # Prefer: wait returns the finished prediction in the create response in
+        # most cases, so we usually don't need to poll at all
+        response = await client.post(
+            f"{REPLICATE_API_BASE_URL}{FLUX_SCHNELL_PATH}",
+            headers={**headers, "Prefer": f"wait={wait_seconds}"},
+            json=data,
+        )
+        get_provider_pool("flux").observe(response.headers)
+        if response.status_code == 429:
+            raise RateLimitedError("Replicate rate limit exceeded", response.headers)
+        response.raise_for_status()
+        prediction = response.json()
+
+        # Extract the id from the response
+        prediction_id = prediction.get("id")
+        if not prediction_id:
+            raise ValueError("Prediction ID not found in initial response.")
+
+        # Fall back to polling with backoff until the deadline
+        poll_interval = INITIAL_POLL_INTERVAL
+        while True:
+            output = _prediction_output(prediction)
+            if output is not None:
+                return output
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Inference timed out")
+            await asyncio.sleep(min(poll_interval, remaining))
+            poll_interval = min(poll_interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+
+            status_response = await client.get(
+                f"{REPLICATE_API_BASE_URL}/predictions/{prediction_id}",
                 headers=headers,
-                json=data,
             )
-            response.raise_for_status()
-            response_json = response.json()
-
-            # Extract the id from the response
-            prediction_id = response_json.get("id")
-            if not prediction_id:
-                raise ValueError("Prediction ID not found in initial response.")
-
-            # Polling every 0.1 seconds until the status is succeeded or error (upto 10s)
-            num_polls = 0
-            max_polls = 100
-            while num_polls < max_polls:
-                num_polls += 1
-
-                await asyncio.sleep(0.1)
-
-                # Check the status
-                status_check_url = (
-                    f"https://api.replicate.com/v1/predictions/{prediction_id}"
-                )
-                status_response = await client.get(status_check_url, headers=headers)
-                status_response.raise_for_status()
-                status_response_json = status_response.json()
-                status = status_response_json.get("status")
-
-                # If status is succeeded or if there's an error, break out of the loop
-                if status == "succeeded":
-                    return status_response_json["output"][0]
-                elif status == "error":
-                    raise ValueError(
-                        f"Inference errored out: {status_response_json.get('error', 'Unknown error')}"
-                    )
-                elif status == "failed":
-                    raise ValueError("Inference failed")
-
-            # If we've reached here, it means we've exceeded the max number of polls
-            raise TimeoutError("Inference timed out")
-
-        except httpx.HTTPStatusError as e:
-            raise ValueError(f"HTTP error occurred: {e}")
-        except httpx.RequestError as e:
-            raise ValueError(f"An error occurred while requesting: {e}")
-        except asyncio.TimeoutError:
-            raise TimeoutError("Request timed out")
-        except Exception as e:
-            raise ValueError(f"An unexpected error occurred: {e}")
+            status_response.raise_for_status()
+            prediction = status_response.json()
+
+    except (asyncio.CancelledError, TimeoutError):
+        # Don't leave the prediction running (and billing) when nobody is waiting for it
+        if prediction_id:
+            await asyncio.shield(_cancel_prediction(client, prediction_id, headers))
+        raise
+    except httpx.HTTPStatusError as e:
+        raise ValueError(f"HTTP error occurred: {e}")
+    except httpx.RequestError as e:
+        raise ValueError(f"An error occurred while requesting: {e}")
+    except (ValueError, RateLimitedError):
+        raise
+    except Exception as e:
+        raise ValueError(f"An unexpected error occurred: {e}")
@@ -0,0 +1,53 @@
+import re
+from typing import List, Set
+
+from image_generation.img_tags import ImgTag, parse_img_tag
+
+IMG_TAG_RE = re.compile(r"""<img\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE)
+# The start of an <img> tag, or the end of the buffer could be one ("<", "<i", "<im")
+IMG_START_RE = re.compile(r"<(?:img\b|im?\Z|\Z)", re.IGNORECASE)
+
+
+class StreamingImageDetector:
+    """Finds placeholder images in code while it is still streaming.
+
+    Feed it the chunks of one completion; each call returns the
+    placehold.co <img> tags that were completed by that chunk and haven't
+    been seen before, so image generation can start before the completion
+    finishes.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._seen: Set[str] = set()
+        # Number of <img> tags completed so far, i.e. the document position of the next one
+        self.images_seen = 0
+
+    def feed(self, chunk: str) -> List[ImgTag]:
+        self._buffer += chunk
+
+        tags: List[ImgTag] = []
+        scanned_to = 0
+        for match in IMG_TAG_RE.finditer(self._buffer):
+            scanned_to = match.end()
+            self.images_seen += 1
+            tag = parse_img_tag(match.group(0))
+            alt = tag.get("alt")
+            if (
+                alt is not None
+                and (tag.get("src") or "").startswith("https://placehold.co")
+                and alt not in self._seen
+            ):
+                self._seen.add(alt)
+                tags.append(tag)
+
+        # Only keep what could still become part of an <img> tag: from the
+        # first one that isn't closed yet. Trimming at the last "<" instead
+        # would cut a tag whose quoted attribute value contains one
+        remainder = ""
+        for start in IMG_START_RE.finditer(self._buffer, scanned_to):
+            if not IMG_TAG_RE.match(self._buffer, start.start()):
+                remainder = self._buffer[start.start():]
+                break
+        self._buffer = remainder
+        return tags
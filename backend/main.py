@@ -6,40 +6,44 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from routes import screenshot, generate_code, home, evals, webpage_to_video, video
 # Import auth and payments directly with the full path
 from routes.auth import router as auth_router
-from routes.payments import router as payments_router
+from routes.payments import router as payments_router, pricing_service
 from routes.credit_usage import router as credit_usage_router
+from routes.generated_images import router as generated_images_router
+from routes.video_assets import router as video_assets_router
+from data.repository import init_repository, close_repository
+from services.token_verifier import get_token_verifier
+from image_generation.replicate import close_replicate_client
+from image_generation.blob_store import close_blob_store_client
+from video.workers import shutdown_video_executor
+from video.webpage_video import close_webpage_video_client
 
 # Import database to ensure initialization
 import database
-import time
-import glob
 
-app = FastAPI(openapi_url=None, docs_url=None, redoc_url=None)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the shared data-access layer (one pooled client per worker) up front
+    init_repository()
+    # Load the pricing catalogue so pricing reads never wait on the database
+    await pricing_service.warm()
+    # Keep the JWT signing keys fresh so token checks stay local
+    get_token_verifier().start()
+    yield
+    await get_token_verifier().stop()
+    await close_replicate_client()
+    await close_blob_store_client()
+    await close_webpage_video_client()
+    shutdown_video_executor()
+    close_repository()
 
-def cleanup_old_files(directory: str, max_age_hours: int = 24):
-    """Remove files older than max_age_hours from the specified directory"""
-    try:
-        current_time = time.time()
-        files = glob.glob(os.path.join(directory, "*"))
-        cleaned_count = 0
-        
-        for file_path in files:
-            if os.path.isfile(file_path):
-                file_age = current_time - os.path.getmtime(file_path)
-                if file_age > max_age_hours * 3600:  # Convert hours to seconds
-                    os.remove(file_path)
-                    cleaned_count += 1
-                    
-        if cleaned_count > 0:
-            print(f"Cleaned up {cleaned_count} old files from {directory}")
-    except Exception as e:
-        print(f"Error during cleanup of {directory}: {str(e)}")
+app = FastAPI(openapi_url=None, docs_url=None, redoc_url=None, lifespan=lifespan)
 
 @app.exception_handler(Exception)
 async def exception_handler(request, exc):
@@ -72,6 +76,8 @@ app.include_router(home.router)
 app.include_router(evals.router)
 app.include_router(webpage_to_video.router, prefix="/api")
 app.include_router(video.router)
+app.include_router(generated_images_router)
+app.include_router(video_assets_router, prefix="/api", tags=["video-assets"])
 
 # Add new authentication and payment routes with explicit router variables
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
@@ -80,29 +86,54 @@ app.include_router(credit_usage_router, prefix="/api", tags=["credit-usage"])
 
 from pydantic import BaseModel
 from typing import List
+import asyncio
+import hashlib
+import shutil
+import tempfile
+from fastapi.staticfiles import StaticFiles
+from video.media_store import get_media_store, media_key
+from video.workers import run_in_pool
 from video_utils import create_video_from_images
 
 class VideoCreationPayload(BaseModel):
     image_data_list: List[str]
+    # Kept for compatibility; the stored video is named by its inputs
     output_filename: str
 
 @app.post("/create-video")
 async def create_video(payload: VideoCreationPayload):
     try:
-        # Ensure the videos directory exists
-        os.makedirs("/tmp/videos", exist_ok=True)
-        
-        # Clean up old files before creating new ones
-        cleanup_old_files("/tmp/videos", max_age_hours=24)
-        
-        output_path = f"/tmp/videos/{payload.output_filename}"
-        create_video_from_images(payload.image_data_list, output_path)
+        store = get_media_store()
+        images = [
+            hashlib.sha256(image_data.encode("utf-8")).hexdigest()
+            for image_data in payload.image_data_list
+        ]
+        key = media_key("create_video", {"images": images})
+        output_path = store.get(key)
+        if output_path is None:
+            output_path = await render_images_video(payload.image_data_list, key)
         return {"message": "Video created successfully", "video_path": output_path}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi.staticfiles import StaticFiles
-app.mount("/video", StaticFiles(directory="/tmp/videos"), name="video")
+async def render_images_video(image_data_list: List[str], key: str) -> str:
+    store = get_media_store()
+    partial_path = store.partial_path(key)
+    # The encode and anything it writes next to its output stay in a
+    # directory of the job's own, out of the served store
+    work_dir = tempfile.mkdtemp(prefix="create_video_")
+    try:
+        rendered_path = os.path.join(work_dir, "video.mp4")
+        await run_in_pool(create_video_from_images, image_data_list, rendered_path)
+        await asyncio.to_thread(shutil.move, rendered_path, partial_path)
+        return store.put(key, partial_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+# Serve the media store's directory itself, wherever VIDEO_OUTPUT_DIR points
+app.mount("/video", StaticFiles(directory=get_media_store().directory), name="video")
 
 @app.get("/healthcheck")
 async def healthcheck():
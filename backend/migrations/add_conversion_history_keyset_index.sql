@@ -0,0 +1,5 @@
+-- Composite index backing keyset pagination of a user's credit history.
+-- Pages are read newest-first with a (created_at, id) cursor, so this index
+-- lets every page be served as a bounded index range scan regardless of depth.
+CREATE INDEX IF NOT EXISTS idx_conversion_history_user_created_id
+  ON conversion_history(user_id, created_at DESC, id DESC);
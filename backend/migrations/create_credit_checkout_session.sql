@@ -0,0 +1,36 @@
+-- Credits a paid Stripe checkout session: logs the purchase and adds its
+-- credits in one transaction. The unique index on
+-- payment_history.stripe_session_id claims the session, so a session is
+-- credited at most once however often (or concurrently) it is processed.
+-- Returns FALSE, changing nothing, if the session was already logged.
+CREATE OR REPLACE FUNCTION credit_checkout_session(
+  p_user_id user_credits.user_id%TYPE,
+  p_stripe_session_id TEXT,
+  p_plan TEXT,
+  p_credits INTEGER,
+  p_amount NUMERIC,
+  p_payment_date TIMESTAMP WITH TIME ZONE
+) RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO payment_history (user_id, amount, credits_purchased, plan, stripe_session_id, payment_date, status)
+  VALUES (p_user_id, p_amount, p_credits, p_plan, p_stripe_session_id, p_payment_date, 'completed')
+  ON CONFLICT (stripe_session_id) WHERE stripe_session_id IS NOT NULL DO NOTHING;
+
+  IF NOT FOUND THEN
+    RETURN FALSE;
+  END IF;
+
+  INSERT INTO user_credits (user_id, credits_remaining, credits_used, plan, last_purchase_date)
+  VALUES (p_user_id, p_credits, 0, p_plan, p_payment_date)
+  ON CONFLICT (user_id) DO UPDATE SET
+    credits_remaining = user_credits.credits_remaining + EXCLUDED.credits_remaining,
+    plan = EXCLUDED.plan,
+    last_purchase_date = EXCLUDED.last_purchase_date,
+    updated_at = NOW();
+
+  RETURN TRUE;
+END;
+$$;
+
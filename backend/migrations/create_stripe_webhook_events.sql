@@ -0,0 +1,18 @@
+-- Idempotency ledger for Stripe webhooks. The webhook handler records each
+-- event ID here before acknowledging, so Stripe retries of an event that was
+-- already accepted are recognised and never credit a user twice.
+CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+  event_id TEXT PRIMARY KEY,
+  event_type TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'received', -- received | processed | failed
+  error TEXT,
+  received_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  processed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_status ON stripe_webhook_events(status);
+
+-- A checkout session can only ever be logged as one purchase
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_history_stripe_session_id
+  ON payment_history(stripe_session_id)
+  WHERE stripe_session_id IS NOT NULL;
@@ -1,9 +1,10 @@
 import copy
+import json
 import time
 from typing import Any, Awaitable, Callable, Dict, List, Tuple, cast
 from anthropic import AsyncAnthropic
 from openai.types.chat import ChatCompletionMessageParam
-from config import IS_DEBUG_ENABLED
+from config import IS_DEBUG_ENABLED, VIDEO_GENERATION_PASSES
 from debug.DebugFileWriter import DebugFileWriter
 from image_processing.utils import process_image
 from utils import pprint_prompt
@@ -123,6 +124,16 @@ async def stream_claude_response(
     return {"duration": completion_time, "code": response}
 
 
+def with_cache_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of `message` with a prompt cache breakpoint after its last content block"""
+    content = message["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    blocks = [dict(block) for block in content]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return {**message, "content": blocks}
+
+
 async def stream_claude_response_native(
     system_prompt: str,
     messages: list[Any],
@@ -130,7 +141,20 @@ async def stream_claude_response_native(
     callback: Callable[[str], Awaitable[None]],
     include_thinking: bool = False,
     model_name: str = "claude-3-7-sonnet-20250219",
+    max_passes: int = VIDEO_GENERATION_PASSES,
+    should_refine: Callable[[str], bool] | None = None,
+    on_draft: Callable[[str], Awaitable[None]] | None = None,
 ) -> Completion:
+    """Generate, then refine the result over up to max_passes passes.
+
+    After every pass but the last, `should_refine` (if given) decides from
+    the response whether another pass is worth it, and `on_draft` receives
+    the response so the caller can show it while refinement runs.
+
+    Prompt cache breakpoints sit after the original prompt (the video
+    frames) and after the latest assistant turn, so each refinement pass
+    only pays full price for the new suffix.
+    """
     start_time = time.time()
     client = AsyncAnthropic(api_key=api_key)
 
@@ -138,25 +162,25 @@ async def stream_claude_response_native(
     max_tokens = 4096
     temperature = 0.0
 
-    # Multi-pass flow
-    current_pass_num = 1
-    max_passes = 2
-
     prefix = "<thinking>"
     response = None
+    # Don't grow the caller's list
+    messages = list(messages)
+    if messages:
+        messages[-1] = with_cache_breakpoint(messages[-1])
+    # Index of the latest assistant turn, which carries the second breakpoint
+    previous_draft_index: int | None = None
 
     # For debugging
     full_stream = ""
     debug_file_writer = DebugFileWriter()
 
-    while current_pass_num <= max_passes:
-        current_pass_num += 1
-
+    for current_pass_num in range(1, max_passes + 1):
         # Set up message depending on whether we have a <thinking> prefix
         messages_to_send = (
             messages + [{"role": "assistant", "content": prefix}]
             if include_thinking
-            else messages
+            else list(messages)
         )
 
         pprint_prompt(messages_to_send)
@@ -179,27 +203,56 @@ async def stream_claude_response_native(
         # Write each pass's code to .html file and thinking to .txt file
         if IS_DEBUG_ENABLED:
             debug_file_writer.write_to_file(
-                f"pass_{current_pass_num - 1}.html",
+                f"pass_{current_pass_num}.html",
                 debug_file_writer.extract_html_content(response_text),
             )
             debug_file_writer.write_to_file(
-                f"thinking_pass_{current_pass_num - 1}.txt",
+                f"thinking_pass_{current_pass_num}.txt",
                 response_text.split("</thinking>")[0],
             )
 
-        # Set up messages array for next pass
+        usage = {
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+            "cache_creation_input_tokens": response.usage.cache_creation_input_tokens or 0,
+            "cache_read_input_tokens": response.usage.cache_read_input_tokens or 0,
+        }
+        print(
+            f"Token usage: Input Tokens: {usage['input_tokens']}, Output Tokens: {usage['output_tokens']}, "
+            f"Cache Write: {usage['cache_creation_input_tokens']}, Cache Read: {usage['cache_read_input_tokens']}"
+        )
+        if IS_DEBUG_ENABLED:
+            debug_file_writer.write_to_file(
+                f"usage_pass_{current_pass_num}.json", json.dumps(usage, indent=2)
+            )
+
+        if current_pass_num == max_passes:
+            break
+        if should_refine and not should_refine(response_text):
+            print(f"Skipping refinement after pass {current_pass_num}")
+            break
+        if on_draft:
+            await on_draft(response_text)
+
+        # Set up messages array for next pass; only the latest draft keeps
+        # its cache breakpoint (the API allows four)
+        if previous_draft_index is not None:
+            previous_draft = messages[previous_draft_index]
+            messages[previous_draft_index] = {
+                "role": "assistant",
+                "content": previous_draft["content"][0]["text"],
+            }
+        previous_draft_index = len(messages)
         messages += [
-            {"role": "assistant", "content": str(prefix) + response.content[0].text},
+            with_cache_breakpoint(
+                {"role": "assistant", "content": str(prefix) + response.content[0].text}
+            ),
             {
                 "role": "user",
                 "content": "You've done a good job with a first draft. Improve this further based on the original instructions so that the app is fully functional and looks like the original video of the app we're trying to replicate.",
             },
         ]
 
-        print(
-            f"Token usage: Input Tokens: {response.usage.input_tokens}, Output Tokens: {response.usage.output_tokens}"
-        )
-
     # Close the Anthropic client
     await client.close()
 
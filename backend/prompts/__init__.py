@@ -7,7 +7,8 @@ from prompts.imported_code_prompts import IMPORTED_CODE_SYSTEM_PROMPTS
 from prompts.screenshot_system_prompts import SYSTEM_PROMPTS
 from prompts.text_prompts import SYSTEM_PROMPTS as TEXT_SYSTEM_PROMPTS
 from prompts.types import Stack, PromptContent
-from video.utils import assemble_claude_prompt_video
+from video.assets import get_video_asset_store
+from video.utils import assemble_claude_prompt_video, assemble_claude_prompt_video_file
 
 
 USER_PROMPT = """
@@ -26,6 +27,7 @@ async def create_prompt(
     prompt: PromptContent,
     history: list[dict[str, Any]],
     is_imported_from_code: bool,
+    user_id: str | None = None,
 ) -> tuple[list[ChatCompletionMessageParam], dict[str, str]]:
 
     image_cache: dict[str, str] = {}
@@ -45,6 +47,9 @@ async def create_prompt(
             prompt_messages = assemble_prompt(image_url, stack)
         elif input_mode == "text":
             prompt_messages = assemble_text_prompt(prompt["text"], stack)
+        elif input_mode == "video":
+            # Assembled from the video frames below
+            prompt_messages = []
         else:
             # Default to image mode for backward compatibility
             image_url = prompt["images"][0]
@@ -60,8 +65,22 @@ async def create_prompt(
             image_cache = create_alt_url_mapping(history[-2]["text"])
 
     if input_mode == "video":
-        video_data_url = prompt["images"][0]
-        prompt_messages = await assemble_claude_prompt_video(video_data_url)
+        video_asset_id = prompt.get("videoAssetId")
+        if video_asset_id:
+            # Uploads are only visible to the user who uploaded them
+            store = get_video_asset_store()
+            video_path = store.path_for(video_asset_id, user_id or "")
+            if not video_path:
+                raise ValueError(f"Video upload {video_asset_id} not found")
+            try:
+                prompt_messages = await assemble_claude_prompt_video_file(video_path)
+            finally:
+                # Each generation uploads its recording again; this one is done
+                store.delete(video_asset_id, user_id or "")
+        else:
+            # Older clients send the whole recording as a data URL
+            video_data_url = prompt["images"][0]
+            prompt_messages = await assemble_claude_prompt_video(video_data_url)
 
     return prompt_messages, image_cache
 
@@ -1,4 +1,5 @@
 from typing import Literal, TypedDict, List
+from typing_extensions import NotRequired
 
 
 class SystemPrompts(TypedDict):
@@ -16,6 +17,8 @@ class PromptContent(TypedDict):
 
     text: str
     images: List[str]
+    # Video mode: ID of a recording uploaded to /api/video-assets
+    videoAssetId: NotRequired[str]
 
 
 Stack = Literal[
@@ -1,24 +1,38 @@
 # /root/screenshot-to-code/backend/routes/auth.py
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import Client
 import os
 from typing import Optional
 from datetime import datetime
+from data.repository import Repository, get_repository
+from data.supabase_client import get_supabase_client
+from services.token_verifier import (
+    InvalidTokenError,
+    LocalVerificationUnavailable,
+    get_token_verifier,
+)
 
 router = APIRouter()
 
-# Initialize Supabase client - REQUIRED for authentication
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-
-if not supabase_url or not supabase_key:
-    raise RuntimeError(
-        "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables. "
-        "Authentication requires Supabase to be configured."
-    )
+def get_auth_client() -> Client:
+    """Shared Supabase client - REQUIRED for authentication"""
+    client = get_supabase_client()
+    if not client:
+        raise HTTPException(
+            status_code=500,
+            detail="SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables. "
+            "Authentication requires Supabase to be configured.",
+        )
+    return client
 
-supabase: Client = create_client(supabase_url, supabase_key)
+def get_credits_repository() -> Repository:
+    """Shared data repository for credit reads and writes"""
+    repository = get_repository()
+    if not repository:
+        raise HTTPException(status_code=500, detail="Credit system not configured")
+    return repository
 
 class UserSignUp(BaseModel):
     email: str
@@ -40,9 +54,8 @@ class UseCredit(BaseModel):
     framework: str
     input_type: str
 
-# Middleware to verify auth token - ALWAYS require authentication
-async def verify_token(request: Request):
-    """Always require authentication via Supabase"""
+def get_request_token(request: Request) -> str:
+    """Access token from the auth cookie or the Authorization header"""
     auth_token = request.cookies.get("sb-auth-token")
     
     # Check Authorization header as fallback
@@ -53,16 +66,51 @@ async def verify_token(request: Request):
     
     if not auth_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    return auth_token
+
+# Middleware to verify auth token - ALWAYS require authentication
+async def verify_token(request: Request):
+    """Always require authentication.
+
+    Tokens are verified locally against the project's signing keys when they
+    are configured, so most requests never call Supabase Auth. Falls back to
+    the remote check when nothing is configured, and for HS256 tokens when
+    SUPABASE_JWT_SECRET isn't set.
+    """
+    auth_token = get_request_token(request)
+    
+    verifier = get_token_verifier()
+    if not verifier.is_configured:
+        return await _get_remote_user(auth_token)
     
     try:
-        # Verify the token with Supabase
-        user_response = supabase.auth.get_user(auth_token)
+        return await verifier.verify(auth_token)
+    except LocalVerificationUnavailable:
+        return await _get_remote_user(auth_token)
+    except InvalidTokenError as e:
+        print(f"Authentication error: {str(e)}")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+async def verify_token_remote(request: Request):
+    """Verify the token with Supabase Auth.
+
+    Slower than verify_token, but sees revoked sessions and returns the full
+    user profile. Use for credit spending and profile reads.
+    """
+    return await _get_remote_user(get_request_token(request))
+
+async def _get_remote_user(auth_token: str):
+    try:
+        # The Supabase client is synchronous; keep it off the event loop
+        user_response = await asyncio.to_thread(get_auth_client().auth.get_user, auth_token)
         
-        if user_response.error:
+        if not user_response or not user_response.user:
             raise HTTPException(status_code=401, detail="Invalid token")
         
         return user_response.user
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail="Authentication failed")
@@ -72,7 +120,7 @@ async def sign_up(user: UserSignUp):
     """Register a new user with Supabase"""
     try:
         # Sign up user with Supabase Auth
-        auth_response = supabase.auth.sign_up({
+        auth_response = get_auth_client().auth.sign_up({
             "email": user.email,
             "password": user.password,
         })
@@ -104,7 +152,7 @@ async def sign_up(user: UserSignUp):
 async def sign_in(user: UserSignIn, response: Response):
     """Sign in a user with Supabase"""
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = get_auth_client().auth.sign_in_with_password({
             "email": user.email,
             "password": user.password
         })
@@ -144,7 +192,7 @@ async def sign_out(request: Request, response: Response):
     if auth_token:
         try:
             # Sign out from Supabase
-            supabase.auth.sign_out()
+            get_auth_client().auth.sign_out()
         except Exception as e:
             print(f"Error signing out from Supabase: {str(e)}")
     
@@ -155,7 +203,7 @@ async def sign_out(request: Request, response: Response):
 async def reset_password(request: ResetPassword):
     """Send password reset email via Supabase"""
     try:
-        response = supabase.auth.reset_password_for_email(
+        response = get_auth_client().auth.reset_password_for_email(
             request.email,
             {
                 "redirect_to": f"{os.environ.get('FRONTEND_URL', 'http://localhost:5173')}/reset-password"
@@ -180,9 +228,10 @@ async def get_user_credits(user_id: str, current_user=Depends(verify_token)):
         if current_user.id != user_id:
             raise HTTPException(status_code=403, detail="Forbidden")
             
-        response = supabase.table("user_credits").select("*").eq("user_id", user_id).single().execute()
+        repository = get_credits_repository()
+        credits = repository.get_user_credits(user_id)
         
-        if hasattr(response, 'error') and response.error:
+        if not credits:
             # This should rarely happen with the trigger in place
             print(f"User credits not found for {user_id}, the trigger should have created them")
             
@@ -190,10 +239,10 @@ async def get_user_credits(user_id: str, current_user=Depends(verify_token)):
             import time
             time.sleep(0.5)  # Brief delay
             
-            retry_response = supabase.table("user_credits").select("*").eq("user_id", user_id).single().execute()
+            retry_credits = repository.get_user_credits(user_id)
             
-            if retry_response.data:
-                return retry_response.data
+            if retry_credits:
+                return retry_credits
             else:
                 # As a last resort, return default values
                 # This allows the frontend to function even if there's an issue
@@ -206,7 +255,7 @@ async def get_user_credits(user_id: str, current_user=Depends(verify_token)):
                     "_note": "Default values returned - check database trigger"
                 }
         
-        return response.data
+        return credits
     
     except HTTPException:
         raise
@@ -215,7 +264,7 @@ async def get_user_credits(user_id: str, current_user=Depends(verify_token)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/user/use-credit")
-async def use_credit(request: UseCredit, current_user=Depends(verify_token)):
+async def use_credit(request: UseCredit, current_user=Depends(verify_token_remote)):
     """Use a credit and log the usage in Supabase"""
     try:
         # Verify the user is using their own credits
@@ -223,13 +272,12 @@ async def use_credit(request: UseCredit, current_user=Depends(verify_token)):
             raise HTTPException(status_code=403, detail="Forbidden")
             
         # Get user credits
-        credits_response = supabase.table("user_credits").select("*").eq("user_id", request.user_id).single().execute()
+        repository = get_credits_repository()
+        credits = repository.get_user_credits(request.user_id)
         
-        if hasattr(credits_response, 'error') and credits_response.error:
+        if not credits:
             raise HTTPException(status_code=404, detail="User credits not found")
         
-        credits = credits_response.data
-        
         # Check if user has credits
         if credits["credits_remaining"] <= 0:
             raise HTTPException(status_code=400, detail="Insufficient credits")
@@ -238,34 +286,38 @@ async def use_credit(request: UseCredit, current_user=Depends(verify_token)):
         new_remaining = credits["credits_remaining"] - 1
         new_used = credits["credits_used"] + 1
         
-        update_response = supabase.table("user_credits").update({
-            "credits_remaining": new_remaining,
-            "credits_used": new_used,
-            "last_used_date": datetime.utcnow().isoformat()
-        }).eq("user_id", request.user_id).eq("credits_remaining", credits["credits_remaining"]).execute()
+        updated_rows = repository.update_user_credits(
+            request.user_id,
+            {
+                "credits_remaining": new_remaining,
+                "credits_used": new_used,
+                "last_used_date": datetime.utcnow().isoformat()
+            },
+            expected_remaining=credits["credits_remaining"],
+        )
         
         # Check if update was successful (using optimistic locking)
-        if not update_response.data or len(update_response.data) == 0:
+        if not updated_rows:
             # Retry once in case of concurrent update
-            credits_response = supabase.table("user_credits").select("*").eq("user_id", request.user_id).single().execute()
-            if credits_response.data and credits_response.data["credits_remaining"] <= 0:
+            latest_credits = repository.get_user_credits(request.user_id)
+            if latest_credits and latest_credits["credits_remaining"] <= 0:
                 raise HTTPException(status_code=400, detail="Insufficient credits")
             else:
                 raise HTTPException(status_code=409, detail="Credit update conflict, please retry")
         
         # Log the conversion
         try:
-            log_response = supabase.table("conversion_history").insert({
+            logged_rows = repository.insert_conversion({
                 "user_id": request.user_id,
                 "model_used": request.model_used,
                 "framework": request.framework,
                 "input_type": request.input_type,
                 "created_at": datetime.utcnow().isoformat()
-            }).execute()
+            })
             
-            if hasattr(log_response, 'error') and log_response.error:
+            if not logged_rows:
                 # Log error but don't fail the request
-                print(f"Error logging conversion: {log_response.error}")
+                print(f"Error logging conversion for user {request.user_id}")
         except Exception as e:
             # Log error but don't fail the request
             print(f"Error logging conversion: {str(e)}")
@@ -278,7 +330,7 @@ async def use_credit(request: UseCredit, current_user=Depends(verify_token)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/user/me")
-async def get_current_user(current_user=Depends(verify_token)):
+async def get_current_user(current_user=Depends(verify_token_remote)):
     """Get current user info from Supabase"""
     return {
         "user": {
@@ -298,7 +350,7 @@ async def refresh_session(request: Request, response: Response):
     
     try:
         # Refresh the session with Supabase
-        auth_response = supabase.auth.refresh_session(refresh_token)
+        auth_response = get_auth_client().auth.refresh_session(refresh_token)
         
         if auth_response.error:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
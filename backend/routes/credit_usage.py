@@ -1,9 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-from supabase import create_client, Client
-import os
 from config.credit_usage import (
     FeatureType, 
     get_all_features_info, 
@@ -13,10 +11,8 @@ from config.credit_usage import (
     is_feature_available
 )
 
-# Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
+from data.pagination import InvalidCursor, list_conversion_page
+from data.repository import get_repository
 
 router = APIRouter()
 
@@ -107,23 +103,22 @@ async def calculate_credit_cost(request: CreditUsageRequest):
 async def get_user_credit_summary(user_id: str):
     """Get comprehensive credit summary for a user"""
     try:
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             raise HTTPException(status_code=500, detail="Credit system not configured")
         
         # Get user credits
-        credits_response = supabase.table("user_credits").select("*").eq("user_id", user_id).single().execute()
+        credits = repository.get_user_credits(user_id)
         
-        if not credits_response.data:
+        if not credits:
             raise HTTPException(status_code=404, detail="User credits not found")
         
-        credits = credits_response.data
-        
         # Calculate usage this month
         current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        usage_response = supabase.table("conversion_history").select("credits_used").eq("user_id", user_id).gte("created_at", current_month.isoformat()).execute()
+        usage_rows = repository.list_conversions_since(user_id, current_month.isoformat(), "credits_used")
         
-        usage_this_month = sum(item.get("credits_used", 1) for item in usage_response.data) if usage_response.data else 0
+        usage_this_month = sum(item.get("credits_used", 1) for item in usage_rows)
         
         # Get available features based on plan
         plan = credits.get("plan", "free")
@@ -143,20 +138,25 @@ async def get_user_credit_summary(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/api/credit-usage/user/{user_id}/history")
-async def get_user_credit_history(user_id: str, limit: int = 50, offset: int = 0):
-    """Get user's credit usage history"""
+async def get_user_credit_history(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+):
+    """Get user's credit usage history, newest first, paginated by (created_at, id) cursor"""
     try:
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             raise HTTPException(status_code=500, detail="Credit system not configured")
         
-        # Get usage history
-        history_response = supabase.table("conversion_history").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(limit).offset(offset).execute()
-        
-        if not history_response.data:
-            return {"history": [], "total_count": 0}
+        try:
+            rows, next_cursor = list_conversion_page(repository, user_id, limit, cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
         history = []
-        for item in history_response.data:
+        for item in rows:
             history.append(CreditUsageHistory(
                 user_id=item["user_id"],
                 feature_type=item.get("feature_type", "code_generation_image"),
@@ -167,16 +167,19 @@ async def get_user_credit_history(user_id: str, limit: int = 50, offset: int = 0
                 created_at=item["created_at"]
             ))
         
-        # Get total count
-        count_response = supabase.table("conversion_history").select("*", count="exact").eq("user_id", user_id).execute()
-        total_count = count_response.count if count_response.count else 0
-        
-        return {
+        result = {
             "history": history,
-            "total_count": total_count,
+            "next_cursor": next_cursor,
             "limit": limit,
-            "offset": offset
         }
+        
+        # Counting is opt-in; the count itself never ships any rows
+        if include_total:
+            result["total_count"] = repository.count_conversions(user_id)
+        
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -184,20 +187,21 @@ async def get_user_credit_history(user_id: str, limit: int = 50, offset: int = 0
 async def get_user_credit_analytics(user_id: str):
     """Get user's credit usage analytics"""
     try:
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             raise HTTPException(status_code=500, detail="Credit system not configured")
         
         # Get usage by feature type
-        usage_response = supabase.table("conversion_history").select("feature_type, credits_used").eq("user_id", user_id).execute()
+        usage_rows = repository.list_conversions_since(user_id, None, "feature_type, credits_used")
         
-        if not usage_response.data:
+        if not usage_rows:
             return {"analytics": {}}
         
         # Aggregate by feature type
         usage_by_feature = {}
         total_credits_used = 0
         
-        for item in usage_response.data:
+        for item in usage_rows:
             feature_type = item.get("feature_type", "code_generation_image")
             credits_used = item.get("credits_used", 1)
             
@@ -216,11 +220,11 @@ async def get_user_credit_analytics(user_id: str):
         
         # Get usage by month (last 6 months)
         six_months_ago = datetime.now() - timedelta(days=180)
-        monthly_usage_response = supabase.table("conversion_history").select("created_at, credits_used").eq("user_id", user_id).gte("created_at", six_months_ago.isoformat()).execute()
+        monthly_usage_rows = repository.list_conversions_since(user_id, six_months_ago.isoformat(), "created_at, credits_used")
         
         monthly_usage = {}
-        if monthly_usage_response.data:
-            for item in monthly_usage_response.data:
+        if monthly_usage_rows:
+            for item in monthly_usage_rows:
                 created_at = datetime.fromisoformat(item["created_at"].replace("Z", "+00:00"))
                 month_key = created_at.strftime("%Y-%m")
                 credits_used = item.get("credits_used", 1)
@@ -252,16 +256,17 @@ async def get_plan_features():
 async def check_feature_availability(user_id: str, feature_type: FeatureType):
     """Check if a feature is available for a user based on their plan"""
     try:
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             raise HTTPException(status_code=500, detail="Credit system not configured")
         
         # Get user's plan
-        credits_response = supabase.table("user_credits").select("plan").eq("user_id", user_id).single().execute()
+        credits = repository.get_user_credits(user_id)
         
-        if not credits_response.data:
+        if not credits:
             raise HTTPException(status_code=404, detail="User not found")
         
-        plan = credits_response.data.get("plan", "free")
+        plan = credits.get("plan", "free")
         available = is_feature_available(feature_type, plan)
         
         return {
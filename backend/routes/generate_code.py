@@ -4,9 +4,10 @@ from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 import traceback
 from typing import Callable, Awaitable
-from fastapi import APIRouter, WebSocket, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 import openai
 from codegen.utils import extract_html_content
+from codegen.validation import find_draft_problems
 from config import (
     ANTHROPIC_API_KEY,
     GEMINI_API_KEY,
@@ -16,6 +17,8 @@ from config import (
     OPENAI_BASE_URL,
     REPLICATE_API_KEY,
     SHOULD_MOCK_AI_RESPONSE,
+    VIDEO_GENERATION_PASSES,
+    VIDEO_SKIP_VALID_REFINEMENT,
 )
 from custom_types import InputMode
 from llm import (
@@ -40,6 +43,8 @@ from typing import (
     Dict,
     List,
     Literal,
+    Tuple,
+    TypeVar,
     cast,
     get_args,
 )
@@ -58,7 +63,13 @@ MessageType = Literal[
     "variantCount",
     "credits",
 ]
-from image_generation.core import generate_images
+from image_generation.core import (
+    ImageGenerationCoalescer,
+    extract_dimensions,
+    generate_images,
+)
+from image_generation.local import is_local_image
+from image_generation.streaming import StreamingImageDetector
 from prompts import create_prompt
 from prompts.claude_prompts import VIDEO_PROMPT
 from prompts.types import Stack, PromptContent
@@ -66,30 +77,26 @@ from prompts.types import Stack, PromptContent
 # from utils import pprint_prompt
 from ws.constants import APP_ERROR_WEB_SOCKET_CODE  # type: ignore
 
-# Add Supabase client for credit system
-from supabase import create_client, Client
+# Shared data-access layer for the credit system
+from data.repository import get_repository
 
 # Import credit usage configuration
 from config.credit_usage import FeatureType, get_credit_cost, calculate_dynamic_cost
-import os
 from datetime import datetime
-import stripe
-
-# Initialize Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
 
 router = APIRouter()
 
+T = TypeVar("T")
+
 # Add a function to check and use credits
 def check_and_use_credit(user_id: str, model: str, stack: str, input_mode: str, feature_type: FeatureType = None, **kwargs) -> tuple[bool, str, int]:
     """
     Check if the user has credits and use the appropriate amount based on feature type
     Returns (success, message, remaining_credits)
     """
-    if not supabase:
-        # If Supabase is not configured, don't check credits (for development)
+    repository = get_repository()
+    if not repository:
+        # If the credit database is not configured, don't check credits (for development)
         print("Supabase not configured, skipping credit check")
         return True, "Development mode", 999
     
@@ -106,16 +113,14 @@ def check_and_use_credit(user_id: str, model: str, stack: str, input_mode: str,
         
         print(f"Credit cost for {feature_type}: {credit_cost} credits")
         
-        # Get user credits - Note: Supabase Python client is synchronous
-        credits_response = supabase.table("user_credits").select("*").eq("user_id", user_id).single().execute()
+        # Get user credits - Note: the repository is synchronous
+        credits = repository.get_user_credits(user_id)
         
-        if not credits_response.data:
+        if not credits:
             # User has no credit record, create one with 0 credits
             print(f"No credit record found for user {user_id}")
             return False, "No credits found. Please sign up to get free credits.", 0
         
-        credits = credits_response.data
-        
         # Check if user has sufficient credits
         if credits["credits_remaining"] < credit_cost:
             return False, f"Insufficient credits. Need {credit_cost} credits, have {credits['credits_remaining']}", credits["credits_remaining"]
@@ -124,19 +129,19 @@ def check_and_use_credit(user_id: str, model: str, stack: str, input_mode: str,
         new_remaining = credits["credits_remaining"] - credit_cost
         new_used = credits["credits_used"] + credit_cost
         
-        update_response = supabase.table("user_credits").update({
+        updated_rows = repository.update_user_credits(user_id, {
             "credits_remaining": new_remaining,
             "credits_used": new_used,
             "last_used_date": datetime.now().isoformat()
-        }).eq("user_id", user_id).execute()
+        })
         
-        if not update_response.data:
+        if not updated_rows:
             print(f"Error updating credits")
             return False, "Failed to update credits", credits["credits_remaining"]
         
         # Log the conversion with feature type
         try:
-            log_response = supabase.table("conversion_history").insert({
+            logged_rows = repository.insert_conversion({
                 "user_id": user_id,
                 "model_used": model,
                 "framework": stack,
@@ -144,9 +149,9 @@ def check_and_use_credit(user_id: str, model: str, stack: str, input_mode: str,
                 "feature_type": feature_type.value,
                 "credits_used": credit_cost,
                 "created_at": datetime.now().isoformat()
-            }).execute()
+            })
             
-            if not log_response.data:
+            if not logged_rows:
                 # Log error but don't fail the request
                 print(f"Error logging conversion")
         except Exception as e:
@@ -302,6 +307,31 @@ class WebSocketCommunicator:
         print("Received params")
         return params
 
+    async def run_until_disconnect(self, work: Awaitable[T]) -> T:
+        """Await `work`, cancelling it if the client disconnects first.
+
+        The client sends nothing after the params, so the only message we
+        can receive meanwhile is the disconnect.
+        """
+        work_task = asyncio.ensure_future(work)
+        try:
+            while not work_task.done():
+                receive_task = asyncio.create_task(self.websocket.receive())
+                done, _ = await asyncio.wait(
+                    {work_task, receive_task}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if receive_task not in done:
+                    receive_task.cancel()
+                elif (
+                    receive_task.exception()
+                    or receive_task.result()["type"] == "websocket.disconnect"
+                ):
+                    self.is_closed = True
+                    raise WebSocketDisconnect()
+        finally:
+            work_task.cancel()
+        return work_task.result()
+
     async def close(self) -> None:
         """Close the WebSocket connection"""
         if not self.is_closed:
@@ -529,6 +559,7 @@ class PromptCreationStage:
                 prompt=extracted_params.prompt,
                 history=extracted_params.history,
                 is_imported_from_code=extracted_params.is_imported_from_code,
+                user_id=extracted_params.user_id,
             )
 
             print_prompt_summary(prompt_messages, truncate=False)
@@ -596,8 +627,31 @@ class VideoGenerationStage:
             )
             raise Exception("No Anthropic key")
 
+        drafts_sent = 0
+
         async def process_chunk(content: str, variantIndex: int):
-            await self.send_message("chunk", content, variantIndex)
+            # Once a draft is shown, refinement passes would append to it
+            if not drafts_sent:
+                await self.send_message("chunk", content, variantIndex)
+
+        async def send_draft(response: str):
+            # Show the draft while it's being refined
+            nonlocal drafts_sent
+            drafts_sent += 1
+            await self.send_message("setCode", extract_html_content(response), 0)
+            await self.send_message(
+                "status",
+                f"Draft ready. Refining (pass {drafts_sent + 1} of {VIDEO_GENERATION_PASSES})...",
+                0,
+            )
+
+        def should_refine(response: str) -> bool:
+            if not VIDEO_SKIP_VALID_REFINEMENT:
+                return True
+            problems = find_draft_problems(extract_html_content(response))
+            if problems:
+                print(f"Refining video draft: {'; '.join(problems)}")
+            return bool(problems)
 
         completion_results = [
             await stream_claude_response_native(
@@ -607,6 +661,9 @@ class VideoGenerationStage:
                 callback=lambda x: process_chunk(x, 0),
                 model_name=Llm.CLAUDE_3_OPUS.value,
                 include_thinking=True,
+                max_passes=VIDEO_GENERATION_PASSES,
+                should_refine=should_refine,
+                on_draft=send_draft,
             )
         ]
         completions = [result["code"] for result in completion_results]
@@ -659,6 +716,10 @@ class ParallelGenerationStage:
         self.openai_base_url = openai_base_url
         self.anthropic_api_key = anthropic_api_key
         self.should_generate_images = should_generate_images
+        # Images are generated once per request, however many variants ask for them
+        self.image_coalescer = ImageGenerationCoalescer()
+        self.image_detectors: Dict[int, StreamingImageDetector] = {}
+        self.image_cache: Dict[str, str] = {}
 
     async def process_variants(
         self,
@@ -668,6 +729,7 @@ class ParallelGenerationStage:
         params: Dict[str, str],
     ) -> Dict[int, str]:
         """Process all variants in parallel and return completions"""
+        self.image_cache = image_cache
         tasks = self._create_generation_tasks(variant_models, prompt_messages, params)
 
         # Dictionary to track variant tasks and their status
@@ -746,8 +808,52 @@ class ParallelGenerationStage:
 
     async def _process_chunk(self, content: str, variant_index: int):
         """Process streaming chunks"""
+        self._prefetch_images(content, variant_index)
         await self.send_message("chunk", content, variant_index)
 
+    def _prefetch_images(self, content: str, variant_index: int) -> None:
+        """Start generating images for placeholder <img> tags as soon as they are streamed"""
+        image_generation = self._get_image_generation_model()
+        if not image_generation:
+            return
+
+        detector = self.image_detectors.setdefault(variant_index, StreamingImageDetector())
+        # Images higher up the page are generated first
+        first_priority = detector.images_seen
+        dimensions: Dict[str, Tuple[int, int]] = {}
+        for tag in detector.feed(content):
+            alt = tag.get("alt")
+            width, height = extract_dimensions(tag.get("src") or "")
+            # Tiny images are rendered locally when the variant completes
+            if (
+                alt is not None
+                and self.image_cache.get(alt) is None
+                and not is_local_image(width, height)
+            ):
+                dimensions[alt] = (width, height)
+        if dimensions:
+            model, api_key = image_generation
+            self.image_coalescer.prefetch(
+                list(dimensions),
+                api_key,
+                self.openai_base_url,
+                model,
+                first_priority,
+                dimensions,
+            )
+
+    def _get_image_generation_model(
+        self,
+    ) -> Tuple[Literal["dalle3", "flux"], str] | None:
+        """The image model and key to use, or None if images shouldn't be generated"""
+        if not self.should_generate_images:
+            return None
+        if REPLICATE_API_KEY:
+            return "flux", REPLICATE_API_KEY
+        if self.openai_api_key:
+            return "dalle3", self.openai_api_key
+        return None
+
     async def _stream_openai_with_error_handling(
         self,
         prompt_messages: List[ChatCompletionMessageParam],
@@ -814,18 +920,11 @@ class ParallelGenerationStage:
         if not self.should_generate_images:
             return completion
 
-        replicate_api_key = REPLICATE_API_KEY
-        if replicate_api_key:
-            image_generation_model = "flux"
-            api_key = replicate_api_key
-        else:
-            if not self.openai_api_key:
-                print(
-                    "No OpenAI API key and Replicate key found. Skipping image generation."
-                )
-                return completion
-            image_generation_model = "dalle3"
-            api_key = self.openai_api_key
+        image_generation = self._get_image_generation_model()
+        if not image_generation:
+            print("No OpenAI API key and Replicate key found. Skipping image generation.")
+            return completion
+        image_generation_model, api_key = image_generation
 
         print("Generating images with model: ", image_generation_model)
 
@@ -835,6 +934,7 @@ class ParallelGenerationStage:
             base_url=self.openai_base_url,
             image_cache=image_cache,
             model=image_generation_model,
+            coalescer=self.image_coalescer,
         )
 
     async def _process_variant_completion(
@@ -942,7 +1042,7 @@ class CreditCheckMiddleware(Middleware):
         input_mode = context.extracted_params.input_mode
         generation_type = context.extracted_params.generation_type
 
-        if IS_PROD or supabase:
+        if IS_PROD or get_repository():
             if not user_id:
                 await context.throw_error("Authentication required. Please sign in to use the service.")
                 return
@@ -1006,11 +1106,19 @@ class PromptCreationMiddleware(Middleware):
     ) -> None:
         prompt_creator = PromptCreationStage(context.throw_error)
         assert context.extracted_params is not None
-        context.prompt_messages, context.image_cache = (
-            await prompt_creator.create_prompt(
-                context.extracted_params,
-            )
-        )
+        assert context.ws_comm is not None
+        create_prompt = prompt_creator.create_prompt(context.extracted_params)
+        if context.extracted_params.input_mode == "video":
+            # Frame extraction takes seconds; stop it if the client goes away
+            try:
+                context.prompt_messages, context.image_cache = (
+                    await context.ws_comm.run_until_disconnect(create_prompt)
+                )
+            except WebSocketDisconnect:
+                print("Client disconnected during video frame extraction")
+                return
+        else:
+            context.prompt_messages, context.image_cache = await create_prompt
 
         await next_func()
 
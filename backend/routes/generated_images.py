@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from image_generation.blob_store import IMAGE_ROUTE, get_blob_store
+
+router = APIRouter()
+
+# Blob names are content hashes, so a URL's content never changes
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get(IMAGE_ROUTE + "/{name}")
+async def get_generated_image(name: str, request: Request):
+    store = get_blob_store()
+    path = store.path_for(name) if store else None
+    if not store or not path:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{name.split(".")[0]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    store.touch(name)
+    return FileResponse(
+        path,
+        media_type=store.content_type_for(name),
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -1,28 +1,29 @@
 # /backend/routes/payments.py
-from fastapi import APIRouter, Depends, HTTPException, Request, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Body
 from fastapi.responses import JSONResponse
-from supabase import create_client, Client
+import asyncio
 import stripe
 import os
+import time
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import json
-from datetime import datetime, timedelta
-from ..services.pricing_service import PricingService
-
-# Initialize Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
+from datetime import datetime, timedelta, timezone
+from data.repository import Repository, get_repository
+from data.supabase_client import get_supabase_client
+from services.pricing_service import PricingService
 
 # Initialize Stripe
 stripe_key = os.environ.get("STRIPE_SECRET_KEY")
 if stripe_key:
     stripe.api_key = stripe_key
 endpoint_secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
+# An event still unprocessed this long after it was acknowledged is assumed
+# lost (e.g. the worker restarted) and is processed by the next Stripe retry
+STUCK_EVENT_SECONDS = 300
 
-# Initialize pricing service
-pricing_service = PricingService(supabase) if supabase else None
+# Pricing service (reads through the shared repository)
+pricing_service = PricingService()
 
 router = APIRouter()
 
@@ -35,6 +36,7 @@ async def create_checkout_session(request: CheckoutSessionRequest):
     """Create a Stripe checkout session for purchasing credits"""
     try:
         # Handle development mode
+        supabase = get_supabase_client()
         if not stripe_key or not supabase:
             return {
                 "sessionId": "dev_session_id", 
@@ -51,13 +53,12 @@ async def create_checkout_session(request: CheckoutSessionRequest):
             print(f"Error getting user: {str(e)}")
             raise HTTPException(status_code=404, detail="User not found")
             
-        # Get plan details
-        if request.planId not in PLANS:
+        # Get plan details (served from the pricing cache, never waits on the database)
+        plan = await pricing_service.get_pricing_plan_by_id(request.planId)
+        if not plan:
             raise HTTPException(status_code=400, detail="Invalid plan ID")
-            
-        plan = PLANS[request.planId]
         
-        if not plan["price_id"]:
+        if not plan.get("stripe_price_id"):
             raise HTTPException(status_code=500, detail="Stripe price ID not configured")
         
         # Create checkout session for one-time payment
@@ -70,7 +71,7 @@ async def create_checkout_session(request: CheckoutSessionRequest):
             payment_method_types=["card"],
             line_items=[
                 {
-                    "price": plan["price_id"],
+                    "price": plan["stripe_price_id"],
                     "quantity": 1,
                 },
             ],
@@ -96,14 +97,78 @@ async def create_checkout_session(request: CheckoutSessionRequest):
         print(f"Error creating checkout session: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def process_stripe_event(event: Dict[str, Any]) -> None:
+    """Apply a verified, newly recorded Stripe event (runs after the webhook has been acknowledged)"""
+    repository = get_repository()
+    assert repository is not None
+    event_id = event["id"]
+    
+    try:
+        # Handle the checkout.session.completed event for one-time payments
+        if event["type"] == "checkout.session.completed":
+            session = event["data"]["object"]
+            
+            # Get user and plan from metadata
+            user_id = session["metadata"]["userId"]
+            plan_id = session["metadata"]["planId"]
+            credits = int(session["metadata"]["credits"])
+            
+            # Check if the payment was successful
+            if session["payment_status"] != "paid":
+                print(f"Checkout session {session['id']} not paid yet, skipping")
+            # Logging the purchase claims the session, so it is only ever credited
+            # once, even if Stripe sends it under several events or a retry
+            # follows a timeout
+            elif not repository.credit_checkout_session({
+                "user_id": user_id,
+                "amount": session["amount_total"] / 100,  # Convert from cents
+                "credits_purchased": credits,
+                "plan": plan_id,
+                "stripe_session_id": session["id"],
+                "payment_date": datetime.now().isoformat(),
+                "status": "completed"
+            }):
+                print(f"Checkout session {session['id']} already credited, skipping")
+            else:
+                print(f"Successfully processed payment for user {user_id}: {credits} credits added")
+        
+        repository.update_webhook_event(event_id, {
+            "status": "processed",
+            "processed_at": datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        print(f"Error processing webhook event {event_id}: {str(e)}")
+        # Marked failed so the next Stripe retry of this event is processed again
+        repository.update_webhook_event(event_id, {"status": "failed", "error": str(e)})
+
+def _take_over_event(repository: Repository, event_id: str) -> bool:
+    """Claim an already recorded event for reprocessing by this retry.
+
+    Only an event whose processing failed, or that has been stuck in
+    `received` for STUCK_EVENT_SECONDS (the worker died before processing
+    it; background tasks don't survive a restart), is picked up again. Both
+    are conditional updates, so only one retry wins.
+    """
+    now = datetime.now(timezone.utc)
+    if repository.update_webhook_event(
+        event_id, {"status": "received", "error": None, "received_at": now.isoformat()}, "failed"
+    ):
+        return True
+    stuck_before = (now - timedelta(seconds=STUCK_EVENT_SECONDS)).isoformat()
+    return bool(repository.update_webhook_event(
+        event_id, {"received_at": now.isoformat()}, "received", received_before=stuck_before
+    ))
+
 @router.post("/webhook")
-async def stripe_webhook(request: Request):
-    """Handle Stripe webhook events for payment processing"""
+async def stripe_webhook(request: Request, background_tasks: BackgroundTasks):
+    """Verify, record and acknowledge a Stripe webhook; processing happens in the background"""
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     
     # Handle development mode
-    if not supabase or not stripe_key or not endpoint_secret:
+    repository = get_repository()
+    if not repository or not stripe_key or not endpoint_secret:
         return JSONResponse(content={"status": "success", "mode": "development"})
     
     try:
@@ -117,72 +182,50 @@ async def stripe_webhook(request: Request):
         print(f"Invalid signature: {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # Handle the checkout.session.completed event for one-time payments
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        
-        # Check if the payment was successful
-        if session["payment_status"] != "paid":
-            return JSONResponse(content={"status": "pending"})
-        
-        # Get user and plan from metadata
-        user_id = session["metadata"]["userId"]
-        plan_id = session["metadata"]["planId"]
-        credits = int(session["metadata"]["credits"])
-        
-        try:
-            # Update the user's credits in the database
-            # Check if user already has credits - Supabase calls are synchronous
-            user_credits_response = supabase.table("user_credits").select("*").eq("user_id", user_id).execute()
-            
-            if user_credits_response.data and len(user_credits_response.data) > 0:
-                # Add to existing credits
-                current_credits = user_credits_response.data[0]["credits_remaining"]
-                
-                update_response = supabase.table("user_credits").update({
-                    "credits_remaining": current_credits + credits,
-                    "last_purchase_date": datetime.now().isoformat(),
-                    "plan": plan_id
-                }).eq("user_id", user_id).execute()
-                
-                if not update_response.data:
-                    print(f"Failed to update credits for user {user_id}")
-            else:
-                # Create new credit record
-                insert_response = supabase.table("user_credits").insert({
-                    "user_id": user_id,
-                    "credits_remaining": credits,
-                    "credits_used": 0,
-                    "plan": plan_id,
-                    "last_purchase_date": datetime.now().isoformat()
-                }).execute()
-                
-                if not insert_response.data:
-                    print(f"Failed to create credit record for user {user_id}")
-            
-            # Log the purchase
-            payment_history_response = supabase.table("payment_history").insert({
-                "user_id": user_id,
-                "amount": session["amount_total"] / 100,  # Convert from cents
-                "credits_purchased": credits,
-                "plan": plan_id,
-                "stripe_session_id": session["id"],
-                "payment_date": datetime.now().isoformat(),
-                "status": "completed"
-            }).execute()
-            
-            if not payment_history_response.data:
-                print(f"Failed to log payment history for user {user_id}")
-            
-            print(f"Successfully processed payment for user {user_id}: {credits} credits added")
-            
-        except Exception as e:
-            print(f"Error processing webhook: {str(e)}")
-            # Don't raise exception here as payment was successful
-            # Log error but return success to Stripe
+    event_id = event["id"]
+    
+    # Record the event ID before acknowledging; Stripe retries of an accepted event are no-ops
+    try:
+        is_new_event = await asyncio.to_thread(repository.record_webhook_event, event_id, event["type"])
+        if not is_new_event:
+            is_new_event = await asyncio.to_thread(_take_over_event, repository, event_id)
+    except Exception as e:
+        # Let Stripe retry later rather than risk losing the event
+        print(f"Error recording webhook event {event_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Could not record event")
     
+    if not is_new_event:
+        return JSONResponse(content={"status": "duplicate"})
+    
+    background_tasks.add_task(process_stripe_event, event)
     return JSONResponse(content={"status": "success"})
 
+# Checkout sessions retrieved from Stripe: session_id -> (session, expires_at)
+_checkout_session_cache: Dict[str, tuple[Any, float]] = {}
+PAID_SESSION_CACHE_TTL_SECONDS = 600  # A paid session no longer changes
+UNPAID_SESSION_CACHE_TTL_SECONDS = 5  # Absorbs polling from the payment success page
+MAX_CACHED_SESSIONS = 1024
+
+async def retrieve_checkout_session(session_id: str) -> Any:
+    """Cached stripe.checkout.Session.retrieve that doesn't block the event loop"""
+    cached = _checkout_session_cache.get(session_id)
+    if cached and time.monotonic() < cached[1]:
+        return cached[0]
+    
+    session = await asyncio.to_thread(stripe.checkout.Session.retrieve, session_id)
+    
+    if len(_checkout_session_cache) >= MAX_CACHED_SESSIONS:
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in _checkout_session_cache.items() if expires_at <= now]:
+            del _checkout_session_cache[key]
+        if len(_checkout_session_cache) >= MAX_CACHED_SESSIONS:
+            _checkout_session_cache.clear()
+    
+    is_paid = bool(session) and session["payment_status"] == "paid"
+    ttl = PAID_SESSION_CACHE_TTL_SECONDS if is_paid else UNPAID_SESSION_CACHE_TTL_SECONDS
+    _checkout_session_cache[session_id] = (session, time.monotonic() + ttl)
+    return session
+
 @router.post("/verify-payment")
 async def verify_payment(session_id: str = Body(..., embed=True)):
     """Verify a payment session after successful checkout"""
@@ -196,7 +239,7 @@ async def verify_payment(session_id: str = Body(..., embed=True)):
             }
             
         # Retrieve the session from Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = await retrieve_checkout_session(session_id)
         
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -216,7 +259,8 @@ async def get_user_credits(user_id: str):
     """Get a user's credit balance"""
     try:
         # Handle development mode
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             return {
                 "credits_remaining": 999,
                 "credits_used": 0,
@@ -225,11 +269,11 @@ async def get_user_credits(user_id: str):
                 "mode": "development"
             }
             
-        # Supabase calls are synchronous
-        response = supabase.table("user_credits").select("*").eq("user_id", user_id).single().execute()
+        # Repository calls are synchronous
+        credits = repository.get_user_credits(user_id)
         
-        if response.data:
-            return response.data
+        if credits:
+            return credits
         else:
             # If user doesn't have credits yet, return 0
             return {
@@ -254,33 +298,35 @@ async def get_user_transactions(user_id: str):
     """Get a user's transaction history"""
     try:
         # Handle development mode
-        if not supabase:
+        repository = get_repository()
+        if not repository:
             return []
             
         # Get payment history
-        payment_response = supabase.table("payment_history").select("*").eq("user_id", user_id).order("payment_date", desc=True).execute()
+        payments = repository.list_payments(user_id)
         
         # Get usage history (recent conversions)
-        usage_response = supabase.table("conversion_history").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(50).execute()
+        usages = repository.list_conversions(user_id, 50)
         
         transactions = []
+        plan_names = {plan["id"]: plan["name"] for plan in await pricing_service.get_all_pricing_plans()}
         
         # Add payment transactions
-        if payment_response.data:
-            for payment in payment_response.data:
+        if payments:
+            for payment in payments:
                 transactions.append({
                     "id": payment.get("id"),
                     "type": "purchase",
                     "amount": payment.get("credits_purchased", 0),
-                    "package": PLANS.get(payment.get("plan", ""), {}).get("name", payment.get("plan", "")),
+                    "package": plan_names.get(payment.get("plan", ""), payment.get("plan", "")),
                     "created_at": payment.get("payment_date"),
                     "status": payment.get("status", "completed"),
                     "description": f"Purchased {payment.get('credits_purchased', 0)} credits"
                 })
         
         # Add usage transactions
-        if usage_response.data:
-            for usage in usage_response.data:
+        if usages:
+            for usage in usages:
                 transactions.append({
                     "id": usage.get("id"),
                     "type": "usage",
@@ -302,19 +348,21 @@ async def get_user_transactions(user_id: str):
 @router.get("/pricing")
 async def get_pricing():
     """Get current pricing plans"""
+    plans = await pricing_service.get_all_pricing_plans()
+    config = await pricing_service.get_pricing_config()
     return {
         "plans": [
             {
-                "id": plan_id,
-                "name": plan_data["name"],
-                "credits": plan_data["credits"],
-                "price": plan_data["amount"] / 100,  # Convert from cents to dollars
-                "price_per_credit": round((plan_data["amount"] / 100) / plan_data["credits"], 2),
-                "description": plan_data["description"],
-                "popular": plan_id == "basic"  # Mark basic plan as popular
+                "id": plan["id"],
+                "name": plan["name"],
+                "credits": plan["credits"],
+                "price": plan["price_cents"] / 100,  # Convert from cents to dollars
+                "price_per_credit": round((plan["price_cents"] / 100) / plan["credits"], 2),
+                "description": plan["description"],
+                "popular": bool(plan.get("is_recommended", False))
             }
-            for plan_id, plan_data in PLANS.items()
+            for plan in plans
         ],
-        "currency": "USD",
-        "price_per_credit": 0.15
-    }
\ No newline at end of file
+        "currency": config.get("currency", "USD"),
+        "price_per_credit": config.get("price_per_credit", 0.15)
+    }
@@ -4,15 +4,8 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import httpx
 from urllib.parse import urlparse
-import os
-from supabase import create_client, Client
 from config.credit_usage import FeatureType, get_credit_cost
 
-# Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
-
 # Import credit checking function
 from routes.generate_code import check_and_use_credit
 
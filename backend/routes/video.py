@@ -11,12 +11,7 @@ from database import SessionLocal, PredictionResultDB
 from services import get_scene_graph_from_video_async
 from models.scene_graph import PredictionResult
 from config.credit_usage import FeatureType, get_credit_cost
-from supabase import create_client, Client
-
-# Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url and supabase_key else None
+from config import SCENE_GRAPH_UPLOAD_DIR
 
 # Import credit checking function
 from routes.generate_code import check_and_use_credit
@@ -24,7 +19,7 @@ from routes.generate_code import check_and_use_credit
 router = APIRouter()
 
 # Ensure the upload directory exists
-UPLOAD_DIRECTORY = "/tmp/videos"
+UPLOAD_DIRECTORY = SCENE_GRAPH_UPLOAD_DIR
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
 def cleanup_old_files(directory: str, max_age_hours: int = 24):
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+
+from routes.auth import verify_token
+from video.assets import (
+    UploadOffsetError,
+    UploadQuotaError,
+    UploadTooLargeError,
+    get_video_asset_store,
+)
+
+router = APIRouter()
+
+
+class VideoAssetResponse(BaseModel):
+    assetId: str
+    size: int
+
+
+@router.post("/video-assets", response_model=VideoAssetResponse)
+async def create_video_asset(request: Request, current_user=Depends(verify_token)):
+    """Start a video upload. The request body (raw bytes) is its first chunk."""
+    store = get_video_asset_store()
+    try:
+        asset_id = store.create(current_user.id)
+    except UploadQuotaError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    try:
+        size = await store.append(asset_id, current_user.id, 0, request.stream())
+    except (UploadTooLargeError, UploadQuotaError) as e:
+        store.delete(asset_id, current_user.id)
+        status_code = 413 if isinstance(e, UploadTooLargeError) else 429
+        raise HTTPException(status_code=status_code, detail=str(e))
+    return VideoAssetResponse(assetId=asset_id, size=size)
+
+
+@router.post("/video-assets/{asset_id}", response_model=VideoAssetResponse)
+async def append_video_asset(
+    asset_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user=Depends(verify_token),
+):
+    """Append the request body to an upload; `offset` must be the current size"""
+    store = get_video_asset_store()
+    try:
+        size = await store.append(asset_id, current_user.id, offset, request.stream())
+    except FileNotFoundError:
+        # Also for other users' uploads, so IDs can't be probed
+        raise HTTPException(status_code=404, detail="Video upload not found")
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadQuotaError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return VideoAssetResponse(assetId=asset_id, size=size)
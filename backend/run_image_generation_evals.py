@@ -52,7 +52,7 @@ async def generate_and_save_images(
 
     # Generate images
     results: List[Optional[str]] = await process_tasks(
-        prompts, api_key, None, model=model
+        prompts, api_key, None, model=model, use_cache=False
     )
 
     # Save images to disk
@@ -0,0 +1,106 @@
+# Benchmarks the <img> src rewriter used by generate_images against the
+# previous BeautifulSoup + prettify implementation.
+#
+# Usage: poetry run python run_img_rewrite_benchmark.py [page.html ...]
+# Without arguments a synthetic page of increasing size is used.
+
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from image_generation.core import extract_dimensions
+from image_generation.img_tags import ImgTag, rewrite_img_tags
+
+ITERATIONS = 20
+
+
+def synthetic_page(sections: int) -> str:
+    cards = "\n".join(
+        f"""      <div class="card p-4 shadow rounded-lg">
+        <img src="https://placehold.co/{300 + i % 5}x200" alt="Product photo {i % 10}" class="w-full">
+        <h3 class="text-lg font-bold">Product {i}</h3>
+        <p class="text-gray-600">A short description of product {i} &amp; its features.</p>
+        <button class="bg-blue-500 text-white px-4 py-2">Buy now</button>
+      </div>"""
+        for i in range(sections)
+    )
+    return f"""<html>
+  <head>
+    <script src="https://cdn.tailwindcss.com"></script>
+  </head>
+  <body>
+    <div class="grid grid-cols-3 gap-4">
+{cards}
+    </div>
+  </body>
+</html>"""
+
+
+def mapping_for(code: str) -> Dict[str, str]:
+    soup = BeautifulSoup(code, "html.parser")
+    return {
+        img.get("alt"): f"https://images.example.com/{i}.png"
+        for i, img in enumerate(soup.find_all("img"))
+    }
+
+
+def rewrite_with_beautifulsoup(code: str, urls: Dict[str, str]) -> str:
+    soup = BeautifulSoup(code, "html.parser")
+    for img in soup.find_all("img"):
+        if not img["src"].startswith("https://placehold.co"):
+            continue
+        new_url = urls.get(img.get("alt"))
+        if new_url:
+            width, height = extract_dimensions(img["src"])
+            img["width"] = width
+            img["height"] = height
+            img["src"] = new_url
+    return soup.prettify()
+
+
+def rewrite_with_scanner(code: str, urls: Dict[str, str]) -> str:
+    def replace_image(img: ImgTag):
+        src = img.get("src") or ""
+        new_url = urls.get(img.get("alt") or "")
+        if not src.startswith("https://placehold.co") or not new_url:
+            return None
+        width, height = extract_dimensions(src)
+        return {"src": new_url, "width": str(width), "height": str(height)}
+
+    return rewrite_img_tags(code, replace_image)
+
+
+def measure(
+    rewrite: Callable[[str, Dict[str, str]], str], code: str, urls: Dict[str, str]
+) -> Tuple[float, int]:
+    output = rewrite(code, urls)
+    start_time = time.perf_counter()
+    for _ in range(ITERATIONS):
+        rewrite(code, urls)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000 / ITERATIONS
+    return elapsed_ms, len(output.encode("utf-8"))
+
+
+def main(paths: List[str]) -> None:
+    if paths:
+        pages = [(path, open(path, encoding="utf-8").read()) for path in paths]
+    else:
+        pages = [(f"synthetic x{n}", synthetic_page(n)) for n in (10, 100, 1000)]
+
+    print(f"{'page':<24}{'input KB':>10}{'bs4 ms':>10}{'bs4 KB':>10}{'scan ms':>10}{'scan KB':>10}{'speedup':>10}")
+    for name, code in pages:
+        urls = mapping_for(code)
+        bs4_ms, bs4_bytes = measure(rewrite_with_beautifulsoup, code, urls)
+        scan_ms, scan_bytes = measure(rewrite_with_scanner, code, urls)
+        print(
+            f"{name[:23]:<24}{len(code.encode('utf-8')) / 1024:>10.1f}"
+            f"{bs4_ms:>10.2f}{bs4_bytes / 1024:>10.1f}"
+            f"{scan_ms:>10.2f}{scan_bytes / 1024:>10.1f}"
+            f"{bs4_ms / scan_ms:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+# Benchmarks webpage text extraction for webpage-to-video: every string on
+# the page (the previous implementation) against the readable main content
+# capped at WEBPAGE_TEXT_MAX_TOKENS.
+#
+# Pages are read from a local corpus of saved pages (page_text_evals/pages/
+# *.html, or the files given as arguments), so results don't depend on the
+# network. Without a corpus, synthetic pages of increasing size are used.
+#
+# Usage: poetry run python run_page_text_benchmark.py [page.html ...]
+
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from config import WEBPAGE_TEXT_MAX_TOKENS
+from video.page_text import estimate_text_tokens, extract_readable_text
+
+CORPUS_DIR = "./page_text_evals/pages"
+RUNS = 3
+
+
+def all_strings(html: bytes) -> str:
+    """The previous implementation: every string on the page"""
+    soup = BeautifulSoup(html, "html.parser")
+    return " ".join(soup.stripped_strings)
+
+
+def synthetic_page(paragraphs: int) -> bytes:
+    """A news-like page: scripts, navigation, a cookie banner, an article and a long footer"""
+    script = "<script>" + "window.track('event', {id: 1});" * 2000 + "</script>"
+    nav = "<nav><ul>" + "".join(f'<li><a href="/s{i}">Section {i}</a></li>' for i in range(80)) + "</ul></nav>"
+    cookie = '<div class="cookie-consent"><p>We use cookies to personalise content and ads.</p></div>'
+    article = "<article><h1>Headline</h1>" + "".join(
+        f"<p>Paragraph {i}: the committee, which met on Tuesday, discussed the budget, "
+        f"the schedule and the next steps in considerable detail.</p>"
+        for i in range(paragraphs)
+    ) + "</article>"
+    footer = "<footer>" + "".join(f'<a href="/f{i}">Footer link {i}</a>' for i in range(300)) + "</footer>"
+    return (
+        f"<html><head><title>Synthetic page</title>{script}</head>"
+        f"<body>{nav}{cookie}{article}{footer}{script}</body></html>"
+    ).encode("utf-8")
+
+
+def menu_page(items: int) -> bytes:
+    """A short article after a long flat list of boilerplate siblings"""
+    menu = "".join(f'<div class="menu-item"><a href="/m{i}">Item {i}</a></div>' for i in range(items))
+    article = "<article><h1>Headline</h1>" + "".join(
+        f"<p>Paragraph {i}: the committee, which met on Tuesday, discussed the budget.</p>"
+        for i in range(10)
+    ) + "</article>"
+    return f"<html><body><div>{menu}</div>{article}</body></html>".encode("utf-8")
+
+
+def load_pages(args: List[str]) -> List[Tuple[str, bytes]]:
+    paths = args or (
+        sorted(
+            os.path.join(CORPUS_DIR, name)
+            for name in os.listdir(CORPUS_DIR)
+            if name.lower().endswith((".html", ".htm"))
+        )
+        if os.path.isdir(CORPUS_DIR)
+        else []
+    )
+    if not paths:
+        print(f"No saved pages in {CORPUS_DIR}; using synthetic pages")
+        return [(f"synthetic_{n}p", synthetic_page(n)) for n in (20, 200, 2000, 20000)] + [
+            (f"menu_{n}", menu_page(n)) for n in (2000, 20000)
+        ]
+    pages: List[Tuple[str, bytes]] = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def measure(extract: Callable[[bytes], str], html: bytes) -> Tuple[float, str]:
+    """Median extraction time in seconds, and the extracted text"""
+    times: List[float] = []
+    text = ""
+    for _ in range(RUNS):
+        start_time = time.perf_counter()
+        text = extract(html)
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times), text
+
+
+def main(args: List[str]) -> None:
+    pages = load_pages(args)
+    print(f"Token cap: {WEBPAGE_TEXT_MAX_TOKENS}")
+    print(
+        f"{'page':<28}{'KB':>8}{'all s':>8}{'all tokens':>12}"
+        f"{'readable s':>12}{'readable tokens':>17}"
+    )
+    for name, html in pages:
+        all_time, all_text = measure(all_strings, html)
+        readable_time, readable_text = measure(extract_readable_text, html)
+        print(
+            f"{name[:27]:<28}{len(html) / 1024:>8.0f}{all_time:>8.3f}"
+            f"{estimate_text_tokens(all_text):>12}{readable_time:>12.3f}"
+            f"{estimate_text_tokens(readable_text):>17}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+# Benchmarks video frame sampling: decoding every frame (the previous
+# implementation) against seeking to the sampled timestamps.
+#
+# Usage: poetry run python run_video_frame_benchmark.py [recording.mov ...]
+# Without arguments a synthetic screen recording is generated.
+
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple, cast
+
+import numpy as np
+from moviepy.editor import VideoClip, VideoFileClip  # type: ignore
+from PIL import Image
+
+from video.utils import TARGET_NUM_SCREENSHOTS, extract_screenshots
+
+
+def decode_all_frames(video_path: str) -> List[Image.Image]:
+    """The previous implementation: iterate over every frame, keep every nth"""
+    clip = VideoFileClip(video_path, audio=False)
+    images: List[Image.Image] = []
+    total_frames = cast(int, clip.reader.nframes)  # type: ignore
+    frame_skip = max(1, math.ceil(total_frames / TARGET_NUM_SCREENSHOTS))
+    for i, frame in enumerate(clip.iter_frames()):
+        if i % frame_skip == 0:
+            images.append(Image.fromarray(frame))  # type: ignore
+            if len(images) >= TARGET_NUM_SCREENSHOTS:
+                break
+    clip.close()
+    return images
+
+
+def synthetic_recording(path: str, duration: float = 60, fps: int = 60) -> str:
+    """A screen-recording-like clip: a mostly static page with a moving cursor and scrolling"""
+
+    def make_frame(t: float) -> np.ndarray:
+        frame = np.full((720, 1280, 3), 245, dtype=np.uint8)
+        scroll = int(t * 20) % 600
+        for row in range(8):
+            y = 40 + row * 90 - scroll % 90
+            if 0 <= y < 680:
+                frame[y : y + 40, 100:1180] = (60 + row * 20, 120, 200)
+        x, y = int(640 + 400 * math.sin(t)), int(360 + 200 * math.cos(t / 2))
+        frame[y : y + 16, x : x + 10] = 0
+        return frame
+
+    VideoClip(make_frame, duration=duration).write_videofile(
+        path, fps=fps, codec="libx264", audio=False, logger=None
+    )
+    return path
+
+
+def measure(extract: Callable[[str], List[Image.Image]], video_path: str) -> Tuple[float, float, int]:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    images = extract(video_path)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2, len(images)
+
+
+def main(paths: List[str]) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not paths:
+            print("Generating a 60s, 60fps synthetic recording...")
+            paths = [synthetic_recording(os.path.join(tmp_dir, "synthetic.mp4"))]
+
+        print(f"{'video':<24}{'all frames s':>14}{'peak MB':>10}{'seek s':>10}{'peak MB':>10}{'frames':>8}")
+        for path in paths:
+            all_s, all_mb, _ = measure(decode_all_frames, path)
+            seek_s, seek_mb, count = measure(extract_screenshots, path)
+            print(
+                f"{os.path.basename(path)[:23]:<24}{all_s:>14.2f}{all_mb:>10.1f}"
+                f"{seek_s:>10.2f}{seek_mb:>10.1f}{count:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
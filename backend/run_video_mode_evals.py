@@ -0,0 +1,125 @@
+# Compares the video prompt modes: one image per frame ("frames") against
+# contact sheets of consecutive frames ("grid").
+#
+# For every recording in video_evals/videos, each mode's prompt is assembled
+# and its frame extraction time, image count and estimated input tokens are
+# recorded. With --generate, code is also generated from each prompt and
+# saved to video_evals/outputs/<date>_<mode>/<video>.html, so the two modes'
+# outputs can be compared side by side, along with the generation latency.
+#
+# Usage: poetry run python run_video_mode_evals.py [--generate] [video ...]
+
+# Load environment variables first
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncio
+import base64
+import csv
+import io
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, get_args
+
+from PIL import Image
+
+from config import ANTHROPIC_API_KEY, VIDEO_TOKEN_BUDGET
+from llm import Llm
+from models import stream_claude_response_native
+from prompts.claude_prompts import VIDEO_PROMPT
+from video.encoding import estimate_image_tokens
+from video.utils import FrameMode, assemble_claude_prompt_video_file
+
+VIDEO_DIR = "./video_evals/videos"
+OUTPUTS_DIR = "./video_evals/outputs"
+VIDEO_EXTENSIONS = (".mov", ".mp4", ".webm", ".mkv")
+
+
+def prompt_stats(prompt_messages: List[Any]) -> Dict[str, int]:
+    """Images and estimated input tokens of an assembled video prompt"""
+    images = [
+        part for part in prompt_messages[0]["content"] if part["type"] == "image"
+    ]
+    tokens = 0
+    for part in images:
+        with Image.open(io.BytesIO(base64.b64decode(part["source"]["data"]))) as image:
+            tokens += estimate_image_tokens(image.width, image.height)
+    return {"images": len(images), "estimated_tokens": tokens}
+
+
+async def eval_video(video_path: str, mode: FrameMode, output_dir: str, generate: bool) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    prompt_messages = await assemble_claude_prompt_video_file(video_path, frame_mode=mode)
+    result: Dict[str, Any] = {
+        "video": os.path.basename(video_path),
+        "mode": mode,
+        "extraction_s": round(time.perf_counter() - start_time, 2),
+        **prompt_stats(prompt_messages),
+    }
+
+    if generate:
+        assert ANTHROPIC_API_KEY is not None
+
+        async def ignore_chunk(_: str) -> None:
+            pass
+
+        completion = await stream_claude_response_native(
+            system_prompt=VIDEO_PROMPT,
+            messages=prompt_messages,
+            api_key=ANTHROPIC_API_KEY,
+            callback=ignore_chunk,
+            model_name=Llm.CLAUDE_3_OPUS.value,
+            include_thinking=True,
+        )
+        result["generation_s"] = round(completion["duration"], 2)
+        output_path = os.path.join(output_dir, os.path.splitext(result["video"])[0] + ".html")
+        with open(output_path, "w") as f:
+            f.write(completion["code"])
+
+    return result
+
+
+async def main(args: List[str]) -> None:
+    generate = "--generate" in args
+    videos = [arg for arg in args if not arg.startswith("--")] or sorted(
+        os.path.join(VIDEO_DIR, name)
+        for name in os.listdir(VIDEO_DIR)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if generate and not ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY is not set")
+
+    today = datetime.now().strftime("%b_%d_%Y")
+    results: List[Dict[str, Any]] = []
+    for mode in get_args(FrameMode):
+        output_dir = os.path.join(OUTPUTS_DIR, f"{today}_{mode}")
+        os.makedirs(output_dir, exist_ok=True)
+        for video_path in videos:
+            results.append(await eval_video(video_path, mode, output_dir, generate))
+
+    print(f"\nToken budget: {VIDEO_TOKEN_BUDGET}")
+    print(f"{'video':<24}{'mode':>8}{'images':>8}{'est. tokens':>13}{'extract s':>11}{'generate s':>12}")
+    for result in results:
+        print(
+            f"{result['video'][:23]:<24}{result['mode']:>8}{result['images']:>8}"
+            f"{result['estimated_tokens']:>13}{result['extraction_s']:>11.2f}"
+            f"{result.get('generation_s', float('nan')):>12.2f}"
+        )
+
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
+    results_path = os.path.join(OUTPUTS_DIR, f"{today}_video_modes.csv")
+    with open(results_path, "w", newline="") as f:
+        writer = csv.DictWriter(
+            f,
+            fieldnames=["video", "mode", "images", "estimated_tokens", "extraction_s", "generation_s"],
+        )
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Results saved to {results_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
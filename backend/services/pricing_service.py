@@ -1,66 +1,147 @@
-from typing import List, Dict, Optional
-from supabase import Client
+import asyncio
+import time
+from typing import Any, Callable, List, Dict, Optional
 import json
 import os
+from config import PRICING_CACHE_TTL_SECONDS
+from data.repository import Repository, get_repository
 
 class PricingService:
-    def __init__(self, supabase_client: Client):
-        self.supabase = supabase_client
+    """Pricing catalogue served from an in-process, stale-while-revalidate cache.
+
+    Pricing tables change rarely, so reads never wait on the database: a fresh
+    entry is returned as is, a stale entry is returned while a background
+    refresh runs, and before the first load the hardcoded fallback catalogue
+    is served. When a load fails (or there is no database) the current value,
+    or the fallback, is kept for another TTL. Writes invalidate the cache.
+    """
+
+    def __init__(self, repository: Optional[Repository] = None, ttl_seconds: float = PRICING_CACHE_TTL_SECONDS):
+        self._repository = repository
+        self.ttl_seconds = ttl_seconds
+        # key -> (value, fetched_at)
+        self._cache: Dict[str, tuple[Any, float]] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task[None]] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {
+            "plans": self._load_plans,
+            "config": self._load_config,
+        }
+        self._fallbacks: Dict[str, Callable[[], Any]] = {
+            "plans": self._get_fallback_plans,
+            "config": self._get_fallback_config,
+        }
     
-    async def get_all_pricing_plans(self) -> List[Dict]:
-        """Get all active pricing plans from database"""
+    @property
+    def repository(self) -> Repository:
+        """Explicit repository if given, otherwise the shared process-wide one"""
+        repository = self._repository or get_repository()
+        if not repository:
+            raise RuntimeError("Pricing database not configured")
+        return repository
+    
+    # --- cache ---
+    
+    def _load_plans(self) -> List[Dict]:
+        return self.repository.list_pricing_plans()
+    
+    def _load_config(self) -> Dict:
+        rows = self.repository.list_pricing_config()
+        if not rows:
+            return self._get_fallback_config()
+        config = {}
+        for item in rows:
+            value = item["value"]
+            try:
+                config[item["key"]] = json.loads(value) if isinstance(value, str) else value
+            except json.JSONDecodeError:
+                config[item["key"]] = value
+        return config
+    
+    async def _refresh(self, key: str) -> None:
+        """Reload one cache entry; the synchronous repository call runs off the event loop"""
         try:
-            response = self.supabase.table("pricing_plans").select("*").eq("is_active", True).order("sort_order").execute()
-            return response.data if response.data else []
+            value = await asyncio.to_thread(self._loaders[key])
         except Exception as e:
-            print(f"Error fetching pricing plans: {str(e)}")
-            return self._get_fallback_plans()
+            print(f"Error refreshing pricing {key}: {str(e)}")
+            # Keep serving what we have (or the fallback) for another TTL
+            # rather than retrying on every read
+            entry = self._cache.get(key)
+            value = entry[0] if entry else self._fallbacks[key]()
+        self._cache[key] = (value, time.monotonic())
+    
+    def _schedule_refresh(self, key: str) -> None:
+        """Start a background refresh unless one is already in flight"""
+        task = self._refresh_tasks.get(key)
+        if task and not task.done():
+            return
+        self._refresh_tasks[key] = asyncio.create_task(self._refresh(key))
+    
+    def _get_cached(self, key: str) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            # Cold start: serve the hardcoded catalogue while the first load runs
+            self._schedule_refresh(key)
+            return self._fallbacks[key]()
+        value, fetched_at = entry
+        if time.monotonic() - fetched_at > self.ttl_seconds:
+            self._schedule_refresh(key)
+        return value
+    
+    async def warm(self) -> None:
+        """Load every cache entry (called from the app lifespan)"""
+        await asyncio.gather(*(self._refresh(key) for key in self._loaders))
+    
+    def invalidate(self) -> None:
+        """Mark cached entries stale and reload them in the background.
+
+        Refreshes already in flight may have read pre-write data, so they are
+        cancelled rather than allowed to overwrite the new load.
+        """
+        for key in self._loaders:
+            task = self._refresh_tasks.pop(key, None)
+            if task and not task.done():
+                task.cancel()
+            if key in self._cache:
+                value, _ = self._cache[key]
+                self._cache[key] = (value, float("-inf"))
+            self._schedule_refresh(key)
+    
+    # --- reads ---
+    
+    async def get_all_pricing_plans(self) -> List[Dict]:
+        """Get all active pricing plans"""
+        return self._get_cached("plans")
     
     async def get_pricing_plan_by_id(self, plan_id: str) -> Optional[Dict]:
-        """Get a specific pricing plan by ID"""
-        try:
-            response = self.supabase.table("pricing_plans").select("*").eq("id", plan_id).eq("is_active", True).single().execute()
-            return response.data if response.data else None
-        except Exception as e:
-            print(f"Error fetching pricing plan {plan_id}: {str(e)}")
-            # Fallback to hardcoded plan
-            fallback_plans = self._get_fallback_plans()
-            return next((plan for plan in fallback_plans if plan["id"] == plan_id), None)
+        """Get a specific active pricing plan by ID"""
+        plans = await self.get_all_pricing_plans()
+        return next((plan for plan in plans if plan["id"] == plan_id), None)
     
     async def get_pricing_config(self) -> Dict:
         """Get pricing configuration values"""
-        try:
-            response = self.supabase.table("pricing_config").select("*").execute()
-            if response.data:
-                config = {}
-                for item in response.data:
-                    try:
-                        config[item["key"]] = json.loads(item["value"])
-                    except json.JSONDecodeError:
-                        config[item["key"]] = item["value"]
-                return config
-            return self._get_fallback_config()
-        except Exception as e:
-            print(f"Error fetching pricing config: {str(e)}")
-            return self._get_fallback_config()
+        return self._get_cached("config")
+    
+    # --- writes ---
     
     async def update_pricing_plan(self, plan_id: str, updates: Dict) -> bool:
         """Update a pricing plan"""
         try:
-            response = self.supabase.table("pricing_plans").update(updates).eq("id", plan_id).execute()
-            return response.data is not None
+            updated = bool(await asyncio.to_thread(self.repository.update_pricing_plan, plan_id, updates))
         except Exception as e:
             print(f"Error updating pricing plan {plan_id}: {str(e)}")
             return False
+        self.invalidate()
+        return updated
     
     async def create_pricing_plan(self, plan_data: Dict) -> bool:
         """Create a new pricing plan"""
         try:
-            response = self.supabase.table("pricing_plans").insert(plan_data).execute()
-            return response.data is not None
+            created = bool(await asyncio.to_thread(self.repository.insert_pricing_plan, plan_data))
         except Exception as e:
             print(f"Error creating pricing plan: {str(e)}")
             return False
+        self.invalidate()
+        return created
     
     def _get_fallback_plans(self) -> List[Dict]:
         """Fallback pricing plans if database is unavailable"""
@@ -0,0 +1,208 @@
+"""
+Local verification of Supabase access tokens (JWTs).
+
+Tokens signed with the project's JWT secret (HS256) are checked with that
+secret; tokens signed with asymmetric keys are checked against the project's
+JWKS, which is cached and refreshed in the background. Recently verified
+tokens are kept in a small LRU keyed by the token's SHA-256, so repeat
+requests authenticate without any cryptography or network I/O.
+
+Without SUPABASE_JWT_SECRET, HS256 tokens (the default for most Supabase
+projects) can't be checked locally and are left to the remote Supabase Auth
+check. Local verification cannot see revoked sessions either; routes that
+must honour revocation keep using the remote check.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+
+from config import (
+    AUTH_TOKEN_CACHE_SIZE,
+    JWKS_REFRESH_SECONDS,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWT_SECRET,
+)
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+# Don't refetch the JWKS for unknown key IDs more often than this
+MIN_FORCED_REFRESH_SECONDS = 30
+
+
+class InvalidTokenError(Exception):
+    """The token is malformed, expired, or not signed by the project"""
+
+
+class LocalVerificationUnavailable(Exception):
+    """The token can't be checked locally (an HS256 token but no JWT secret
+    configured); the caller should verify it with Supabase Auth instead"""
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """The subset of the Supabase user carried in the access token"""
+
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    claims: Dict[str, Any] = field(default_factory=dict, compare=False)
+
+
+class TokenVerifier:
+    def __init__(
+        self,
+        jwt_secret: Optional[str],
+        jwks_url: Optional[str],
+        audience: str = SUPABASE_JWT_AUDIENCE,
+        cache_size: int = AUTH_TOKEN_CACHE_SIZE,
+        jwks_refresh_seconds: float = JWKS_REFRESH_SECONDS,
+    ):
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.cache_size = cache_size
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+
+        # sha256(token) -> (user, expires_at)
+        self._verified: "OrderedDict[str, tuple[AuthenticatedUser, float]]" = OrderedDict()
+        self._keys: Dict[str, Any] = {}
+        self._keys_fetched_at = float("-inf")
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.jwt_secret or self.jwks_url)
+
+    # --- JWKS ---
+
+    async def refresh_jwks(self) -> None:
+        """Fetch the project's signing keys"""
+        if not self.jwks_url:
+            return
+        async with self._refresh_lock:
+            try:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                keys: Dict[str, Any] = {}
+                for jwk in response.json().get("keys", []):
+                    try:
+                        key = jwt.PyJWK.from_dict(jwk)
+                    except jwt.PyJWKError:
+                        continue  # Unsupported key type
+                    if key.key_id:
+                        keys[key.key_id] = key
+                self._keys = keys
+                self._keys_fetched_at = time.monotonic()
+            except Exception as e:
+                print(f"Error refreshing JWKS: {str(e)}")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh_jwks()
+            await asyncio.sleep(self.jwks_refresh_seconds)
+
+    def start(self) -> None:
+        """Start rotating the JWKS in the background (called from the app lifespan)"""
+        if self.jwks_url and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _get_signing_key(self, key_id: Optional[str]) -> Any:
+        if key_id and key_id not in self._keys:
+            # Keys may have rotated since the last refresh
+            if time.monotonic() - self._keys_fetched_at > MIN_FORCED_REFRESH_SECONDS:
+                await self.refresh_jwks()
+        if not key_id or key_id not in self._keys:
+            raise InvalidTokenError("Unknown signing key")
+        return self._keys[key_id].key
+
+    # --- verification ---
+
+    def _cached(self, token_hash: str) -> Optional[AuthenticatedUser]:
+        entry = self._verified.get(token_hash)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if time.time() >= expires_at:
+            del self._verified[token_hash]
+            return None
+        self._verified.move_to_end(token_hash)
+        return user
+
+    def _remember(self, token_hash: str, user: AuthenticatedUser, expires_at: float) -> None:
+        self._verified[token_hash] = (user, expires_at)
+        self._verified.move_to_end(token_hash)
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+
+    async def verify(self, token: str) -> AuthenticatedUser:
+        """Verify a Supabase access token locally and return its user"""
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        user = self._cached(token_hash)
+        if user is not None:
+            return user
+
+        try:
+            header = jwt.get_unverified_header(token)
+            algorithm = header.get("alg")
+            if algorithm == "HS256":
+                if not self.jwt_secret:
+                    raise LocalVerificationUnavailable("No JWT secret configured for HS256 tokens")
+                key: Any = self.jwt_secret
+            elif algorithm in ASYMMETRIC_ALGORITHMS:
+                key = await self._get_signing_key(header.get("kid"))
+            else:
+                raise InvalidTokenError(f"Unsupported algorithm: {algorithm}")
+
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e))
+
+        user = AuthenticatedUser(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            claims=claims,
+        )
+        self._remember(token_hash, user, float(claims["exp"]))
+        return user
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Process-wide verifier for this project's Supabase tokens"""
+    global _token_verifier
+    if _token_verifier is None:
+        supabase_url = os.environ.get("SUPABASE_URL")
+        jwks_url = (
+            f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+            if supabase_url
+            else None
+        )
+        _token_verifier = TokenVerifier(SUPABASE_JWT_SECRET, jwks_url)
+    return _token_verifier
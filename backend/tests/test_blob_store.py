@@ -0,0 +1,133 @@
+import os
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import image_generation.core as core
+import image_generation.blob_store as blob_store
+import routes.generated_images as generated_images
+from image_generation.blob_store import BlobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path), max_bytes=100)
+
+
+class TestBlobStore:
+    """Test cases for the content-addressed generated image store."""
+
+    def test_identical_content_is_stored_once(self, store):
+        first = store.put(b"x" * 10, "image/png")
+        assert store.put(b"x" * 10, "image/png") == first
+        assert first.endswith(".png") and store.path_for(first)
+        assert store.put(b"y" * 10, "image/webp").endswith(".webp")
+        assert store._total_bytes == 20
+
+    def test_least_recently_used_blobs_are_evicted(self, store):
+        old = store.put(b"a" * 40, "image/png")
+        recent = store.put(b"b" * 40, "image/png")
+        os.utime(store.path_for(old), (1, 1))
+        store.touch(recent)
+
+        newest = store.put(b"c" * 40, "image/png")
+        assert store.path_for(old) is None
+        assert store.path_for(recent) and store.path_for(newest)
+
+    def test_invalid_names_are_rejected(self, store):
+        assert store.path_for("../../etc/passwd") is None
+
+    def test_unsupported_types_are_rejected(self, store):
+        with pytest.raises(ValueError):
+            store.put(b"<html></html>", "text/html")
+
+    def test_disabled_without_public_url(self):
+        with patch.object(blob_store, "IMAGE_STORE_ENABLED", False), patch.object(
+            blob_store, "_blob_store", None
+        ):
+            assert blob_store.get_blob_store() is None
+
+
+class TestStoreRemoteImage:
+    """Test cases for downloading generated images into the store."""
+
+    async def store_from(self, store, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(blob_store, "get_blob_store", return_value=store), patch.object(
+            blob_store, "_get_client", return_value=client
+        ):
+            return await blob_store.store_remote_image("https://cdn/image")
+
+    @pytest.mark.asyncio
+    async def test_image_is_stored(self, store):
+        url = await self.store_from(
+            store, lambda request: httpx.Response(200, content=b"jpeg", headers={"content-type": "image/jpeg"})
+        )
+        assert url is not None and url.endswith(".jpg")
+
+    @pytest.mark.asyncio
+    async def test_non_image_content_is_not_stored(self, store):
+        url = await self.store_from(
+            store, lambda request: httpx.Response(200, content=b"<html>", headers={"content-type": "text/html"})
+        )
+        assert url is None
+        assert store._total_bytes == 0
+
+    @pytest.mark.asyncio
+    async def test_oversized_download_is_aborted(self, store):
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 8
+
+        with patch.object(blob_store, "MAX_IMAGE_BYTES", 50):
+            declared = await self.store_from(
+                store,
+                lambda request: httpx.Response(
+                    200, content=b"x" * 60, headers={"content-type": "image/png"}
+                ),
+            )
+            # No Content-Length: the limit is enforced while reading
+            streamed = await self.store_from(
+                store,
+                lambda request: httpx.Response(200, content=chunks(), headers={"content-type": "image/png"}),
+            )
+        assert declared is None and streamed is None
+        assert store._total_bytes == 0
+
+
+class TestGeneratedImagesRoute:
+    """Test cases for serving stored images."""
+
+    def test_serves_with_immutable_caching(self, store):
+        name = store.put(b"\x89PNG data", "image/png")
+        app = FastAPI()
+        app.include_router(generated_images.router)
+        client = TestClient(app)
+        with patch.object(generated_images, "get_blob_store", return_value=store):
+            response = client.get(f"/generated-images/{name}")
+            assert response.content == b"\x89PNG data"
+            assert response.headers["content-type"] == "image/png"
+            assert "immutable" in response.headers["cache-control"]
+
+            cached = client.get(f"/generated-images/{name}", headers={"If-None-Match": response.headers["etag"]})
+            assert cached.status_code == 304
+            assert client.get("/generated-images/" + "0" * 64 + ".png").status_code == 404
+
+
+class TestProcessTasksStore:
+    """Test cases for storing generated images locally."""
+
+    @pytest.mark.asyncio
+    async def test_generated_urls_are_replaced_with_local_copies(self, store):
+        generate = AsyncMock(side_effect=["https://cdn/a.png", "https://cdn/b.png"])
+        store_remote = AsyncMock(side_effect=["http://localhost/generated-images/a.png", None])
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "get_blob_store", return_value=store
+        ), patch.object(core, "store_remote_image", store_remote), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            results = await core.process_tasks(["A", "B"], "key", None, "dalle3")
+
+        # A failed download falls back to the provider URL
+        assert results == ["http://localhost/generated-images/a.png", "https://cdn/b.png"]
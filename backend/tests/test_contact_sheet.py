@@ -0,0 +1,24 @@
+import numpy as np
+from PIL import Image
+from video.contact_sheet import TILE_GAP, grid_shape, render_contact_sheet, tile_size
+
+
+class TestContactSheet:
+    """Test cases for tiling video frames into contact sheets."""
+
+    def test_grid_is_as_square_as_possible(self):
+        assert grid_shape(1) == (1, 1)
+        assert grid_shape(4) == (2, 2)
+        assert grid_shape(5) == (3, 2)
+        assert tile_size(400 + TILE_GAP, 200 + TILE_GAP, 2, 2) == (200, 100)
+
+    def test_tiles_are_placed_in_reading_order_with_labels(self):
+        tiles = [Image.new("RGB", (200, 100), (60 * i, 60 * i, 60 * i)) for i in range(1, 5)]
+        sheet = np.asarray(render_contact_sheet(tiles, first_frame_number=5))
+        assert sheet.shape == (200 + TILE_GAP, 400 + TILE_GAP, 3)
+
+        # Bottom-right corner of each tile (clear of its label) keeps the tile's content
+        corners = [(99, 199), (99, 399 + TILE_GAP), (199 + TILE_GAP, 199), (199 + TILE_GAP, 399 + TILE_GAP)]
+        assert [int(sheet[y, x, 0]) for y, x in corners] == [60, 120, 180, 240]
+        # Each tile has a dark label box in its top-left corner
+        assert sheet[1, 1, 0] == 0 and sheet[1, 201 + TILE_GAP, 0] == 0
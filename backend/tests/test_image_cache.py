@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+import image_generation.core as core
+from image_generation.cache import ImageCache, cache_key
+
+
+@pytest.fixture
+def cache():
+    cache = ImageCache(":memory:", max_entries=2, ttl_seconds=60)
+    yield cache
+    cache.close()
+
+
+class TestImageCache:
+    """Test cases for the persistent prompt -> image cache."""
+
+    def test_key_is_normalized_and_includes_model(self):
+        assert cache_key("Company  Logo.", "dalle3") == cache_key("company logo", "dalle3")
+        assert cache_key("Company Logo", "dalle3") != cache_key("Company Logo", "flux")
+
+    def test_hit_rate_and_failed_generations(self, cache):
+        cache.put_many({"Logo": "https://img/logo.png", "Hero": None}, "flux")
+
+        assert cache.get_many(["logo", "Hero"], "flux") == {"logo": "https://img/logo.png"}
+        assert cache.get_many(["Logo"], "dalle3") == {}
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "hit_rate": 0.333}
+
+    def test_ttl_and_lru_eviction(self, cache):
+        cache.put_many({"a": "https://img/a", "b": "https://img/b"}, "flux")
+        cache.get_many(["a"], "flux")
+        cache.put_many({"c": "https://img/c"}, "flux")
+        assert set(cache.get_many(["a", "b", "c"], "flux")) == {"a", "c"}
+
+        cache.ttl_seconds = 0
+        assert cache.get_many(["a", "c"], "flux") == {}
+
+
+class TestProcessTasksCache:
+    """Test cases for cache use in process_tasks."""
+
+    @pytest.mark.asyncio
+    async def test_cached_prompts_skip_the_provider(self, cache):
+        cache.put_many({"Logo": "https://img/logo.png"}, "dalle3:1024x1024")
+        generate = AsyncMock(return_value="https://img/hero.png")
+        with patch.object(core, "get_image_cache", return_value=cache), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            results = await core.process_tasks(["Logo", "Hero"], "key", None, "dalle3")
+
+        assert results == ["https://img/logo.png", "https://img/hero.png"]
+        generate.assert_awaited_once_with("Hero", "key", None, size="1024x1024")
+        assert cache.get_many(["Hero"], "dalle3:1024x1024") == {"Hero": "https://img/hero.png"}
+
+
+class TestImageGenerationCoalescer:
+    """Test cases for single-flight image generation across variants."""
+
+    @pytest.mark.asyncio
+    async def test_variants_share_one_generation_per_prompt(self):
+        code = '<img src="https://placehold.co/300x200" alt="Logo"><img src="https://placehold.co/500x500" alt="Hero">'
+        generate = AsyncMock(side_effect=lambda prompt, *_, **__: f"https://img/{prompt}.png")
+        coalescer = core.ImageGenerationCoalescer()
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            results = await asyncio.gather(
+                *(core.generate_images(code, "key", None, {}, coalescer=coalescer) for _ in range(4))
+            )
+
+        assert generate.await_count == 2
+        assert all("https://img/Logo.png" in html and "https://img/Hero.png" in html for html in results)
+
+    @pytest.mark.asyncio
+    async def test_failed_prompts_are_retried(self):
+        generate = AsyncMock(side_effect=[RuntimeError("rate limited"), "https://img/logo.png"])
+        coalescer = core.ImageGenerationCoalescer()
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            assert await coalescer.process_tasks(["Logo"], "key", None, "dalle3") == [None]
+            assert await coalescer.process_tasks(["Logo"], "key", None, "dalle3") == ["https://img/logo.png"]
+
+    @pytest.mark.asyncio
+    async def test_prefetch_keeps_its_task_until_done(self):
+        release = asyncio.Event()
+
+        async def generate(prompt, *_, **__):
+            await release.wait()
+            return "https://img/logo.png"
+
+        coalescer = core.ImageGenerationCoalescer()
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            coalescer.prefetch(["Logo"], "key", None, "dalle3")
+            assert len(coalescer._tasks) == 1
+            release.set()
+            assert await coalescer.process_tasks(["Logo"], "key", None, "dalle3") == ["https://img/logo.png"]
+            await asyncio.sleep(0)
+        assert not coalescer._tasks
@@ -0,0 +1,95 @@
+import asyncio
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from image_generation.pool import ProviderPool, RateLimitedError, parse_duration, parse_retry_after
+
+
+class TestProviderPool:
+    """Test cases for per-provider image generation scheduling."""
+
+    def test_parse_duration(self):
+        assert parse_duration("20") == 20
+        assert parse_duration("1.5") == 1.5
+        assert parse_duration("20ms") == pytest.approx(0.02)
+        assert parse_duration("6m0s") == 360
+        assert parse_duration("soon") is None
+        assert parse_duration("Wed, 21 Oct 2015 07:28:00 GMT") is None
+
+    def test_parse_retry_after_http_date(self):
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+        assert parse_retry_after("2") == 2
+        assert parse_retry_after("later") is None
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap_and_priority_order(self):
+        pool = ProviderPool("test", max_concurrency=2)
+        gate = asyncio.Event()
+        running = 0
+        max_running = 0
+        started: list = []
+
+        async def call(name: str):
+            nonlocal running, max_running
+            started.append(name)
+            running += 1
+            max_running = max(max_running, running)
+            await gate.wait()
+            running -= 1
+            return name
+
+        tasks = [asyncio.create_task(pool.run(0, lambda: call("first")))]
+        tasks.append(asyncio.create_task(pool.run(1, lambda: call("second"))))
+        await asyncio.sleep(0)
+        for priority in (9, 5, 7):
+            tasks.append(asyncio.create_task(pool.run(priority, lambda p=priority: call(f"p{p}"))))
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+        assert max_running == 2
+        assert started == ["first", "second", "p5", "p7", "p9"]
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_calls_are_paced_and_retried(self):
+        pool = ProviderPool("test", max_concurrency=4, max_retries=2)
+        attempts: list = []
+
+        async def call():
+            attempts.append(asyncio.get_running_loop().time())
+            if len(attempts) == 1:
+                raise RateLimitedError("429", {"retry-after": "0.1"})
+            return "ok"
+
+        assert await pool.run(0, call) == "ok"
+        assert attempts[1] - attempts[0] >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        pool = ProviderPool("test", max_concurrency=1, max_retries=1)
+
+        async def call():
+            raise RateLimitedError("429", {"retry-after": "0"})
+
+        with pytest.raises(RateLimitedError):
+            await pool.run(0, call)
+
+    def test_remaining_budget_spreads_requests(self):
+        pool = ProviderPool("test", max_concurrency=1)
+        pool.observe({"x-ratelimit-remaining-requests": "10", "x-ratelimit-reset-requests": "5s"})
+        assert pool._interval == 0.5
+
+    @pytest.mark.asyncio
+    async def test_pacing_relaxes_after_the_window_resets(self):
+        pool = ProviderPool("test", max_concurrency=1)
+        pool.observe({"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "20ms"})
+        assert pool._interval == pytest.approx(0.02)
+        pool.observe({"x-ratelimit-remaining-requests": "100", "x-ratelimit-reset-requests": "20ms"})
+        assert pool._interval == pytest.approx(0.0002)
+
+        pool._interval_until = 0.0  # The window has passed
+        await pool._wait_for_turn()
+        assert pool._next_start <= time.monotonic()
@@ -0,0 +1,37 @@
+import base64
+import pytest
+from unittest.mock import AsyncMock, patch
+import image_generation.core as core
+from image_generation.local import render_placeholder_image
+
+
+class TestImageSizing:
+    """Test cases for size-aware image generation."""
+
+    def test_closest_provider_size(self):
+        assert core.closest_image_size("dalle3", 300, 300) == "1024x1024"
+        assert core.closest_image_size("dalle3", 1200, 400) == "1792x1024"
+        assert core.closest_image_size("dalle3", 300, 600) == "1024x1792"
+        assert core.closest_image_size("flux", 1920, 1080) == "16:9"
+        assert core.closest_image_size("flux", 400, 500) == "4:5"
+
+    def test_local_placeholders(self):
+        avatar = base64.b64decode(render_placeholder_image("Profile picture of Jane Doe", 40, 40).split(",")[1])
+        assert b"<circle" in avatar and b">JD</text>" in avatar
+
+        icon = render_placeholder_image("Search icon", 24, 24)
+        assert icon == render_placeholder_image("Search icon", 24, 24)
+        assert b"linearGradient" in base64.b64decode(icon.split(",")[1])
+
+    @pytest.mark.asyncio
+    async def test_tiny_images_are_rendered_locally(self):
+        code = '<img src="https://placehold.co/32x32" alt="Avatar of a user"><img src="https://placehold.co/1200x400" alt="Banner">'
+        generate = AsyncMock(return_value="https://img/banner.png")
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            result = await core.generate_images(code, "key", None, {})
+
+        generate.assert_awaited_once_with("Banner", "key", None, size="1792x1024")
+        assert 'src="data:image/svg+xml;base64,' in result
+        assert 'src="https://img/banner.png" alt="Banner" width="1200" height="400"' in result
@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+import image_generation.core as core
+from image_generation.img_tags import rewrite_img_tags, scan_img_tags
+
+
+class TestImgTags:
+    """Test cases for the <img> scanner and in-place rewriter."""
+
+    def test_scan_skips_comments_and_scripts(self):
+        code = (
+            '<!-- <img src="a.png" alt="commented"> -->'
+            "<script>const html = '<img src=\"b.png\" alt=\"script\">';</script>"
+            '<IMG ALT="x > y" SRC=c.png loading=lazy data-x=\'1\'/>'
+        )
+        tags = list(scan_img_tags(code))
+        assert len(tags) == 1
+        assert tags[0].get("alt") == "x > y"
+        assert tags[0].get("src") == "c.png"
+        assert tags[0].get("data-x") == "1"
+
+    def test_rewrite_only_touches_patched_attributes(self):
+        code = '<div>\n  <img  class="hero"\n    src="https://placehold.co/300x200" width="10" alt="Hero &amp; logo" />\n</div>'
+        result = rewrite_img_tags(
+            code, lambda tag: {"src": "https://img/a.png?x=1&y=2", "width": "300", "height": "200"}
+        )
+        assert result == (
+            '<div>\n  <img  class="hero"\n    src="https://img/a.png?x=1&amp;y=2" width="300" '
+            'alt="Hero &amp; logo" height="200" />\n</div>'
+        )
+
+    def test_create_alt_url_mapping(self):
+        code = '<img src="https://placehold.co/10x10" alt="New"><img src="https://img/a.png" alt="Old"><img alt="No src">'
+        assert core.create_alt_url_mapping(code) == {"Old": "https://img/a.png"}
+
+
+class TestGenerateImages:
+    """Test cases for generate_images output."""
+
+    @pytest.mark.asyncio
+    async def test_formatting_is_preserved(self):
+        code = '<body>\n    <img src="https://placehold.co/640x480" alt="Team photo">\n    <img src="https://placehold.co/300x300" alt="Failed">\n</body>'
+        generate = AsyncMock(side_effect=lambda prompt, *_, **__: "https://img/team.png" if prompt == "Team photo" else None)
+        with patch.object(core, "get_image_cache", return_value=None), patch.object(
+            core, "generate_image_dalle", generate
+        ):
+            result = await core.generate_images(code, "key", None, {})
+
+        assert result == (
+            '<body>\n    <img src="https://img/team.png" alt="Team photo" width="640" height="480">'
+            '\n    <img src="https://placehold.co/300x300" alt="Failed">\n</body>'
+        )
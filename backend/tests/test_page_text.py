@@ -0,0 +1,79 @@
+import time
+from unittest.mock import patch
+from bs4 import Tag
+from video.page_text import estimate_text_tokens, extract_readable_text
+
+PARAGRAPH = "The council approved the plan, after a long debate, on Tuesday evening. "
+
+
+def page(content: str, title: str = "City News") -> str:
+    return f"""<html><head><title>{title}</title><style>body {{ color: red; }}</style></head>
+<body>
+<nav><ul><li><a href="/">Home</a></li><li><a href="/about">About us</a></li></ul></nav>
+<div class="cookie-banner-content"><p>We use cookies to improve your experience, accept them all.</p></div>
+<div class="layout">{content}</div>
+<div class="sidebar"><p>Related: other stories you may like, click here, right now.</p></div>
+<footer><p>Copyright 2024, City News, all rights reserved.</p></footer>
+<script>window.analytics = {{ track: function() {{}} }};</script>
+</body></html>"""
+
+
+class TestReadableText:
+    """Test cases for extracting a page's main content."""
+
+    def test_main_content_without_boilerplate(self):
+        html = page(
+            f"""<div class="story"><h1>Plan approved</h1><p>{PARAGRAPH * 4}</p>
+<ul><li><p>Residents, however, remain divided about the plan.</p></li></ul>
+<p>{PARAGRAPH * 3}</p></div>
+<div class="share"><a href="/share">Share on social media</a></div>"""
+        )
+        text = extract_readable_text(html)
+        lines = text.split("\n")
+        assert lines[:2] == ["City News", "Plan approved"]
+        assert "Residents, however, remain divided about the plan." in lines
+        for boilerplate in ["Home", "cookies", "Related", "Copyright", "Share", "analytics", "color"]:
+            assert boilerplate not in text
+
+    def test_text_is_capped_at_a_sentence(self):
+        html = page(f"<article><p>{PARAGRAPH * 2000}</p></article>")
+        text = extract_readable_text(html.encode("utf-8"), max_tokens=100)
+        assert estimate_text_tokens(text) <= 100
+        assert text.endswith("evening.")
+
+    def test_unstructured_page_falls_back_to_all_text(self):
+        text = extract_readable_text("<html><body><div>Just a short note.</div></body></html>")
+        assert text == "Just a short note."
+
+    def test_content_in_boilerplate_looking_wrappers_is_kept(self):
+        article = f"<article><h1>Plan approved</h1><p>{PARAGRAPH * 30}</p></article>"
+        for wrapper in ["layout has-sidebar", "app shared-layout", "page menu-open"]:
+            text = extract_readable_text(page(f'<div class="{wrapper}">{article}</div>'))
+            assert text.startswith("City News\nPlan approved\nThe council approved the plan")
+            assert "cookies" not in text
+
+    def test_unmarked_content_in_boilerplate_looking_wrapper_is_kept(self):
+        content = f"<div><p>{PARAGRAPH * 10}</p><p>{PARAGRAPH * 10}</p></div>"
+        text = extract_readable_text(page(f'<div id="menu-wrapper" class="promo-layout">{content}</div>'))
+        assert PARAGRAPH.strip() in text
+
+    def test_many_boilerplate_siblings_are_removed_at_once(self):
+        menu = '<div class="menu-item"><a href="/item">Item</a></div>' * 5000
+        html = page(f"<div>{menu}</div><article><p>{PARAGRAPH * 10}</p></article>")
+        # Removing siblings one by one looks each of them up in the parent
+        with patch.object(Tag, "index", side_effect=AssertionError("sibling lookup")):
+            text = extract_readable_text(html)
+        assert PARAGRAPH.strip() in text
+        assert "Item" not in text
+
+    def test_unclosed_scripts_take_linear_time(self):
+        html = page(f"<article><p>{PARAGRAPH * 10}</p></article>") + '<script src="a.js">' * 20000
+        start_time = time.perf_counter()
+        text = extract_readable_text(html + "<p>Never shown</p>")
+        assert time.perf_counter() - start_time < 2
+        assert PARAGRAPH.strip() in text
+        assert "Never shown" not in text
+        # Closed blocks and comments are still removed individually
+        closed = f"<article><p>{PARAGRAPH * 10}<!-- note --></p><STYLE>p {{}}</STYLE ></article>"
+        text = extract_readable_text(page(closed))
+        assert "note" not in text and "{" not in text
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from data.sqlite_repository import SQLiteRepository
+from services.pricing_service import PricingService
+
+
+def _plan(plan_id: str, credits: int, sort_order: int):
+    return {
+        "id": plan_id,
+        "name": plan_id.title(),
+        "credits": credits,
+        "price_cents": credits * 15,
+        "description": f"{plan_id} plan",
+        "features": [],
+        "sort_order": sort_order,
+    }
+
+
+@pytest.fixture
+def repository():
+    repository = SQLiteRepository(":memory:")
+    repository.insert_pricing_plan(_plan("small", 5, 1))
+    repository._conn.execute(
+        "INSERT INTO pricing_config (key, value) VALUES ('currency', '\"EUR\"')"
+    )
+    yield repository
+    repository.close()
+
+
+async def _settle(service: PricingService):
+    await asyncio.gather(*service._refresh_tasks.values(), return_exceptions=True)
+
+
+class TestPricingCache:
+    """Test cases for the stale-while-revalidate pricing cache."""
+
+    @pytest.mark.asyncio
+    async def test_cold_start_serves_fallback_then_database(self, repository):
+        service = PricingService(repository)
+
+        plans = await service.get_all_pricing_plans()
+        assert [plan["id"] for plan in plans] == [plan["id"] for plan in service._get_fallback_plans()]
+
+        await _settle(service)
+        plans = await service.get_all_pricing_plans()
+        assert [plan["id"] for plan in plans] == ["small"]
+
+    @pytest.mark.asyncio
+    async def test_warm_cache_does_not_query(self, repository):
+        service = PricingService(repository)
+        await service.warm()
+
+        repository.close()  # Any database access would now fail
+        assert (await service.get_pricing_plan_by_id("small"))["credits"] == 5
+        assert (await service.get_pricing_config())["currency"] == "EUR"
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_is_served_while_refreshing(self, repository):
+        service = PricingService(repository, ttl_seconds=0)
+        await service.warm()
+        repository.insert_pricing_plan(_plan("large", 50, 2))
+
+        # Stale value comes back immediately, refresh happens in the background
+        assert [plan["id"] for plan in await service.get_all_pricing_plans()] == ["small"]
+        await _settle(service)
+        assert [plan["id"] for plan in await service.get_all_pricing_plans()] == ["small", "large"]
+        await _settle(service)
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate(self, repository):
+        service = PricingService(repository)
+        await service.warm()
+
+        assert await service.create_pricing_plan(_plan("large", 50, 2))
+        await _settle(service)
+        assert await service.get_pricing_plan_by_id("large") is not None
+
+        assert await service.update_pricing_plan("large", {"is_active": False})
+        await _settle(service)
+        assert await service.get_pricing_plan_by_id("large") is None
+
+    @pytest.mark.asyncio
+    async def test_fallback_is_cached_without_database(self):
+        with patch("services.pricing_service.get_repository", return_value=None):
+            service = PricingService()
+            assert (await service.get_pricing_config())["currency"] == "USD"
+            await _settle(service)
+
+            # The fallback is now the cached value, so reads stop retrying
+            service._refresh_tasks.clear()
+            assert (await service.get_pricing_config())["currency"] == "USD"
+            assert service._refresh_tasks == {}
+
+    @pytest.mark.asyncio
+    async def test_empty_config_serves_fallback(self, repository):
+        repository._conn.execute("DELETE FROM pricing_config")
+        service = PricingService(repository)
+        await service.warm()
+        assert (await service.get_pricing_config())["currency"] == "USD"
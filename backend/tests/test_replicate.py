@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from aiohttp import web
+import image_generation.replicate as replicate
+
+
+class StubReplicate:
+    """Minimal local stand-in for the Replicate predictions API."""
+
+    def __init__(self, polls_until_done: int, finish_on_create: bool = False):
+        self.polls_until_done = polls_until_done
+        self.finish_on_create = finish_on_create
+        self.prefer_headers: list = []
+        self.polls = 0
+        self.canceled: list = []
+
+    def _prediction(self, status: str):
+        output = ["https://replicate.delivery/image.png"] if status == "succeeded" else None
+        return {"id": "p1", "status": status, "output": output}
+
+    async def create(self, request: web.Request):
+        self.prefer_headers.append(request.headers.get("Prefer"))
+        return web.json_response(self._prediction("succeeded" if self.finish_on_create else "starting"))
+
+    async def get(self, request: web.Request):
+        self.polls += 1
+        status = "succeeded" if self.polls >= self.polls_until_done else "processing"
+        return web.json_response(self._prediction(status))
+
+    async def cancel(self, request: web.Request):
+        self.canceled.append(request.match_info["id"])
+        return web.json_response(self._prediction("canceled"))
+
+
+@pytest.fixture
+async def stub(monkeypatch):
+    async def start(**kwargs):
+        stub = StubReplicate(**kwargs)
+        app = web.Application()
+        app.router.add_post("/v1" + replicate.FLUX_SCHNELL_PATH, stub.create)
+        app.router.add_get("/v1/predictions/{id}", stub.get)
+        app.router.add_post("/v1/predictions/{id}/cancel", stub.cancel)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        monkeypatch.setattr(replicate, "REPLICATE_API_BASE_URL", f"http://127.0.0.1:{port}/v1")
+        monkeypatch.setattr(replicate, "INITIAL_POLL_INTERVAL", 0.01)
+        runners.append(runner)
+        return stub
+
+    runners: list = []
+    yield start
+    await replicate.close_replicate_client()
+    for runner in runners:
+        await runner.cleanup()
+
+
+class TestCallReplicate:
+    """Test cases for the Replicate prediction lifecycle against a local stub server."""
+
+    @pytest.mark.asyncio
+    async def test_prefer_wait_skips_polling(self, stub):
+        server = await stub(polls_until_done=0, finish_on_create=True)
+        assert await replicate.call_replicate({"prompt": "cat"}, "token") == "https://replicate.delivery/image.png"
+        assert server.prefer_headers == ["wait=30"]
+        assert server.polls == 0
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_polling(self, stub):
+        server = await stub(polls_until_done=3)
+        assert await replicate.call_replicate({"prompt": "cat"}, "token") == "https://replicate.delivery/image.png"
+        assert server.polls == 3
+
+    @pytest.mark.asyncio
+    async def test_deadline_cancels_prediction(self, stub):
+        server = await stub(polls_until_done=10**6)
+        with pytest.raises(TimeoutError):
+            await replicate.call_replicate({"prompt": "cat"}, "token", deadline_seconds=0.2)
+        assert server.prefer_headers == ["wait=1"]
+        assert server.canceled == ["p1"]
+
+    @pytest.mark.asyncio
+    async def test_caller_cancellation_cancels_prediction(self, stub):
+        server = await stub(polls_until_done=10**6)
+        task = asyncio.create_task(replicate.call_replicate({"prompt": "cat"}, "token"))
+        while server.polls == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert server.canceled == ["p1"]
@@ -0,0 +1,220 @@
+import base64
+import json
+import pytest
+from data.pagination import InvalidCursor, decode_cursor, encode_cursor, list_conversion_page
+from data.repository import get_query_stats, get_repository, init_repository, close_repository
+from data.sqlite_repository import SQLiteRepository
+import data.supabase_client as supabase_client
+from supabase import create_client
+
+
+@pytest.fixture
+def repository():
+    repository = SQLiteRepository(":memory:")
+    yield repository
+    repository.close()
+
+
+class TestUserCredits:
+    """Test cases for user credit reads and writes."""
+
+    def test_missing_user_returns_none(self, repository):
+        assert repository.get_user_credits("nobody") is None
+
+    def test_insert_and_get(self, repository):
+        repository.insert_user_credits({"user_id": "u1", "credits_remaining": 5})
+        credits = repository.get_user_credits("u1")
+        assert credits is not None
+        assert credits["credits_remaining"] == 5
+        assert credits["plan"] == "free"
+
+    def test_optimistic_update(self, repository):
+        repository.insert_user_credits({"user_id": "u1", "credits_remaining": 5})
+
+        # Stale expectation: nothing is updated
+        assert repository.update_user_credits("u1", {"credits_remaining": 3}, expected_remaining=4) == []
+        assert repository.get_user_credits("u1")["credits_remaining"] == 5
+
+        rows = repository.update_user_credits("u1", {"credits_remaining": 4}, expected_remaining=5)
+        assert len(rows) == 1
+        assert rows[0]["credits_remaining"] == 4
+
+
+    def test_checkout_session_is_credited_once(self, repository):
+        repository.insert_user_credits({"user_id": "u1", "credits_remaining": 5})
+        payment = {
+            "user_id": "u1",
+            "amount": 7.5,
+            "credits_purchased": 50,
+            "plan": "basic",
+            "stripe_session_id": "cs_1",
+            "payment_date": "2024-01-01T00:00:00",
+        }
+        assert repository.credit_checkout_session(payment) is True
+        assert repository.credit_checkout_session(payment) is False
+        assert repository.get_user_credits("u1")["credits_remaining"] == 55
+        assert [payment["credits_purchased"] for payment in repository.list_payments("u1")] == [50]
+
+        # A new user gets a credits row with just the purchase
+        assert repository.credit_checkout_session({**payment, "user_id": "u2", "stripe_session_id": "cs_2"})
+        assert repository.get_user_credits("u2")["credits_remaining"] == 50
+
+
+def seed_conversions(repository, count):
+    for i in range(count):
+        repository.insert_conversion({
+            "user_id": "u1",
+            "model_used": "model",
+            "framework": "html_tailwind",
+            "input_type": "image",
+            # Pairs of rows share a timestamp to exercise the id tie-breaker
+            "created_at": f"2025-01-01T00:00:{i // 2:02d}+00:00",
+        })
+
+
+class TestConversionHistory:
+    """Test cases for keyset-paginated conversion history."""
+
+    def test_pages_cover_every_row_once(self, repository):
+        seed_conversions(repository, 7)
+
+        seen = []
+        before = None
+        while True:
+            page = repository.list_conversions("u1", 3, before=before)
+            if not page:
+                break
+            seen.extend(row["id"] for row in page)
+            before = (page[-1]["created_at"], page[-1]["id"])
+
+        assert len(seen) == 7
+        assert len(set(seen)) == 7
+        assert repository.count_conversions("u1") == 7
+
+    def test_newest_first(self, repository):
+        seed_conversions(repository, 4)
+        page = repository.list_conversions("u1", 4)
+        timestamps = [row["created_at"] for row in page]
+        assert timestamps == sorted(timestamps, reverse=True)
+
+    def test_list_since_selects_columns(self, repository):
+        seed_conversions(repository, 4)
+        rows = repository.list_conversions_since("u1", "2025-01-01T00:00:01+00:00", "credits_used")
+        assert rows == [{"credits_used": 1}, {"credits_used": 1}]
+
+        with pytest.raises(ValueError):
+            repository.list_conversions_since("u1", None, "credits_used; DROP TABLE x")
+
+
+class TestHistoryCursor:
+    """Test cases for paging conversion history by cursor."""
+
+    def test_next_cursor_across_pages(self, repository):
+        seed_conversions(repository, 7)
+
+        pages = []
+        cursor = None
+        while True:
+            rows, cursor = list_conversion_page(repository, "u1", 3, cursor)
+            pages.append(rows)
+            if cursor is None:
+                break
+
+        assert [len(rows) for rows in pages] == [3, 3, 1]
+        positions = [(row["created_at"], row["id"]) for rows in pages for row in rows]
+        # Newest first, rows sharing a timestamp ordered by id, none repeated
+        assert positions == sorted(positions, reverse=True)
+        assert len(set(positions)) == 7
+
+    def test_exact_last_page_has_no_cursor(self, repository):
+        seed_conversions(repository, 6)
+        rows, cursor = list_conversion_page(repository, "u1", 3)
+        assert len(rows) == 3 and cursor is not None
+        rows, cursor = list_conversion_page(repository, "u1", 3, cursor)
+        assert len(rows) == 3 and cursor is None
+
+    def test_ties_on_created_at_are_broken_by_id(self, repository):
+        seed_conversions(repository, 2)
+        first, second = repository.list_conversions("u1", 2)
+        assert first["created_at"] == second["created_at"]
+
+        rows, cursor = list_conversion_page(repository, "u1", 1)
+        assert rows == [first]
+        rows, cursor = list_conversion_page(repository, "u1", 1, cursor)
+        assert rows == [second] and cursor is None
+
+    def test_round_trip(self):
+        position = ("2025-01-01T00:00:01+00:00", "5f0c7c3e-7a1b-4c0e-9c39-2f1d6d1b8a10")
+        assert decode_cursor(encode_cursor(*position)) == position
+        assert decode_cursor(encode_cursor("2025-01-01T00:00:01Z", "42")) == ("2025-01-01T00:00:01Z", "42")
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not base64!",
+            base64.urlsafe_b64encode(b"{}").decode(),
+            encode_cursor("yesterday", "42"),
+            encode_cursor('2025-01-01",id.gt."0', "42"),
+            encode_cursor("2025-01-01T00:00:01+00:00", '1"),user_id.neq.("x'),
+        ],
+    )
+    def test_invalid_or_tampered_cursor_is_rejected(self, repository, cursor):
+        # The history route answers these with a 400
+        with pytest.raises(InvalidCursor):
+            list_conversion_page(repository, "u1", 3, cursor)
+
+    def test_non_string_fields_are_rejected(self):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(base64.urlsafe_b64encode(json.dumps([1, 2]).encode()).decode())
+
+
+class TestPricing:
+    """Test cases for pricing plan storage."""
+
+    def test_plans_round_trip(self, repository):
+        repository.insert_pricing_plan({
+            "id": "basic",
+            "name": "Basic",
+            "credits": 50,
+            "price_cents": 750,
+            "features": ["50 code generations"],
+            "sort_order": 2,
+        })
+        plan = repository.get_pricing_plan("basic")
+        assert plan["features"] == ["50 code generations"]
+        assert plan["price_dollars"] == 7.5
+        assert plan["is_active"] is True
+
+        repository.update_pricing_plan("basic", {"is_active": False})
+        assert repository.get_pricing_plan("basic") is None
+        assert repository.list_pricing_plans() == []
+
+
+class TestRepositoryLifecycle:
+    """Test cases for the process-wide repository and query timings."""
+
+    def test_swap_backend(self):
+        repository = SQLiteRepository(":memory:")
+        try:
+            assert init_repository(repository) is repository
+            assert get_repository() is repository
+        finally:
+            close_repository()
+
+    def test_queries_are_timed(self, repository):
+        repository.get_user_credits("u1")
+        stats = get_query_stats()
+        assert stats["user_credits.get"]["count"] >= 1
+
+
+class TestSupabaseClient:
+    """Test cases for the shared Supabase client's lifecycle."""
+
+    def test_close_releases_the_http_session(self, monkeypatch):
+        client = create_client("https://example.supabase.co", "eyJhbGciOiJIUzI1NiJ9.e30.c2lnbmF0dXJl")
+        monkeypatch.setattr(supabase_client, "_supabase_client", client)
+        session = client.postgrest.session
+
+        supabase_client.close_supabase_client()
+        assert session.is_closed
+        assert supabase_client._supabase_client is None
@@ -0,0 +1,41 @@
+from image_generation.streaming import StreamingImageDetector
+
+
+class TestStreamingImageDetector:
+    """Test cases for detecting placeholder images in streamed code."""
+
+    def test_tags_split_across_chunks(self):
+        detector = StreamingImageDetector()
+        chunks = ['<div><im', 'g src="https://placehold.co/300x200" al', 't="Company &amp; Logo">', "</div>"]
+        assert [[tag.get("alt") for tag in detector.feed(chunk)] for chunk in chunks] == [
+            [],
+            [],
+            ["Company & Logo"],
+            [],
+        ]
+
+    def test_only_new_placeholder_images(self):
+        detector = StreamingImageDetector()
+        code = (
+            "<img src='https://placehold.co/50x50' alt='Avatar'/>"
+            '<img src="https://example.com/a.png" alt="Real image">'
+            '<IMG ALT="Avatar" SRC="https://placehold.co/60x60">'
+            '<img src="https://placehold.co/60x60">'
+        )
+        assert [tag.get("alt") for tag in detector.feed(code)] == ["Avatar"]
+
+    def test_split_attribute_value_containing_lt(self):
+        detector = StreamingImageDetector()
+        chunks = ['<p>1 < 2</p><img src="https://placehold.co/300x200" alt="a < b', ' and c">', "<p>done</p>"]
+        assert [[tag.get("alt") for tag in detector.feed(chunk)] for chunk in chunks] == [
+            [],
+            ["a < b and c"],
+            [],
+        ]
+
+    def test_buffer_is_trimmed_outside_tags(self):
+        detector = StreamingImageDetector()
+        detector.feed('<div class="a">' * 100 + "text <i")
+        assert detector._buffer == "<i"
+        detector.feed("nput>" + "<p>more</p>" * 100)
+        assert detector._buffer == ""
@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from data.repository import init_repository, close_repository
+from data.sqlite_repository import SQLiteRepository
+import routes.payments as payments
+
+
+def _checkout_event(event_id: str, session_id: str = "cs_1", payment_status: str = "paid"):
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "id": session_id,
+                "payment_status": payment_status,
+                "amount_total": 750,
+                "metadata": {"userId": "u1", "planId": "basic", "credits": "50"},
+            }
+        },
+    }
+
+
+@pytest.fixture
+def repository():
+    repository = SQLiteRepository(":memory:")
+    init_repository(repository)
+    yield repository
+    close_repository()
+
+
+@pytest.fixture
+def client(repository):
+    app = FastAPI()
+    app.include_router(payments.router, prefix="/payments")
+    with patch.object(payments, "stripe_key", "sk_test"), patch.object(
+        payments, "endpoint_secret", "whsec_test"
+    ):
+        yield TestClient(app)
+
+
+def _event_status(repository, event_id):
+    rows = repository._query(
+        "SELECT status FROM stripe_webhook_events WHERE event_id = ?", (event_id,)
+    )
+    return rows[0]["status"]
+
+
+def _post(client, event):
+    with patch.object(payments.stripe.Webhook, "construct_event", return_value=event):
+        return client.post("/payments/webhook", content=b"{}", headers={"stripe-signature": "sig"})
+
+
+class TestStripeWebhook:
+    """Test cases for idempotent, background Stripe webhook processing."""
+
+    def test_event_credits_user_once(self, client, repository):
+        repository.insert_user_credits({"user_id": "u1", "credits_remaining": 2})
+
+        assert _post(client, _checkout_event("evt_1")).json() == {"status": "success"}
+        assert _post(client, _checkout_event("evt_1")).json() == {"status": "duplicate"}
+
+        assert repository.get_user_credits("u1")["credits_remaining"] == 52
+        assert len(repository.list_payments("u1")) == 1
+        assert _event_status(repository, "evt_1") == "processed"
+
+    def test_session_credited_once_across_events(self, client, repository):
+        _post(client, _checkout_event("evt_1"))
+        _post(client, _checkout_event("evt_2"))
+
+        assert repository.get_user_credits("u1")["credits_remaining"] == 50
+        assert len(repository.list_payments("u1")) == 1
+
+    def test_failed_event_is_retried(self, client, repository):
+        with patch.object(repository, "credit_checkout_session", side_effect=RuntimeError("db down")):
+            _post(client, _checkout_event("evt_1"))
+        assert _event_status(repository, "evt_1") == "failed"
+
+        assert _post(client, _checkout_event("evt_1")).json() == {"status": "success"}
+        assert _event_status(repository, "evt_1") == "processed"
+        assert repository.get_user_credits("u1")["credits_remaining"] == 50
+
+    def test_retry_after_timeout_does_not_credit_twice(self, client, repository):
+        credit = repository.credit_checkout_session
+
+        def commit_then_time_out(payment):
+            credit(payment)
+            raise TimeoutError("read timed out")
+
+        with patch.object(repository, "credit_checkout_session", side_effect=commit_then_time_out):
+            _post(client, _checkout_event("evt_1"))
+        assert _event_status(repository, "evt_1") == "failed"
+
+        _post(client, _checkout_event("evt_1"))
+        assert _event_status(repository, "evt_1") == "processed"
+        assert repository.get_user_credits("u1")["credits_remaining"] == 50
+        assert len(repository.list_payments("u1")) == 1
+
+    def test_stuck_event_is_taken_over(self, client, repository):
+        # Acknowledged, but the worker died before processing it
+        repository.record_webhook_event("evt_1", "checkout.session.completed")
+        assert _post(client, _checkout_event("evt_1")).json() == {"status": "duplicate"}
+
+        repository.update_webhook_event("evt_1", {"received_at": "2020-01-01T00:00:00+00:00"})
+        assert _post(client, _checkout_event("evt_1")).json() == {"status": "success"}
+        assert _event_status(repository, "evt_1") == "processed"
+        assert repository.get_user_credits("u1")["credits_remaining"] == 50
+
+    def test_unpaid_session_is_not_credited(self, client, repository):
+        _post(client, _checkout_event("evt_1", payment_status="unpaid"))
+        assert repository.get_user_credits("u1") is None
+
+
+class TestVerifyPayment:
+    """Test cases for cached checkout session retrieval."""
+
+    @pytest.mark.asyncio
+    async def test_paid_session_is_cached(self):
+        payments._checkout_session_cache.clear()
+        session = {"id": "cs_1", "payment_status": "paid"}
+        with patch.object(payments.stripe.checkout.Session, "retrieve", return_value=session) as retrieve:
+            assert await payments.retrieve_checkout_session("cs_1") == session
+            assert await payments.retrieve_checkout_session("cs_1") == session
+        assert retrieve.call_count == 1
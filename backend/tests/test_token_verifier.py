@@ -0,0 +1,123 @@
+import time
+import pytest
+import httpx
+import jwt
+import jwt.utils
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+import routes.auth as auth
+from services.token_verifier import InvalidTokenError, LocalVerificationUnavailable, TokenVerifier
+
+SECRET = "test-jwt-secret-with-at-least-32-bytes"
+ROTATED_SECRET = "rotated-jwt-secret-with-at-least-32-bytes"
+
+
+def _token(secret: str = SECRET, **claims):
+    payload = {
+        "sub": "user-1",
+        "email": "user@example.com",
+        "role": "authenticated",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+        **claims,
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+class TestTokenVerifier:
+    """Test cases for local JWT verification."""
+
+    @pytest.mark.asyncio
+    async def test_valid_token(self):
+        verifier = TokenVerifier(SECRET, None)
+        user = await verifier.verify(_token())
+        assert user.id == "user-1"
+        assert user.email == "user@example.com"
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_signature_expired_and_wrong_audience(self):
+        verifier = TokenVerifier(SECRET, None)
+        for token in (
+            _token(secret="another-secret-with-at-least-32-bytes"),
+            _token(exp=int(time.time()) - 10),
+            _token(aud="anon"),
+        ):
+            with pytest.raises(InvalidTokenError):
+                await verifier.verify(token)
+
+    @pytest.mark.asyncio
+    async def test_verified_tokens_are_cached_until_expiry(self):
+        verifier = TokenVerifier(SECRET, None, cache_size=1)
+        token = _token()
+        user = await verifier.verify(token)
+        verifier.jwt_secret = ROTATED_SECRET
+        assert await verifier.verify(token) is user
+
+        # Evicted once another token takes the only slot
+        await verifier.verify(_token(sub="user-2", secret=ROTATED_SECRET))
+        with pytest.raises(InvalidTokenError):
+            await verifier.verify(token)
+
+    @pytest.mark.asyncio
+    async def test_asymmetric_token_with_unknown_key_is_rejected(self):
+        verifier = TokenVerifier(None, None)
+        _, payload, signature = _token().split(".")
+        forged_header = jwt.utils.base64url_encode(b'{"alg":"RS256","kid":"missing"}').decode()
+        token = ".".join([forged_header, payload, signature])
+        with pytest.raises(InvalidTokenError):
+            await verifier.verify(token)
+
+    @pytest.mark.asyncio
+    async def test_asymmetric_token_verified_with_jwks(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        jwks = {"keys": [{**jwk, "kid": "key-1", "alg": "RS256", "use": "sig"}]}
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=jwks))
+        real_client = httpx.AsyncClient
+
+        verifier = TokenVerifier(None, "https://project.supabase.co/auth/v1/.well-known/jwks.json")
+        token = jwt.encode(
+            {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": "key-1"},
+        )
+        with patch(
+            "services.token_verifier.httpx.AsyncClient",
+            lambda **kwargs: real_client(transport=transport, **kwargs),
+        ):
+            # The unknown key ID triggers a JWKS fetch
+            user = await verifier.verify(token)
+        assert user.id == "user-1"
+
+    @pytest.mark.asyncio
+    async def test_hs256_without_secret_needs_remote_check(self):
+        verifier = TokenVerifier(None, "https://project.supabase.co/auth/v1/.well-known/jwks.json")
+        with pytest.raises(LocalVerificationUnavailable):
+            await verifier.verify(_token())
+
+
+class TestVerifyToken:
+    """Test cases for choosing between local and remote token verification."""
+
+    @pytest.mark.asyncio
+    async def test_hs256_falls_back_to_remote_check_without_secret(self):
+        request = SimpleNamespace(cookies={}, headers={"Authorization": f"Bearer {_token()}"})
+        verifier = TokenVerifier(None, "https://project.supabase.co/auth/v1/.well-known/jwks.json")
+        remote_user = SimpleNamespace(id="user-1")
+        with patch.object(auth, "get_token_verifier", return_value=verifier), patch.object(
+            auth, "_get_remote_user", AsyncMock(return_value=remote_user)
+        ) as get_remote_user:
+            assert await auth.verify_token(request) is remote_user
+        get_remote_user.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_locally_verified_token_skips_remote_check(self):
+        request = SimpleNamespace(cookies={"sb-auth-token": _token()}, headers={})
+        with patch.object(auth, "get_token_verifier", return_value=TokenVerifier(SECRET, None)), patch.object(
+            auth, "_get_remote_user", AsyncMock()
+        ) as get_remote_user:
+            assert (await auth.verify_token(request)).id == "user-1"
+        get_remote_user.assert_not_awaited()
@@ -0,0 +1,116 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import prompts
+import routes.video_assets as video_assets
+from routes.auth import verify_token
+from video.assets import UploadOffsetError, UploadQuotaError, UploadTooLargeError, VideoAssetStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return VideoAssetStore(str(tmp_path), max_bytes=10, max_uploads_per_user=2, max_user_bytes=15)
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestVideoAssetStore:
+    """Test cases for chunked video uploads."""
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_appended_in_order(self, store):
+        asset_id = store.create("u1")
+        assert await store.append(asset_id, "u1", 0, stream(b"abc", b"de")) == 5
+        assert await store.append(asset_id, "u1", 5, stream(b"fg")) == 7
+        with open(store.path_for(asset_id, "u1"), "rb") as f:
+            assert f.read() == b"abcdefg"
+
+    @pytest.mark.asyncio
+    async def test_out_of_order_chunk_is_rejected(self, store):
+        asset_id = store.create("u1")
+        await store.append(asset_id, "u1", 0, stream(b"abc"))
+        with pytest.raises(UploadOffsetError) as error:
+            await store.append(asset_id, "u1", 0, stream(b"abc"))
+        assert error.value.expected_offset == 3
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_keeps_previous_chunks(self, store):
+        asset_id = store.create("u1")
+        await store.append(asset_id, "u1", 0, stream(b"abcdef"))
+        with pytest.raises(UploadTooLargeError):
+            await store.append(asset_id, "u1", 6, stream(b"ghi", b"jkl"))
+        with open(store.path_for(asset_id, "u1"), "rb") as f:
+            assert f.read() == b"abcdef"
+
+    def test_invalid_ids_are_rejected(self, store):
+        assert store.path_for("../../etc/passwd", "u1") is None
+        assert store.path_for("0" * 32, "u1") is None
+
+    @pytest.mark.asyncio
+    async def test_uploads_belong_to_their_owner(self, store):
+        asset_id = store.create("u1")
+        assert store.path_for(asset_id, "u2") is None
+        with pytest.raises(FileNotFoundError):
+            await store.append(asset_id, "u2", 0, stream(b"abc"))
+        store.delete(asset_id, "u2")
+        assert store.path_for(asset_id, "u1")
+
+    @pytest.mark.asyncio
+    async def test_per_user_quotas(self, store):
+        first, second = store.create("u1"), store.create("u1")
+        with pytest.raises(UploadQuotaError):
+            store.create("u1")
+        # Other users have their own quota
+        store.create("u2")
+
+        await store.append(first, "u1", 0, stream(b"a" * 10))
+        with pytest.raises(UploadQuotaError):
+            await store.append(second, "u1", 0, stream(b"b" * 3, b"b" * 3))
+        assert await store.append(second, "u1", 0, stream(b"b" * 5)) == 5
+
+        store.delete(first, "u1")
+        store.create("u1")
+
+
+class TestVideoAssetRoutes:
+    """Test cases for the upload endpoints and referencing uploads in prompts."""
+
+    @pytest.mark.asyncio
+    async def test_uploaded_video_is_read_in_place(self, store):
+        app = FastAPI()
+        app.include_router(video_assets.router, prefix="/api")
+        app.dependency_overrides[verify_token] = lambda: SimpleNamespace(id="user")
+        client = TestClient(app)
+
+        with patch.object(video_assets, "get_video_asset_store", return_value=store):
+            created = client.post("/api/video-assets", content=b"vid").json()
+            asset_id = created["assetId"]
+            assert created["size"] == 3
+            assert client.post(f"/api/video-assets/{asset_id}?offset=0", content=b"x").status_code == 409
+            assert client.post(f"/api/video-assets/{asset_id}?offset=3", content=b"eo").json()["size"] == 5
+            assert client.post(f"/api/video-assets/{asset_id}?offset=5", content=b"x" * 10).status_code == 413
+            assert client.post(f"/api/video-assets/{'0' * 32}?offset=0", content=b"x").status_code == 404
+
+        assemble = AsyncMock(return_value=[{"role": "user", "content": []}])
+        with patch.object(prompts, "get_video_asset_store", return_value=store), patch.object(
+            prompts, "assemble_claude_prompt_video_file", assemble
+        ):
+            prompt = {"text": "", "images": [], "videoAssetId": asset_id}
+            with pytest.raises(ValueError):
+                await prompts.create_prompt(
+                    "html_tailwind", "video", "create", prompt, [], False, user_id="someone else"
+                )
+            path = store.path_for(asset_id, "user")
+            messages, _ = await prompts.create_prompt(
+                "html_tailwind", "video", "create", prompt, [], False, user_id="user"
+            )
+
+        assemble.assert_awaited_once_with(path)
+        assert messages == [{"role": "user", "content": []}]
+        # Deleted once its frames were extracted
+        assert store.path_for(asset_id, "user") is None
@@ -0,0 +1,60 @@
+import io
+import numpy as np
+from PIL import Image
+from video.encoding import (
+    MAX_IMAGE_TOKENS,
+    MIN_IMAGE_TOKENS,
+    allocate_token_budget,
+    encode_jpeg,
+    estimate_image_tokens,
+    fit_to_token_budget,
+    static_chrome_crop,
+)
+
+
+class TestTokenBudget:
+    """Test cases for sizing frames to a token budget."""
+
+    def test_4k_frame_is_scaled_to_its_budget(self):
+        width, height = fit_to_token_budget(3840, 2160, 1000)
+        assert estimate_image_tokens(width, height) <= 1000
+        assert abs(width / height - 16 / 9) < 0.01
+        # Never above what Claude would downsize to anyway
+        assert estimate_image_tokens(*fit_to_token_budget(3840, 2160, 10**6)) <= MAX_IMAGE_TOKENS
+
+    def test_small_frames_are_not_upscaled(self):
+        assert fit_to_token_budget(640, 360, MAX_IMAGE_TOKENS) == (640, 360)
+
+    def test_detailed_frames_get_a_larger_share(self):
+        budgets = allocate_token_budget([1.0, 16.0, 4.0], 3000)
+        assert sum(budgets) <= 3000
+        assert budgets[1] > budgets[2] > budgets[0]
+        assert allocate_token_budget([1.0] * 20, 1000) == [MIN_IMAGE_TOKENS] * 20
+
+
+class TestStaticChromeCrop:
+    """Test cases for cropping static edges of a recording."""
+
+    def test_static_header_and_sidebar_are_cropped(self):
+        frames = np.zeros((3, 100, 100), dtype=np.float32)
+        for i in range(3):
+            frames[i, 20:, 30:] = np.random.default_rng(i).uniform(0, 255, (80, 70))
+        left, top, right, bottom = static_chrome_crop(frames)
+        assert (left, right) == (0.29, 1.0) and (top, bottom) == (0.19, 1.0)
+
+    def test_small_changes_do_not_crop(self):
+        frames = np.zeros((2, 100, 100), dtype=np.float32)
+        frames[1, 10:14, 10:14] = 255  # A moving cursor
+        assert static_chrome_crop(frames) is None
+
+
+class TestJpegQuality:
+    """Test cases for per-frame JPEG quality."""
+
+    def test_quality_is_lowered_to_fit_the_size_cap(self):
+        noise = np.random.default_rng(0).integers(0, 255, (256, 256, 3), dtype=np.uint8)
+        image = Image.fromarray(noise)
+        best, best_quality = encode_jpeg(image, 10**7)
+        capped, capped_quality = encode_jpeg(image, len(best) * 2 // 3)
+        assert capped_quality < best_quality and len(capped) < len(best)
+        assert Image.open(io.BytesIO(capped)).format == "JPEG"
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+import imageio_ffmpeg  # type: ignore
+from unittest.mock import patch
+import video.utils as video_utils
+from video.encoding import EncodedFrame
+from video.frame_cache import FrameCache, frame_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FrameCache(str(tmp_path), max_bytes=1200)
+
+
+def frames(*sizes: int):
+    return [EncodedFrame(bytes([i]) * size, 64, 32, 80) for i, size in enumerate(sizes)]
+
+
+class TestFrameCache:
+    """Test cases for the encoded video frame cache."""
+
+    def test_round_trip(self, cache):
+        key = frame_cache_key("video", {"max_frames": 20})
+        assert cache.get(key) is None
+        cache.put(key, frames(10, 20))
+        assert cache.get(key) == frames(10, 20)
+
+    def test_parameters_are_part_of_the_key(self):
+        assert frame_cache_key("video", {"max_frames": 20}) != frame_cache_key(
+            "video", {"max_frames": 10}
+        )
+        assert frame_cache_key("a", {}) != frame_cache_key("b", {})
+
+    def test_least_recently_used_entries_are_evicted(self, cache):
+        old, recent, newest = (frame_cache_key(name, {}) for name in ("old", "recent", "newest"))
+        cache.put(old, frames(400))
+        cache.put(recent, frames(400))
+        os.utime(cache._path_for(old), (1, 1))
+        assert cache.get(recent)
+
+        cache.put(newest, frames(400))
+        assert cache.get(old) is None
+        assert cache.get(recent) and cache.get(newest)
+
+
+class TestCachedExtraction:
+    """Test cases for skipping extraction on repeats of the same recording."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_skips_decoding(self, cache, tmp_path):
+        path = str(tmp_path / "clip.mp4")
+        writer = imageio_ffmpeg.write_frames(path, (64, 64), fps=10)
+        writer.send(None)
+        for i in range(20):
+            writer.send(np.full((64, 64, 3), (i // 10) * 120, dtype=np.uint8).tobytes())
+        writer.close()
+
+        cache.max_bytes = 10**6
+        with patch.object(video_utils, "get_frame_cache", return_value=cache):
+            first = await video_utils.extract_encoded_frames(path, 20)
+            with patch.object(video_utils, "run_in_pool", side_effect=AssertionError("decoded")):
+                assert await video_utils.extract_encoded_frames(path, 20) == first
+            # Different parameters are extracted again
+            with pytest.raises(AssertionError, match="decoded"), patch.object(
+                video_utils, "run_in_pool", side_effect=AssertionError("decoded")
+            ):
+                await video_utils.extract_encoded_frames(path, 20, frame_mode="grid")
@@ -0,0 +1,114 @@
+import asyncio
+import io
+from unittest.mock import patch
+import numpy as np
+import pytest
+import imageio_ffmpeg  # type: ignore
+from PIL import Image
+from config import VIDEO_MAX_CONCURRENT_JOBS
+from video.contact_sheet import TILE_GAP
+from video.keyframes import select_keyframes
+import video.utils as video_utils
+from video.utils import extract_encoded_frames, extract_screenshots
+
+
+@pytest.fixture(autouse=True)
+def no_frame_cache():
+    """Always exercise the extraction pipeline"""
+    with patch.object(video_utils, "get_frame_cache", return_value=None):
+        yield
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    """A 4s clip whose brightness encodes the current second"""
+    path = str(tmp_path_factory.mktemp("video") / "clip.mp4")
+    writer = imageio_ffmpeg.write_frames(path, (64, 64), fps=10)
+    writer.send(None)
+    for i in range(40):
+        writer.send(np.full((64, 64, 3), (i // 10) * 60, dtype=np.uint8).tobytes())
+    writer.close()
+    return path
+
+
+class TestFrameSampling:
+    """Test cases for frame extraction from video files."""
+
+    def test_extracts_one_frame_per_scene(self, recording):
+        images = extract_screenshots(recording, target_num_screenshots=20)
+        brightness = [round(np.asarray(image).mean() / 60) for image in images]
+        assert brightness == [0, 1, 2, 3]
+
+
+    @pytest.mark.parametrize(
+        "keyframe_interval, keyframes_only", [(4, True), (1000, False)]
+    )
+    def test_long_video_candidates(self, tmp_path, keyframe_interval, keyframes_only):
+        # 70s (past FULL_DECODE_MAX_SECONDS), one scene every 10s
+        path = str(tmp_path / "long.mp4")
+        writer = imageio_ffmpeg.write_frames(
+            path, (64, 64), fps=2,
+            output_params=["-g", str(keyframe_interval), "-sc_threshold", "0"],
+        )
+        writer.send(None)
+        for i in range(140):
+            writer.send(np.full((64, 64, 3), (i // 20) * 35, dtype=np.uint8).tobytes())
+        writer.close()
+
+        with patch.object(
+            video_utils, "read_sampled_frames", wraps=video_utils.read_sampled_frames
+        ) as read_sampled_frames:
+            images = extract_screenshots(path, target_num_screenshots=20)
+
+        # Sparse keyframes fall back to decoding every frame
+        assert read_sampled_frames.called != keyframes_only
+        brightness = [round(np.asarray(image).mean() / 35) for image in images]
+        assert brightness == [0, 1, 2, 3, 4, 5, 6]
+
+
+class TestKeyframeSelection:
+    """Test cases for scene-change-aware keyframe selection."""
+
+    def test_near_duplicates_are_dropped(self):
+        frames = np.zeros((50, 8, 8), dtype=np.float32)
+        frames[:, 0, 0] = np.arange(50) % 3  # cursor-sized noise
+        assert select_keyframes(frames, 20) == [0]
+
+    def test_short_transition_is_kept(self):
+        frames = np.zeros((100, 8, 8), dtype=np.float32)
+        frames[40:42] = 200  # a brief modal
+        frames[70:] = 100  # a new page
+        assert select_keyframes(frames, 20) == [0, 40, 70]
+
+    def test_most_distinct_frames_win_when_over_budget(self):
+        frames = np.stack([np.full((4, 4), value, dtype=np.float32) for value in (0, 10, 200, 20, 100)])
+        assert select_keyframes(frames, 3) == [0, 2, 4]
+
+
+class TestFrameWorkers:
+    """Test cases for extracting frames in the worker pool."""
+
+    @pytest.mark.asyncio
+    async def test_frames_are_encoded_in_the_pool(self, recording):
+        frames = await extract_encoded_frames(recording, 20)
+        images = [Image.open(io.BytesIO(frame.data)) for frame in frames]
+        assert [image.format for image in images] == ["JPEG"] * 4
+        assert [round(np.asarray(image).mean() / 60) for image in images] == [0, 1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_grid_mode_packs_frames_into_a_contact_sheet(self, recording):
+        sheets = await extract_encoded_frames(recording, 20, frame_mode="grid")
+        assert [sheet.frames for sheet in sheets] == [4]
+        assert (sheets[0].width, sheets[0].height) == (2 * 64 + TILE_GAP, 2 * 64 + TILE_GAP)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_extraction_releases_its_slot(self, recording):
+        task = asyncio.create_task(extract_encoded_frames(recording, 20))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Later requests aren't blocked by the cancelled one
+        for _ in range(VIDEO_MAX_CONCURRENT_JOBS):
+            assert len(await extract_encoded_frames(recording, 2)) == 2
@@ -0,0 +1,134 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import models.claude as claude
+from codegen.validation import find_draft_problems
+
+COMPLETE_APP = """<html><body><button id="b">Go</button>
+<script>document.getElementById("b").onclick = () => alert("hi");</script>
+</body></html>"""
+
+
+class FakeStream:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+    @property
+    def text_stream(self):
+        async def chunks():
+            yield self.text
+
+        return chunks()
+
+    async def get_final_message(self):
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.text)],
+            usage=SimpleNamespace(
+                input_tokens=1,
+                output_tokens=1,
+                cache_creation_input_tokens=0,
+                cache_read_input_tokens=0,
+            ),
+        )
+
+
+class FakeAnthropic:
+    """Replies with the given responses in order, recording each request"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.messages = SimpleNamespace(stream=self.stream)
+
+    def stream(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeStream(self.responses.pop(0))
+
+    async def close(self):
+        pass
+
+
+async def generate(client, **kwargs):
+    drafts = []
+
+    async def on_draft(response: str):
+        drafts.append(response)
+
+    async def ignore(_: str):
+        pass
+
+    messages = [{"role": "user", "content": "video"}]
+    with patch.object(claude, "AsyncAnthropic", return_value=client):
+        completion = await claude.stream_claude_response_native(
+            system_prompt="system",
+            messages=messages,
+            api_key="key",
+            callback=ignore,
+            on_draft=on_draft,
+            **kwargs,
+        )
+    assert messages == [{"role": "user", "content": "video"}]
+    return completion, drafts
+
+
+class TestDraftValidation:
+    """Test cases for detecting unfinished drafts."""
+
+    def test_complete_app_has_no_problems(self):
+        assert find_draft_problems(COMPLETE_APP) == []
+
+    def test_unfinished_drafts_are_detected(self):
+        assert "no JavaScript" in find_draft_problems("<html><body></body></html>")
+        assert find_draft_problems(COMPLETE_APP[:-20])[0].startswith("document is incomplete")
+        placeholder = COMPLETE_APP.replace("<button", "<!-- Add more buttons here --><button")
+        assert find_draft_problems(placeholder) == ["placeholder comment: Add more buttons here"]
+        js_placeholder = COMPLETE_APP.replace("alert", "/* rest of the logic */ alert")
+        assert find_draft_problems(js_placeholder) == ["placeholder comment: /* rest of the logic */"]
+
+
+class TestGenerationPasses:
+    """Test cases for progressive multi-pass video generation."""
+
+    @pytest.mark.asyncio
+    async def test_drafts_are_delivered_before_refinement(self):
+        client = FakeAnthropic(["draft 1", "draft 2", "final"])
+        completion, drafts = await generate(client, max_passes=3)
+        assert completion["code"] == "final"
+        assert drafts == ["draft 1", "draft 2"]
+        # Each refinement sees the previous drafts
+        assert len(client.requests[2]["messages"]) == 5
+
+    @pytest.mark.asyncio
+    async def test_cache_breakpoints_follow_frames_and_latest_draft(self):
+        client = FakeAnthropic(["draft 1", "draft 2", "final"])
+        await generate(client, max_passes=3)
+
+        def breakpoints(messages):
+            return [
+                index
+                for index, message in enumerate(messages)
+                if isinstance(message["content"], list)
+                and "cache_control" in message["content"][-1]
+            ]
+
+        assert breakpoints(client.requests[0]["messages"]) == [0]
+        assert breakpoints(client.requests[1]["messages"]) == [0, 1]
+        # The earlier draft's breakpoint moves to the latest one
+        third = client.requests[2]["messages"]
+        assert breakpoints(third) == [0, 3]
+        assert third[1] == {"role": "assistant", "content": "<thinking>draft 1"}
+
+    @pytest.mark.asyncio
+    async def test_valid_draft_skips_refinement(self):
+        client = FakeAnthropic([COMPLETE_APP, "refined"])
+        completion, drafts = await generate(
+            client, max_passes=2, should_refine=lambda response: bool(find_draft_problems(response))
+        )
+        assert completion["code"] == COMPLETE_APP
+        assert drafts == [] and len(client.requests) == 1
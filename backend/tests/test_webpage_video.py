@@ -0,0 +1,195 @@
+import asyncio
+import os
+import httpx
+import pytest
+from unittest.mock import patch
+import video.webpage_video as webpage_video
+from video.media_store import MediaStore, media_key
+
+
+class TestImagePrompts:
+    """Test cases for parsing the image prompt completion."""
+
+    def test_prompts_in_code_fence(self):
+        completion = 'Here you go:\n```json\n["A desk.", "", "A team meeting."]\n```'
+        assert webpage_video.parse_image_prompts(completion) == ["A desk.", "A team meeting."]
+
+
+class TestFetchPageText:
+    """Test cases for downloading the webpage."""
+
+    async def fetch(self, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(webpage_video, "_get_client", return_value=client):
+            return await webpage_video.fetch_page_text("https://example.com")
+
+    @pytest.mark.asyncio
+    async def test_page_text_is_extracted(self):
+        html = "<html><head><title>Example</title></head><body><p>Hello.</p></body></html>"
+        text = await self.fetch(lambda request: httpx.Response(200, text=html))
+        assert text.startswith("Example")
+
+    @pytest.mark.asyncio
+    async def test_oversized_page_is_abandoned(self):
+        read = []
+
+        async def chunks():
+            for _ in range(100):
+                read.append(1)
+                yield b"x" * 10
+
+        with patch.object(webpage_video, "MAX_PAGE_BYTES", 50):
+            with pytest.raises(ValueError):
+                await self.fetch(lambda request: httpx.Response(200, text="x" * 60))
+            with pytest.raises(ValueError):
+                await self.fetch(lambda request: httpx.Response(200, content=chunks()))
+        # Reading stopped at the limit
+        assert len(read) < 100
+
+
+class TestDownloadImage:
+    """Test cases for downloading generated images."""
+
+    @pytest.mark.asyncio
+    async def test_oversized_image_is_abandoned(self, tmp_path):
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"x" * 60))
+        )
+        with patch.object(webpage_video, "_get_client", return_value=client), patch.object(
+            webpage_video, "get_blob_store", return_value=None
+        ):
+            path = await webpage_video.download_image("https://images.example/a.png", str(tmp_path / "a"))
+            assert path == str(tmp_path / "a.png")
+            with patch.object(webpage_video, "MAX_IMAGE_BYTES", 50):
+                with pytest.raises(ValueError):
+                    await webpage_video.download_image("https://images.example/b.png", str(tmp_path / "b"))
+        assert os.listdir(tmp_path) == ["a.png"]
+
+
+class TestMediaStore:
+    """Test cases for the content-addressed output store."""
+
+    def test_put_and_get(self, tmp_path):
+        store = MediaStore(str(tmp_path))
+        key = media_key("test", {"input": "a"})
+        assert key != media_key("test", {"input": "b"})
+        assert store.get(key) is None
+
+        partial_path = store.partial_path(key)
+        assert partial_path.endswith(".mp4")
+        with open(partial_path, "wb") as f:
+            f.write(b"video")
+        path = store.put(key, partial_path)
+        assert store.get(key) == path == str(tmp_path / f"{key}.mp4")
+        assert not os.path.exists(partial_path)
+
+    def test_least_recently_used_outputs_are_evicted(self, tmp_path):
+        store = MediaStore(str(tmp_path), max_bytes=250)
+        keys = [media_key("test", {"input": i}) for i in range(3)]
+        for index, key in enumerate(keys):
+            partial_path = store.partial_path(key)
+            with open(partial_path, "wb") as f:
+                f.write(b"x" * 100)
+            os.utime(store.put(key, partial_path), (index, index))
+        assert store.get(keys[0]) is None
+        assert store.get(keys[1]) and store.get(keys[2])
+
+
+class TestWebpageVideoJob:
+    """Test cases for running webpage-to-video as a background job."""
+
+    @pytest.fixture(autouse=True)
+    def job_dir(self, tmp_path):
+        job_dir = str(tmp_path / "jobs")
+        with patch.object(webpage_video, "WEBPAGE_VIDEO_JOB_DIR", job_dir):
+            yield job_dir
+
+    @pytest.fixture
+    def pipeline(self, tmp_path):
+        calls = {"complete": 0, "encode": 0}
+
+        async def fake_complete(prompt: str) -> str:
+            calls["complete"] += 1
+            return '["One.", "Two."]' if "image prompts" in prompt else "The script."
+
+        async def fake_fetch_page_text(url: str) -> str:
+            return "Page text"
+
+        async def fake_process_tasks(prompts, api_key, base_url, model):
+            return [f"https://images.example/{i}.png" for i in range(len(prompts))]
+
+        async def fake_download_image(url: str, path_without_extension: str) -> str:
+            return path_without_extension + ".png"
+
+        async def fake_run_in_pool(fn, image_paths, audio_path, output_path):
+            assert fn is webpage_video.render_slideshow
+            assert [p.rsplit("/", 1)[1] for p in image_paths] == ["image_0.png", "image_1.png"]
+            calls["encode"] += 1
+            await asyncio.sleep(0)
+            with open(output_path, "wb") as f:
+                f.write(b"video")
+            return output_path
+
+        store = MediaStore(str(tmp_path / "videos"))
+        with patch.object(webpage_video, "OPENAI_API_KEY", "key"), patch.object(
+            webpage_video, "get_media_store", return_value=store
+        ), patch.object(webpage_video, "complete", fake_complete), patch.object(
+            webpage_video, "fetch_page_text", fake_fetch_page_text
+        ), patch.object(webpage_video, "process_tasks", fake_process_tasks), patch.object(
+            webpage_video, "download_image", fake_download_image
+        ), patch.object(webpage_video, "synthesize_speech"), patch.object(
+            webpage_video, "run_in_pool", fake_run_in_pool
+        ):
+            yield calls
+
+    @pytest.mark.asyncio
+    async def test_job_runs_to_completion(self, pipeline, tmp_path):
+        job = webpage_video.start_job("https://example.com")
+        assert webpage_video.get_job(job.id) is job
+        await asyncio.gather(*webpage_video._tasks)
+
+        assert job.status == "completed", job.error
+        assert job.progress == 1.0
+        assert job.video_path and os.path.dirname(job.video_path) == str(tmp_path / "videos")
+        assert os.listdir(tmp_path / "videos") == [os.path.basename(job.video_path)]
+
+    @pytest.mark.asyncio
+    async def test_other_workers_see_the_job(self, pipeline):
+        job = webpage_video.start_job("https://example.com")
+        # As seen by a worker that didn't start the job
+        with patch.object(webpage_video, "_jobs", {}):
+            assert webpage_video.get_job(job.id).status == "queued"
+            await asyncio.gather(*webpage_video._tasks)
+            seen = webpage_video.get_job(job.id)
+        assert seen is not job and seen == job
+        assert seen.status == "completed"
+        assert webpage_video.get_job("../" + job.id) is None
+
+    def test_old_job_files_are_pruned(self, job_dir):
+        os.makedirs(job_dir)
+        old_path = os.path.join(job_dir, "0" * 32 + ".json")
+        with open(old_path, "w") as f:
+            f.write("{}")
+        os.utime(old_path, (0, 0))
+        webpage_video._prune_jobs()
+        assert os.listdir(job_dir) == []
+
+    @pytest.mark.asyncio
+    async def test_identical_pages_share_one_render(self, pipeline):
+        # Two concurrent jobs, then one after they finished
+        jobs = [webpage_video.start_job("https://example.com") for _ in range(2)]
+        await asyncio.gather(*webpage_video._tasks)
+        jobs.append(webpage_video.start_job("https://example.com/?ref=1"))
+        await asyncio.gather(*webpage_video._tasks)
+
+        assert [job.status for job in jobs] == ["completed"] * 3
+        assert len({job.video_path for job in jobs}) == 1
+        assert pipeline == {"complete": 2, "encode": 1}
+
+    @pytest.mark.asyncio
+    async def test_failure_is_reported_on_the_job(self):
+        with patch.object(webpage_video, "OPENAI_API_KEY", None):
+            job = webpage_video.start_job("https://example.com")
+            await asyncio.gather(*webpage_video._tasks)
+        assert job.status == "failed"
+        assert job.error == "OPENAI_API_KEY is not set."
@@ -0,0 +1,192 @@
+"""
+Uploaded video recordings, stored on disk and referenced by asset ID.
+
+Sending a recording as a base64 data URL inside the WebSocket params holds
+it in memory several times over (the JSON frame, the decoded bytes and the
+temp file copy). Instead the client uploads the raw bytes in chunks, which
+are appended straight to a file, and the generation request references the
+returned asset ID. Frame extraction then reads the file in place, and the
+upload is deleted once its frames have been extracted.
+
+Uploads are kept in a directory per owner, so an asset ID only resolves for
+the user who uploaded it, and each user has a cap on open uploads and on
+their combined size.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from config import (
+    VIDEO_UPLOAD_DIR,
+    VIDEO_UPLOAD_MAX_AGE_HOURS,
+    VIDEO_UPLOAD_MAX_BYTES,
+    VIDEO_UPLOAD_MAX_PER_USER,
+    VIDEO_UPLOAD_MAX_USER_BYTES,
+)
+
+ASSET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class VideoUploadError(Exception):
+    """An upload chunk was rejected"""
+
+
+class UploadTooLargeError(VideoUploadError):
+    pass
+
+
+class UploadQuotaError(VideoUploadError):
+    """The user has too many uploads open, or too many bytes uploaded"""
+
+
+class UploadOffsetError(VideoUploadError):
+    """A chunk did not start where the previous one ended"""
+
+    def __init__(self, expected_offset: int):
+        self.expected_offset = expected_offset
+        super().__init__(f"Chunk must start at offset {expected_offset}")
+
+
+def _owner_key(owner: str) -> str:
+    """Directory name for an owner's uploads (user IDs aren't safe path names)"""
+    return hashlib.sha256(owner.encode("utf-8")).hexdigest()[:32]
+
+
+class VideoAssetStore:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = VIDEO_UPLOAD_MAX_BYTES,
+        max_age_hours: float = VIDEO_UPLOAD_MAX_AGE_HOURS,
+        max_uploads_per_user: int = VIDEO_UPLOAD_MAX_PER_USER,
+        max_user_bytes: int = VIDEO_UPLOAD_MAX_USER_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_hours * 3600
+        self.max_uploads_per_user = max_uploads_per_user
+        self.max_user_bytes = max_user_bytes
+        # One lock per owner, so the quota check and the write can't interleave
+        self._locks: Dict[str, asyncio.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _owner_directory(self, owner: str) -> str:
+        return os.path.join(self.directory, _owner_key(owner))
+
+    def _uploads(self, owner: str) -> List[str]:
+        """Paths of an owner's uploads"""
+        directory = self._owner_directory(owner)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in names if ASSET_ID_RE.match(name)]
+
+    def _uploaded_bytes(self, owner: str) -> int:
+        total = 0
+        for path in self._uploads(owner):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def path_for(self, asset_id: str, owner: str) -> Optional[str]:
+        """Path of an owner's uploaded video, or None if the ID is invalid or not theirs"""
+        if not ASSET_ID_RE.match(asset_id):
+            return None
+        path = os.path.join(self._owner_directory(owner), asset_id)
+        return path if os.path.isfile(path) else None
+
+    def create(self, owner: str) -> str:
+        """Start an empty upload for `owner` and return its asset ID"""
+        self.cleanup()
+        if len(self._uploads(owner)) >= self.max_uploads_per_user:
+            raise UploadQuotaError(
+                f"At most {self.max_uploads_per_user} video uploads can be open at once"
+            )
+        asset_id = uuid.uuid4().hex
+        os.makedirs(self._owner_directory(owner), exist_ok=True)
+        open(os.path.join(self._owner_directory(owner), asset_id), "wb").close()
+        return asset_id
+
+    async def append(
+        self, asset_id: str, owner: str, offset: int, chunks: AsyncIterator[bytes]
+    ) -> int:
+        """Append a streamed chunk at `offset` and return the upload's new size.
+
+        The offset must equal the current size, so a retried or reordered
+        chunk is rejected instead of corrupting the file.
+        """
+        path = self.path_for(asset_id, owner)
+        if not path:
+            raise FileNotFoundError(asset_id)
+
+        lock = self._locks.setdefault(_owner_key(owner), asyncio.Lock())
+        async with lock:
+            size = os.path.getsize(path)
+            if offset != size:
+                raise UploadOffsetError(size)
+            # Room left in the user's quota, counting this upload as it is now
+            user_bytes_left = self.max_user_bytes - self._uploaded_bytes(owner)
+
+            with open(path, "ab") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    user_bytes_left -= len(chunk)
+                    if size > self.max_bytes or user_bytes_left < 0:
+                        # Drop the partial chunk so the client can't resume past the limit
+                        f.truncate(offset)
+                        if size > self.max_bytes:
+                            raise UploadTooLargeError(
+                                f"Video is larger than {self.max_bytes} bytes"
+                            )
+                        raise UploadQuotaError(
+                            f"Video uploads are limited to {self.max_user_bytes} bytes per user"
+                        )
+                    f.write(chunk)
+        return size
+
+    def delete(self, asset_id: str, owner: str) -> None:
+        path = self.path_for(asset_id, owner)
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self) -> None:
+        """Remove uploads older than max_age_hours"""
+        cutoff = time.time() - self.max_age_seconds
+        for owner_key in os.listdir(self.directory):
+            owner_directory = os.path.join(self.directory, owner_key)
+            if not ASSET_ID_RE.match(owner_key) or not os.path.isdir(owner_directory):
+                continue
+            for name in os.listdir(owner_directory):
+                path = os.path.join(owner_directory, name)
+                try:
+                    if ASSET_ID_RE.match(name) and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+            try:
+                # Only succeeds once the owner has no uploads left
+                os.rmdir(owner_directory)
+                self._locks.pop(owner_key, None)
+            except OSError:
+                pass
+
+
+_video_asset_store: Optional[VideoAssetStore] = None
+
+
+def get_video_asset_store() -> VideoAssetStore:
+    global _video_asset_store
+    if _video_asset_store is None:
+        _video_asset_store = VideoAssetStore(VIDEO_UPLOAD_DIR)
+    return _video_asset_store
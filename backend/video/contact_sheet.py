@@ -0,0 +1,66 @@
+"""
+Contact sheets: several consecutive video frames tiled into one image.
+
+Each image block has a fixed overhead and requests are capped at 20 images,
+which limits how much of a long or busy recording the model can see. In grid
+mode, frames are downscaled and tiled (left to right, top to bottom) into
+sheets labelled with frame numbers, so the same token budget covers several
+times as many frames.
+"""
+
+import math
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Gap between tiles, and the label's font size relative to the tile height
+TILE_GAP = 4
+LABEL_SCALE = 0.08
+MIN_LABEL_SIZE = 10
+
+
+def grid_shape(num_tiles: int) -> Tuple[int, int]:
+    """(columns, rows) of the most square grid that fits num_tiles"""
+    columns = math.ceil(math.sqrt(num_tiles))
+    return columns, math.ceil(num_tiles / columns)
+
+
+def tile_size(
+    sheet_width: int, sheet_height: int, columns: int, rows: int
+) -> Tuple[int, int]:
+    """Size of each tile in a sheet of the given size"""
+    width = (sheet_width - TILE_GAP * (columns - 1)) // columns
+    height = (sheet_height - TILE_GAP * (rows - 1)) // rows
+    # Even dimensions keep ffmpeg's scaler happy
+    return max(2, width // 2 * 2), max(2, height // 2 * 2)
+
+
+def render_contact_sheet(tiles: List[Image.Image], first_frame_number: int) -> Image.Image:
+    """Tile equally sized frames into one image, each labelled with its frame number"""
+    columns, rows = grid_shape(len(tiles))
+    width, height = tiles[0].size
+    sheet = Image.new(
+        "RGB",
+        (columns * width + TILE_GAP * (columns - 1), rows * height + TILE_GAP * (rows - 1)),
+        "white",
+    )
+    draw = ImageDraw.Draw(sheet)
+    font_size = max(MIN_LABEL_SIZE, round(height * LABEL_SCALE))
+    font = ImageFont.load_default(size=font_size)
+
+    for index, tile in enumerate(tiles):
+        x = (index % columns) * (width + TILE_GAP)
+        y = (index // columns) * (height + TILE_GAP)
+        sheet.paste(tile, (x, y))
+
+        # White-on-black so the label reads on any background
+        label = f"#{first_frame_number + index}"
+        left, top, right, bottom = draw.textbbox((0, 0), label, font=font)
+        padding = max(2, font_size // 4)
+        draw.rectangle(
+            (x, y, x + right - left + 2 * padding, y + bottom - top + 2 * padding),
+            fill="black",
+        )
+        draw.text((x + padding - left, y + padding - top), label, fill="white", font=font)
+
+    return sheet
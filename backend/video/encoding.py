@@ -0,0 +1,136 @@
+"""
+Token-budgeted frame encoding for video prompts.
+
+Claude bills an image at roughly width * height / 750 input tokens (and
+downsizes anything above about 1600 tokens anyway), so sending 20 full
+resolution frames of a 4K recording costs a lot for no extra detail. Frames
+are instead scaled to share a total token budget: frames with more detail
+(text-dense screens) get a larger share than mostly blank ones. JPEG quality
+is then lowered per frame until the file fits a size cap, which keeps the
+request small without touching the token count.
+
+Optionally, static "chrome" around the edges (browser toolbars, OS menu bars,
+sidebars that never change) can be cropped away before scaling, so the
+budget is spent on the part of the screen the user interacts with.
+"""
+
+import io
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Claude's image token estimate, and the size above which it downsizes images
+IMAGE_TOKEN_PIXELS = 750
+MAX_IMAGE_TOKENS = 1600
+MAX_IMAGE_EDGE = 1568
+# Below this frames get too blurry to read UI text
+MIN_IMAGE_TOKENS = 200
+JPEG_QUALITIES = (90, 80, 70, 60, 50)
+
+# Pixel change (0-255) on the candidate frames that counts as "not static"
+CHROME_CHANGE_THRESHOLD = 8.0
+# Only crop when it saves at least this much area, and keeps at least this
+# much of each dimension (a moving cursor alone shouldn't zoom into a corner)
+CHROME_MIN_SAVING = 0.1
+CHROME_MIN_KEPT = 0.5
+
+# Crop box as (left, top, right, bottom) fractions of the frame
+CropBox = Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class EncodedFrame:
+    data: bytes
+    width: int
+    height: int
+    quality: int
+    # Video frames shown in the image (more than one for contact sheets)
+    frames: int = 1
+
+    @property
+    def tokens(self) -> int:
+        return estimate_image_tokens(self.width, self.height)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    return math.ceil(width * height / IMAGE_TOKEN_PIXELS)
+
+
+def fit_to_token_budget(width: int, height: int, max_tokens: int) -> Tuple[int, int]:
+    """The largest size with the frame's aspect ratio that costs at most max_tokens"""
+    max_tokens = min(max_tokens, MAX_IMAGE_TOKENS)
+    scale = min(
+        1.0,
+        math.sqrt(max_tokens * IMAGE_TOKEN_PIXELS / (width * height)),
+        MAX_IMAGE_EDGE / max(width, height),
+    )
+    # Even dimensions keep ffmpeg's scaler happy
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def frame_detail(frame: np.ndarray) -> float:
+    """Mean gradient magnitude of a grayscale frame; high for text-dense screens"""
+    return float(
+        np.abs(np.diff(frame, axis=0)).mean() + np.abs(np.diff(frame, axis=1)).mean()
+    )
+
+
+def allocate_token_budget(details: List[float], total_budget: int) -> List[int]:
+    """Split a token budget between frames, weighted by their detail.
+
+    Every frame gets between half and one and a half times an even share,
+    and between MIN_IMAGE_TOKENS and MAX_IMAGE_TOKENS.
+    """
+    if not details:
+        return []
+    even_share = total_budget / len(details)
+    weights = np.sqrt(np.maximum(np.asarray(details, dtype=np.float64), 1e-6))
+    shares = np.clip(
+        total_budget * weights / weights.sum(), even_share * 0.5, even_share * 1.5
+    )
+    if shares.sum() > total_budget:
+        shares *= total_budget / shares.sum()
+    return [
+        int(share) for share in np.clip(shares, MIN_IMAGE_TOKENS, MAX_IMAGE_TOKENS)
+    ]
+
+
+def static_chrome_crop(frames: np.ndarray) -> Optional[CropBox]:
+    """The box around everything that changes during the video, or None.
+
+    `frames` is an (n, height, width) grayscale stack covering the video.
+    """
+    if len(frames) < 2:
+        return None
+    changes = np.abs(np.diff(frames, axis=0)).max(axis=0) > CHROME_CHANGE_THRESHOLD
+    rows = np.flatnonzero(changes.any(axis=1))
+    cols = np.flatnonzero(changes.any(axis=0))
+    if len(rows) == 0:
+        return None
+
+    height, width = changes.shape
+    # One candidate pixel of margin for scaling error
+    top, bottom = max(0, rows[0] - 1), min(height, rows[-1] + 2)
+    left, right = max(0, cols[0] - 1), min(width, cols[-1] + 2)
+    kept_width, kept_height = (right - left) / width, (bottom - top) / height
+    if kept_width < CHROME_MIN_KEPT or kept_height < CHROME_MIN_KEPT:
+        return None
+    if kept_width * kept_height > 1 - CHROME_MIN_SAVING:
+        return None
+    return left / width, top / height, right / width, bottom / height
+
+
+def encode_jpeg(image: Image.Image, max_bytes: int) -> Tuple[bytes, int]:
+    """The image as the highest-quality JPEG that fits max_bytes (or the smallest tried)"""
+    data = b""
+    quality = JPEG_QUALITIES[0]
+    for quality in JPEG_QUALITIES:
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+        data = buffered.getvalue()
+        if len(data) <= max_bytes:
+            break
+    return data, quality
@@ -0,0 +1,143 @@
+"""
+On-disk cache of encoded video frames.
+
+Extracting and encoding a recording's frames takes seconds, and the same
+recording is processed again on retries, regenerations and follow-ups. The
+final encoded frames are therefore cached, keyed by a hash of the video's
+bytes and every parameter that affects extraction, so a repeat skips video
+decoding entirely. When the cache grows past its size limit the least
+recently used entries are evicted.
+
+Each entry is a single file: one line of JSON describing the frames,
+followed by their JPEG bytes back to back.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import VIDEO_FRAME_CACHE_DIR, VIDEO_FRAME_CACHE_MAX_BYTES
+from video.encoding import EncodedFrame
+
+# Bump when the extraction pipeline changes in a way that changes its output
+FRAME_CACHE_VERSION = 2
+ENTRY_NAME_RE = re.compile(r"^[0-9a-f]{64}\.frames$")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_cache_key(video_hash: str, params: Dict[str, Any]) -> str:
+    """Cache key for a video and the parameters its frames were extracted with"""
+    payload = json.dumps(
+        {"version": FRAME_CACHE_VERSION, "video": video_hash, **params}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FrameCache:
+    def __init__(self, directory: str, max_bytes: int = VIDEO_FRAME_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """(path, size, last used) of every entry"""
+        entries: List[Tuple[str, int, float]] = []
+        for name in os.listdir(self.directory):
+            if ENTRY_NAME_RE.match(name):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.frames")
+
+    def get(self, key: str) -> Optional[List[EncodedFrame]]:
+        """The cached frames for `key`, or None"""
+        path = self._path_for(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                frames: List[EncodedFrame] = []
+                for entry in header:
+                    data = f.read(entry["size"])
+                    frames.append(
+                        EncodedFrame(
+                            data, entry["width"], entry["height"], entry["quality"], entry["frames"]
+                        )
+                    )
+            # Mark it as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring corrupt video frame cache entry {key}: {e}")
+            return None
+        return frames
+
+    def put(self, key: str, frames: List[EncodedFrame]) -> None:
+        header = [
+            {
+                "size": len(frame.data),
+                "width": frame.width,
+                "height": frame.height,
+                "quality": frame.quality,
+                "frames": frame.frames,
+            }
+            for frame in frames
+        ]
+        path = self._path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for frame in frames:
+                f.write(frame.data)
+        size = os.path.getsize(temp_path)
+
+        with self._lock:
+            replaced = os.path.getsize(path) if os.path.isfile(path) else 0
+            os.replace(temp_path, path)
+            self._total_bytes += size - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Evict down to 90% of the limit so we don't evict on every write
+        target = self.max_bytes * 0.9
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+
+_frame_cache: Optional[FrameCache] = None
+
+
+def get_frame_cache() -> Optional[FrameCache]:
+    """Process-wide frame cache, or None when VIDEO_FRAME_CACHE_DIR is empty"""
+    global _frame_cache
+    if _frame_cache is None and VIDEO_FRAME_CACHE_DIR:
+        _frame_cache = FrameCache(VIDEO_FRAME_CACHE_DIR)
+    return _frame_cache
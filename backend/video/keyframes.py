@@ -0,0 +1,62 @@
+"""
+Scene-change-aware keyframe selection.
+
+Screen recordings are mostly static UI with short transitions, so uniformly
+spaced frames waste image slots on near-identical screens and can miss a
+brief state change. Instead we decode a dense set of small grayscale
+candidate frames (only keyframes, for long videos) and greedily pick the ones that differ most from
+everything already picked (farthest-point sampling on mean absolute pixel
+difference). Selection stops once every remaining candidate is a
+near-duplicate of a picked frame, so quiet videos send fewer images.
+"""
+
+from typing import List
+
+import numpy as np
+
+# Candidate frames are decoded at this rate and width (grayscale)
+CANDIDATE_FPS = 4
+MAX_CANDIDATES = 240
+CANDIDATE_WIDTH = 96
+# Longer videos only decode keyframes for candidates, if they have at least
+# one per KEYFRAME_MAX_INTERVAL_SECONDS on average (see read_candidate_frames)
+FULL_DECODE_MAX_SECONDS = 60
+KEYFRAME_MAX_INTERVAL_SECONDS = 10
+# Mean absolute difference (0-255) below which two frames count as the same screen
+DUPLICATE_THRESHOLD = 2.0
+
+
+def frame_changes(frames: np.ndarray) -> np.ndarray:
+    """Mean absolute difference of each frame from the previous one (0 for the first)"""
+    flat = frames.reshape(len(frames), -1)
+    changes = np.zeros(len(frames), dtype=np.float32)
+    if len(frames) > 1:
+        changes[1:] = np.abs(np.diff(flat, axis=0)).mean(axis=1)
+    return changes
+
+
+def select_keyframes(
+    frames: np.ndarray,
+    max_frames: int,
+    duplicate_threshold: float = DUPLICATE_THRESHOLD,
+) -> List[int]:
+    """Indices (in time order) of the most informative frames.
+
+    `frames` is an (n, height, width) grayscale stack. The first frame (the
+    initial state) is always kept.
+    """
+    if len(frames) == 0 or max_frames <= 0:
+        return []
+
+    flat = frames.reshape(len(frames), -1).astype(np.float32)
+    selected = [0]
+    # Distance from every candidate to its closest selected frame
+    distances = np.abs(flat - flat[0]).mean(axis=1)
+    while len(selected) < max_frames:
+        candidate = int(np.argmax(distances))
+        if distances[candidate] < duplicate_threshold:
+            break
+        selected.append(candidate)
+        distances = np.minimum(distances, np.abs(flat - flat[candidate]).mean(axis=1))
+
+    return sorted(selected)
@@ -0,0 +1,113 @@
+"""
+Content-addressed store for generated media, served from /video.
+
+Each output is named after a hash of everything that determines it (see
+`media_key`), so concurrent jobs can never overwrite each other's files and
+a job whose inputs were already rendered can return the stored file instead
+of producing it again. Outputs are written to a partial file next to their
+final path and renamed into place, so /video never serves a half-written
+file. When the store grows past its size limit the least recently used
+outputs are evicted.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import VIDEO_OUTPUT_DIR, VIDEO_OUTPUT_MAX_BYTES
+
+# Bump when a pipeline changes in a way that changes its output
+MEDIA_STORE_VERSION = 1
+ENTRY_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(mp4|mp3)$")
+
+
+def media_key(kind: str, inputs: Dict[str, Any]) -> str:
+    """Key for the output of pipeline `kind` run on `inputs` (must be JSON-serializable)"""
+    payload = json.dumps(
+        {"version": MEDIA_STORE_VERSION, "kind": kind, **inputs}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MediaStore:
+    def __init__(self, directory: str, max_bytes: int = VIDEO_OUTPUT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        """(path, size, last used) of every stored output"""
+        entries: List[Tuple[str, int, float]] = []
+        for name in os.listdir(self.directory):
+            if ENTRY_NAME_RE.match(name):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _path_for(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}{extension}")
+
+    def get(self, key: str, extension: str = ".mp4") -> Optional[str]:
+        """Path of the stored output for `key`, or None"""
+        path = self._path_for(key, extension)
+        try:
+            # Mark it as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def partial_path(self, key: str, extension: str = ".mp4") -> str:
+        """A private path in the store to write an output to before `put`.
+
+        It keeps the extension, since encoders pick the format from it.
+        """
+        return os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.partial{extension}")
+
+    def put(self, key: str, partial_path: str, extension: str = ".mp4") -> str:
+        """Move a finished output into the store and return its path"""
+        path = self._path_for(key, extension)
+        size = os.path.getsize(partial_path)
+        with self._lock:
+            replaced = os.path.getsize(path) if os.path.isfile(path) else 0
+            os.replace(partial_path, path)
+            self._total_bytes += size - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        # Evict down to 90% of the limit so we don't evict on every write
+        target = self.max_bytes * 0.9
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except FileNotFoundError:
+                pass
+
+
+_media_store: Optional[MediaStore] = None
+
+
+def get_media_store() -> MediaStore:
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore(VIDEO_OUTPUT_DIR)
+    return _media_store
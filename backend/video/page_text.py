@@ -0,0 +1,318 @@
+"""
+Readable text of a webpage, bounded in size, for webpage-to-video scripts.
+
+Sending every string on the page to the script model includes navigation,
+footers, cookie banners and the like, and a large page makes the prompt
+slow to process or too long to accept at all. Instead the main content is
+located the way readability-style extractors do it: boilerplate elements
+are dropped, text blocks are scored (long, comma-rich, few links) and their
+scores propagated to their ancestors, and the best-scoring container wins,
+unless the page marks its content with <article> or <main>. The result is
+then cut to a token cap at a block boundary, so prompt size (and
+summarization latency) stays bounded whatever the page size.
+
+Class and id names are only a hint: a wrapper named "layout has-sidebar"
+that holds the article (or most of the page's text) is kept, and if too
+little content survives, the page is read again with only structural
+boilerplate (nav, footer, hidden elements) removed.
+"""
+
+import math
+import re
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from bs4 import BeautifulSoup, Tag, UnicodeDammit
+
+from config import WEBPAGE_TEXT_MAX_TOKENS
+
+# Rough characters per token of English text for GPT models
+CHARS_PER_TOKEN = 4
+# Elements that never hold readable content. Scripts and styles are also
+# stripped before parsing, since on script-heavy pages they dominate the
+# parse time
+UNREADABLE_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "form", "button", "select", "input", "nav", "footer", "aside", "dialog",
+}
+# Never removed, whatever their attributes say
+KEPT_TAGS = {"html", "body", "article", "main"}
+UNREADABLE_BLOCK_START_RE = re.compile(r"<(script|style|noscript|template|svg)\b|<!--", re.IGNORECASE)
+UNREADABLE_BLOCK_END_RES = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE)
+    for name in ("script", "style", "noscript", "template", "svg")
+}
+BOILERPLATE_RE = re.compile(
+    r"cookie|consent|gdpr|banner|navbar|\bnav\b|menu|footer|masthead|sidebar|share|social"
+    r"|comment|related|recommend|promo|\bads?\b|advert|sponsor|newsletter|subscribe|signup"
+    r"|breadcrumb|popup|modal|overlay|skip-link|pagination",
+    re.IGNORECASE,
+)
+# Removed even when they also look like content ("cookie-content")
+ALWAYS_BOILERPLATE_RE = re.compile(r"cookie|consent|gdpr|newsletter|popup|modal", re.IGNORECASE)
+CONTENT_RE = re.compile(r"article|content|main|post|entry|story", re.IGNORECASE)
+BLOCK_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "blockquote", "pre", "td", "dd", "figcaption"}
+SCORED_TAGS = {"p", "pre", "td", "blockquote"}
+# Blocks shorter than this don't count as content when scoring
+MIN_SCORED_BLOCK_CHARS = 25
+# Below this much text the extraction is assumed to have failed
+MIN_CONTENT_CHARS = 250
+
+
+def estimate_text_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _attribute_text(tag: Tag) -> str:
+    classes = tag.get("class") or []
+    return " ".join([*classes, str(tag.get("id") or ""), str(tag.get("role") or "")])
+
+
+def _is_hidden(tag: Tag) -> bool:
+    style = str(tag.get("style") or "").replace(" ", "").lower()
+    return (
+        tag.has_attr("hidden")
+        or tag.get("aria-hidden") == "true"
+        or "display:none" in style
+        or "visibility:hidden" in style
+    )
+
+
+def _is_marked_content(tag: Tag) -> bool:
+    return tag.name in ("article", "main") or tag.get("role") == "main"
+
+
+def _is_unreadable(tag: Tag) -> bool:
+    """Boilerplate by its tag, visibility or role"""
+    return bool(
+        tag.name in UNREADABLE_TAGS
+        or _is_hidden(tag)
+        or tag.get("role") in ("navigation", "banner", "contentinfo", "complementary")
+    )
+
+
+def _looks_like_boilerplate(tag: Tag) -> bool:
+    """Boilerplate by its class and id names"""
+    attributes = _attribute_text(tag)
+    return bool(
+        ALWAYS_BOILERPLATE_RE.search(attributes)
+        or (BOILERPLATE_RE.search(attributes) and not CONTENT_RE.search(attributes))
+    )
+
+
+def _text_length(tag: Tag) -> int:
+    return sum(len(string) for string in tag.stripped_strings)
+
+
+def _strip_unreadable_blocks(html: str) -> str:
+    """The html without script, style and similar blocks, or comments
+
+    An unclosed block runs to the end of the page, as it does in a browser.
+    Scanned by hand: a lazy regex rescans the rest of the page for every
+    unclosed opener.
+    """
+    parts: List[str] = []
+    position = 0
+    while True:
+        start = UNREADABLE_BLOCK_START_RE.search(html, position)
+        if start is None:
+            parts.append(html[position:])
+            break
+        parts.append(html[position : start.start()])
+        if start.group(1):
+            end_match = UNREADABLE_BLOCK_END_RES[start.group(1).lower()].search(html, start.end())
+            end = end_match.end() if end_match else -1
+        else:
+            end = html.find("-->", start.end())
+            end = end + 3 if end >= 0 else -1
+        if end < 0:
+            break
+        parts.append(" ")
+        position = end
+    return "".join(parts)
+
+
+def _remove_boilerplate(root: Tag, use_attributes: bool = True) -> None:
+    # One walk over the tree that skips removed subtrees; find_all's filters
+    # are slow on big pages
+    page_chars: Optional[int] = None
+    removed: List[Tag] = []
+    stack = [child for child in root.children if isinstance(child, Tag)]
+    while stack:
+        tag = stack.pop()
+        if tag.name in KEPT_TAGS:
+            remove = False
+        elif _is_unreadable(tag):
+            remove = True
+        elif use_attributes and _looks_like_boilerplate(tag):
+            # Layout wrappers ("layout has-sidebar", "page menu-open") match
+            # too; keep anything that holds the page's content
+            if page_chars is None:
+                page_chars = _text_length(root)
+            remove = not (
+                tag.find(_is_marked_content) is not None
+                or _has_text(tag, page_chars // 2 + 1)
+            )
+        else:
+            remove = False
+        if remove:
+            removed.append(tag)
+        else:
+            stack.extend(child for child in tag.children if isinstance(child, Tag))
+
+    # Removing children one by one is quadratic (bs4 looks each one up in
+    # its parent's contents), so each parent's contents are rebuilt once
+    removed_by_parent: Dict[int, Tuple[Tag, Set[int]]] = {}
+    for tag in removed:
+        assert tag.parent is not None
+        removed_by_parent.setdefault(id(tag.parent), (tag.parent, set()))[1].add(id(tag))
+    for parent, removed_ids in removed_by_parent.values():
+        children = parent.contents
+        parent.contents = [child for child in children if id(child) not in removed_ids]
+        for child in children:
+            if id(child) in removed_ids:
+                # Already out of the contents; decompose() only relinks its neighbours
+                child.parent = None
+                child.decompose()
+
+
+def _block_text(tag: Tag) -> str:
+    return " ".join(tag.get_text(" ", strip=True).split())
+
+
+def _tags(root: Tag, names: Set[str]) -> Iterator[Tag]:
+    """Descendants of root with one of the given names, in document order"""
+    for tag in root.descendants:
+        if isinstance(tag, Tag) and tag.name in names:
+            yield tag
+
+
+def _has_text(tag: Tag, min_chars: int) -> bool:
+    length = 0
+    for string in tag.stripped_strings:
+        length += len(string)
+        if length >= min_chars:
+            return True
+    return False
+
+
+def _link_density(tag: Tag, text_length: int) -> float:
+    link_length = sum(len(a.get_text(strip=True)) for a in tag.find_all("a"))
+    return link_length / max(text_length, 1)
+
+
+def _find_content_root(body: Tag) -> Tag:
+    """The element most likely to hold the page's main content"""
+    marked = [tag for tag in body.descendants if isinstance(tag, Tag) and _is_marked_content(tag)]
+    for tag in marked:
+        if _has_text(tag, MIN_CONTENT_CHARS):
+            return tag
+
+    scores: Dict[int, float] = {}
+    candidates: Dict[int, Tag] = {}
+    for block in _tags(body, SCORED_TAGS):
+        text = _block_text(block)
+        if len(text) < MIN_SCORED_BLOCK_CHARS:
+            continue
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+        for level, ancestor in enumerate(block.parents):
+            if level > 2 or not isinstance(ancestor, Tag) or ancestor.name == "[document]":
+                break
+            scores[id(ancestor)] = scores.get(id(ancestor), 0) + score / (1 + level)
+            candidates[id(ancestor)] = ancestor
+
+    best: Optional[Tag] = None
+    best_score = 0.0
+    for key, candidate in candidates.items():
+        if CONTENT_RE.search(_attribute_text(candidate)):
+            scores[key] *= 1.25
+        score = scores[key] * (1 - _link_density(candidate, len(_block_text(candidate))))
+        if score > best_score:
+            best, best_score = candidate, score
+    return best or body
+
+
+def _has_block_ancestor(block: Tag, root: Tag) -> bool:
+    for parent in block.parents:
+        if parent is root:
+            return False
+        if parent.name in BLOCK_TAGS:
+            return True
+    return False
+
+
+def _content_blocks(root: Tag, max_chars: int) -> List[str]:
+    """Text of the root's content blocks in document order, stopping past max_chars"""
+    blocks: List[str] = []
+    length = 0
+    for block in _tags(root, BLOCK_TAGS):
+        # Nested blocks (a <p> inside an <li>) are read with their outermost block
+        if _has_block_ancestor(block, root):
+            continue
+        text = _block_text(block)
+        if not text or (len(text) < 80 and _link_density(block, len(text)) > 0.5):
+            continue
+        if not blocks or blocks[-1] != text:
+            blocks.append(text)
+            length += len(text) + 1
+            if length > max_chars:
+                # Anything further would be cut anyway
+                break
+    # Text not wrapped in any block element (e.g. a <div> of plain text)
+    if not blocks:
+        text = _block_text(root)
+        if text:
+            blocks.append(text)
+    return blocks
+
+
+def _truncate_to_tokens(blocks: List[str], max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    kept: List[str] = []
+    length = 0
+    for block in blocks:
+        remaining = max_chars - length
+        if len(block) + 1 <= remaining:
+            kept.append(block)
+            length += len(block) + 1
+            continue
+        # Cut the last block at a sentence (or at least a word) boundary
+        cut = block[:remaining]
+        boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+        if boundary > remaining // 2:
+            cut = cut[: boundary + 1]
+        elif " " in cut:
+            cut = cut[: cut.rfind(" ")]
+        if cut:
+            kept.append(cut)
+        break
+    return "\n".join(kept)
+
+
+def _readable_blocks(html: str, max_chars: int, use_attributes: bool) -> Tuple[str, List[str]]:
+    """The page's title and content blocks"""
+    soup = BeautifulSoup(html, "html.parser")
+    title = _block_text(soup.title) if soup.title else ""
+    body = soup.body or soup
+    _remove_boilerplate(body, use_attributes)
+    blocks = _content_blocks(_find_content_root(body), max_chars)
+    if sum(len(block) for block in blocks) < MIN_CONTENT_CHARS and not use_attributes:
+        # Not enough recognisable content; fall back to all remaining text
+        blocks = [_block_text(body)]
+    return title, blocks
+
+
+def extract_readable_text(html: str | bytes, max_tokens: int = WEBPAGE_TEXT_MAX_TOKENS) -> str:
+    """The page's title and main content as plain text, at most about `max_tokens` long"""
+    if isinstance(html, bytes):
+        html = UnicodeDammit(html, is_html=True).unicode_markup or ""
+    html = _strip_unreadable_blocks(html)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+
+    title, blocks = _readable_blocks(html, max_chars, use_attributes=True)
+    if sum(len(block) for block in blocks) < MIN_CONTENT_CHARS:
+        # The class/id heuristics may have removed the content; read a fresh
+        # parse with only structural boilerplate removed
+        title, blocks = _readable_blocks(html, max_chars, use_attributes=False)
+    if title and (not blocks or blocks[0] != title):
+        blocks.insert(0, title)
+    return _truncate_to_tokens(blocks, max_tokens)
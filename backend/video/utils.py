@@ -1,14 +1,48 @@
 # Extract HTML content from the completion string
+import asyncio
 import base64
-import io
 import mimetypes
 import os
+import re
+import subprocess
 import tempfile
 import uuid
-from typing import Any, Union, cast
-from moviepy.editor import VideoFileClip  # type: ignore
+from dataclasses import dataclass
+from typing import Any, Literal, Optional, Union, cast
 from PIL import Image
-import math
+import imageio_ffmpeg  # type: ignore
+import numpy as np
+
+from config import (
+    VIDEO_CROP_STATIC_CHROME,
+    VIDEO_FRAME_MAX_BYTES,
+    VIDEO_FRAME_MODE,
+    VIDEO_GRID_FRAMES,
+    VIDEO_GRID_MAX_FRAMES,
+    VIDEO_TOKEN_BUDGET,
+)
+from video.contact_sheet import TILE_GAP, grid_shape, render_contact_sheet, tile_size
+from video.encoding import (
+    CropBox,
+    EncodedFrame,
+    allocate_token_budget,
+    encode_jpeg,
+    fit_to_token_budget,
+    frame_detail,
+    static_chrome_crop,
+)
+from video.frame_cache import frame_cache_key, get_frame_cache, hash_file
+from video.keyframes import (
+    CANDIDATE_FPS,
+    CANDIDATE_WIDTH,
+    DUPLICATE_THRESHOLD,
+    FULL_DECODE_MAX_SECONDS,
+    KEYFRAME_MAX_INTERVAL_SECONDS,
+    MAX_CANDIDATES,
+    frame_changes,
+    select_keyframes,
+)
+from video.workers import run_in_pool, video_job_slot
 
 
 DEBUG = True
@@ -16,42 +50,71 @@ TARGET_NUM_SCREENSHOTS = (
     20  # Should be max that Claude supports (20) - reduce to save tokens on testing
 )
 
+# "frames" sends one image per frame, "grid" tiles consecutive frames into contact sheets
+FrameMode = Literal["frames", "grid"]
+CONTACT_SHEET_NOTE = (
+    "Each image above is a contact sheet of consecutive frames from the video, "
+    "read left to right, top to bottom. The label in each frame's top-left "
+    "corner is its frame number; frame numbers continue across images."
+)
+DEFAULT_FRAME_MODE: FrameMode = "grid" if VIDEO_FRAME_MODE == "grid" else "frames"
+
 
 async def assemble_claude_prompt_video(video_data_url: str) -> list[Any]:
-    images = split_video_into_screenshots(video_data_url)
+    # Decode the base64 URL to get the video bytes
+    video_encoded_data = video_data_url.split(",")[1]
+    mime_type = video_data_url.split(";")[0].split(":")[1]
+    suffix = mimetypes.guess_extension(mime_type)
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as temp_video_file:
+        print(temp_video_file.name)
+        await asyncio.to_thread(
+            temp_video_file.write, base64.b64decode(video_encoded_data)
+        )
+        await asyncio.to_thread(temp_video_file.flush)
+        return await assemble_claude_prompt_video_file(temp_video_file.name)
+
+
+async def assemble_claude_prompt_video_file(
+    video_path: str, frame_mode: FrameMode = DEFAULT_FRAME_MODE
+) -> list[Any]:
+    """Like assemble_claude_prompt_video, for a video that is already on disk"""
+    frames = await extract_encoded_frames(
+        video_path, TARGET_NUM_SCREENSHOTS, frame_mode=frame_mode
+    )
 
     # Save images to tmp if we're debugging
     if DEBUG:
-        save_images_to_tmp(images)
+        await asyncio.to_thread(save_frames_to_tmp, [frame.data for frame in frames])
 
     # Validate number of images
-    print(f"Number of frames extracted from video: {len(images)}")
-    if len(images) > 20:
-        print(f"Too many screenshots: {len(images)}")
+    print(f"Number of frames extracted from video: {len(frames)}")
+    if len(frames) > 20:
+        print(f"Too many screenshots: {len(frames)}")
         raise ValueError("Too many screenshots extracted from video")
 
+    print(
+        f"Estimated video prompt input tokens: {sum(frame.tokens for frame in frames)} "
+        f"for {sum(frame.frames for frame in frames)} frames in {len(frames)} images "
+        f"(budget {VIDEO_TOKEN_BUDGET}, "
+        f"{sum(len(frame.data) for frame in frames) / 1024:.0f} KB of JPEG)"
+    )
+
     # Convert images to the message format for Claude
     content_messages: list[dict[str, Union[dict[str, str], str]]] = []
-    for image in images:
-
-        # Convert Image to buffer
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-
-        # Encode bytes as base64
-        base64_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        media_type = "image/jpeg"
-
+    for frame in frames:
         content_messages.append(
             {
                 "type": "image",
                 "source": {
                     "type": "base64",
-                    "media_type": media_type,
-                    "data": base64_data,
+                    "media_type": "image/jpeg",
+                    "data": base64.b64encode(frame.data).decode("utf-8"),
                 },
             }
         )
+    if frame_mode == "grid":
+        content_messages.append({"type": "text", "text": CONTACT_SHEET_NOTE})
 
     return [
         {
@@ -61,58 +124,375 @@ async def assemble_claude_prompt_video(video_data_url: str) -> list[Any]:
     ]
 
 
-# Returns a list of images/frame (RGB format)
-def split_video_into_screenshots(video_data_url: str) -> list[Image.Image]:
-    target_num_screenshots = TARGET_NUM_SCREENSHOTS
+async def extract_encoded_frames(
+    video_path: str,
+    max_frames: int,
+    token_budget: int = VIDEO_TOKEN_BUDGET,
+    crop_static_chrome: bool = VIDEO_CROP_STATIC_CHROME,
+    frame_mode: FrameMode = "frames",
+) -> list[EncodedFrame]:
+    """The selected frames of a video file as JPEGs, extracted in the worker pool.
 
-    # Decode the base64 URL to get the video bytes
-    video_encoded_data = video_data_url.split(",")[1]
-    video_bytes = base64.b64decode(video_encoded_data)
+    Images are sized to share `token_budget` (see video.encoding), and
+    decoded and encoded in parallel. In "grid" mode up to max_frames contact
+    sheets of VIDEO_GRID_FRAMES consecutive frames are returned instead of
+    single frames. If the caller is cancelled (e.g. the client
+    disconnected), images that haven't started are dropped.
 
-    mime_type = video_data_url.split(";")[0].split(":")[1]
-    suffix = mimetypes.guess_extension(mime_type)
+    Results are cached by video content and parameters, so retries and
+    follow-ups on the same recording skip decoding.
+    """
+    cache = get_frame_cache()
+    if cache:
+        video_hash = await asyncio.to_thread(hash_file, video_path)
+        key = frame_cache_key(
+            video_hash,
+            {
+                "max_frames": max_frames,
+                "token_budget": token_budget,
+                "crop_static_chrome": crop_static_chrome,
+                "frame_mode": frame_mode,
+                "grid_frames": VIDEO_GRID_FRAMES,
+                "grid_max_frames": VIDEO_GRID_MAX_FRAMES,
+                "frame_max_bytes": VIDEO_FRAME_MAX_BYTES,
+            },
+        )
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            print(f"Using {len(cached)} cached video frames")
+            return cached
+
+    frames = await _extract_encoded_frames(
+        video_path, max_frames, token_budget, crop_static_chrome, frame_mode
+    )
+    if cache:
+        await asyncio.to_thread(cache.put, key, frames)
+    return frames
+
+
+async def _extract_encoded_frames(
+    video_path: str,
+    max_frames: int,
+    token_budget: int,
+    crop_static_chrome: bool,
+    frame_mode: FrameMode,
+) -> list[EncodedFrame]:
+    async with video_job_slot():
+        if frame_mode == "grid":
+            plan = await run_in_pool(
+                plan_frames,
+                video_path,
+                min(max_frames * VIDEO_GRID_FRAMES, VIDEO_GRID_MAX_FRAMES),
+                crop_static_chrome,
+            )
+            groups = [
+                range(start, min(start + VIDEO_GRID_FRAMES, len(plan.timestamps)))
+                for start in range(0, len(plan.timestamps), VIDEO_GRID_FRAMES)
+            ]
+            budgets = allocate_token_budget(
+                [sum(plan.details[i] for i in group) for group in groups], token_budget
+            )
+            work = [
+                run_in_pool(
+                    encode_contact_sheet_at,
+                    video_path,
+                    plan,
+                    [plan.timestamps[i] for i in group],
+                    group.start + 1,
+                    max_tokens,
+                )
+                for group, max_tokens in zip(groups, budgets)
+            ]
+        else:
+            plan = await run_in_pool(plan_frames, video_path, max_frames, crop_static_chrome)
+            budgets = allocate_token_budget(plan.details, token_budget)
+            work = [
+                run_in_pool(encode_frame_at, video_path, plan, t, max_tokens)
+                for t, max_tokens in zip(plan.timestamps, budgets)
+            ]
+        return list(await asyncio.gather(*work))
+
+
+def extract_screenshots(
+    video_path: str, target_num_screenshots: int = TARGET_NUM_SCREENSHOTS
+) -> list[Image.Image]:
+    """The most informative frames of a video file, up to target_num_screenshots.
+
+    Frames are chosen by scene change (see video.keyframes) from small
+    grayscale candidates, then only the chosen frames are decoded at full
+    resolution. Rather than decoding every frame, each one is read with an
+    input seek: ffmpeg jumps to the nearest keyframe and decodes from there.
+    """
+    plan = plan_frames(video_path, target_num_screenshots)
+    return [read_frame_at(video_path, plan.metadata, t) for t in plan.timestamps]
 
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as temp_video_file:
-        print(temp_video_file.name)
-        temp_video_file.write(video_bytes)
-        temp_video_file.flush()
-        clip = VideoFileClip(temp_video_file.name)
-        images: list[Image.Image] = []
-        total_frames = cast(int, clip.reader.nframes)  # type: ignore
 
-        # Calculate frame skip interval by dividing total frames by the target number of screenshots
-        # Ensuring a minimum skip of 1 frame
-        frame_skip = max(1, math.ceil(total_frames / target_num_screenshots))
+@dataclass
+class FramePlan:
+    """Which frames of a video to send"""
 
-        # Iterate over each frame in the clip
-        for i, frame in enumerate(clip.iter_frames()):
-            # Save every nth frame
-            if i % frame_skip == 0:
-                frame_image = Image.fromarray(frame)  # type: ignore
-                images.append(frame_image)
-                # Ensure that we don't capture more than the desired number of frames
-                if len(images) >= target_num_screenshots:
-                    break
+    metadata: dict[str, Any]
+    timestamps: list[float]
+    # Detail of each frame, for sharing the token budget (see video.encoding)
+    details: list[float]
+    crop: Optional[CropBox] = None
+
+    def crop_pixels(self) -> tuple[Optional[tuple[int, int, int, int]], int, int]:
+        """The crop as an (x, y, width, height) pixel box, and the cropped size"""
+        width, height = self.metadata["size"]
+        if not self.crop:
+            return None, width, height
+        left, top, right, bottom = self.crop
+        x, y = int(left * width), int(top * height)
+        width, height = int(right * width) - x, int(bottom * height) - y
+        return (x, y, width, height), width, height
+
+
+def plan_frames(
+    video_path: str, max_frames: int, crop_static_chrome: bool = False
+) -> FramePlan:
+    """Pick the frames that best cover the video's distinct screens"""
+    metadata = probe_video(video_path)
+    frames, candidate_timestamps = read_candidate_frames(video_path, metadata, max_frames)
+    if len(frames) == 0:
+        return FramePlan(metadata, [0.0], [1.0])
+
+    selected = select_keyframes(frames, max_frames)
+    scene_changes = int((frame_changes(frames) >= DUPLICATE_THRESHOLD).sum())
+    print(
+        f"Selected {len(selected)} of {len(frames)} candidate frames "
+        f"({scene_changes} scene changes)"
+    )
+    return FramePlan(
+        metadata=metadata,
+        timestamps=[candidate_timestamps[i] for i in selected],
+        details=[frame_detail(frames[i]) for i in selected],
+        crop=static_chrome_crop(frames) if crop_static_chrome else None,
+    )
+
+
+def encode_frame_at(
+    video_path: str, plan: FramePlan, t: float, max_tokens: int
+) -> EncodedFrame:
+    """The frame shown at `t` seconds, cropped and scaled to max_tokens, as JPEG"""
+    crop, width, height = plan.crop_pixels()
+    size = fit_to_token_budget(width, height, max_tokens)
+    image = read_frame_at(video_path, plan.metadata, t, crop=crop, size=size)
+    data, quality = encode_jpeg(image, VIDEO_FRAME_MAX_BYTES)
+    return EncodedFrame(data, image.width, image.height, quality)
+
+
+def encode_contact_sheet_at(
+    video_path: str,
+    plan: FramePlan,
+    timestamps: list[float],
+    first_frame_number: int,
+    max_tokens: int,
+) -> EncodedFrame:
+    """A contact sheet of the frames shown at `timestamps`, scaled to max_tokens, as JPEG"""
+    crop, width, height = plan.crop_pixels()
+    columns, rows = grid_shape(len(timestamps))
+    sheet_width, sheet_height = fit_to_token_budget(
+        width * columns + TILE_GAP * (columns - 1),
+        height * rows + TILE_GAP * (rows - 1),
+        max_tokens,
+    )
+    size = tile_size(sheet_width, sheet_height, columns, rows)
+    tiles = [read_frame_at(video_path, plan.metadata, t, crop=crop, size=size) for t in timestamps]
+    sheet = render_contact_sheet(tiles, first_frame_number)
+    data, quality = encode_jpeg(sheet, VIDEO_FRAME_MAX_BYTES)
+    return EncodedFrame(data, sheet.width, sheet.height, quality, frames=len(tiles))
+
+
+def probe_video(video_path: str) -> dict[str, Any]:
+    """ffmpeg's metadata for a video: size, fps, duration"""
+    reader = imageio_ffmpeg.read_frames(video_path)
+    try:
+        return cast(dict[str, Any], next(reader))
+    finally:
+        reader.close()
+
+
+def _run_ffmpeg(args: list[str]) -> bytes:
+    result = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-loglevel", "error", *args],
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def read_frame_at(
+    video_path: str,
+    metadata: dict[str, Any],
+    t: float,
+    crop: Optional[tuple[int, int, int, int]] = None,
+    size: Optional[tuple[int, int]] = None,
+) -> Image.Image:
+    """Decode the single frame shown at `t` seconds.
+
+    `crop` is an (x, y, width, height) pixel box and `size` the output size;
+    ffmpeg applies both while decoding, so a 4K frame never crosses the pipe.
+    """
+    width, height = metadata["size"]
+    fps = float(metadata.get("fps") or 30)
+    duration = float(metadata.get("duration") or 0)
+    # Stay within the last frame
+    t = max(0.0, min(t, duration - 1 / fps)) if duration else t
+
+    filters: list[str] = []
+    if crop:
+        x, y, width, height = crop
+        filters.append(f"crop={width}:{height}:{x}:{y}")
+    if size and size != (width, height):
+        width, height = size
+        filters.append(f"scale={width}:{height}:flags=lanczos")
+
+    data = _run_ffmpeg(
+        [
+            "-ss", f"{t:.3f}",
+            "-i", video_path,
+            *(["-vf", ",".join(filters)] if filters else []),
+            "-frames:v", "1",
+            "-pix_fmt", "rgb24",
+            "-f", "rawvideo",
+            "-",
+        ]
+    )
+    return Image.frombytes("RGB", (width, height), data[: width * height * 3])
+
+
+def read_candidate_frames(
+    video_path: str, metadata: dict[str, Any], max_frames: int
+) -> tuple[np.ndarray, list[float]]:
+    """Small grayscale candidate frames, with their timestamps.
+
+    Sampling at a fixed rate decodes every frame of the video, which for
+    long videos costs more than seeking to the few selected frames saves.
+    So videos longer than FULL_DECODE_MAX_SECONDS use their keyframes as
+    candidates and decode nothing else. The trade-off is that a screen shown
+    only between two keyframes is never a candidate. Encoders usually put a
+    keyframe at a scene cut, and videos with sparse keyframes still get the
+    full pass: each seek to a selected frame would decode from its keyframe
+    anyway.
+    """
+    duration = float(metadata.get("duration") or 0)
+    # Scale to a fixed width, keeping the aspect ratio (and an even height)
+    source_width, source_height = metadata["size"]
+    width = CANDIDATE_WIDTH
+    height = max(2, round(source_height * width / source_width / 2) * 2)
+
+    if duration > FULL_DECODE_MAX_SECONDS:
+        frames, timestamps = read_keyframes(video_path, width, height)
+        if len(frames) >= duration / KEYFRAME_MAX_INTERVAL_SECONDS:
+            if len(frames) > MAX_CANDIDATES:
+                keep = np.unique(np.linspace(0, len(frames) - 1, MAX_CANDIDATES).round().astype(int))
+                frames, timestamps = frames[keep], [timestamps[i] for i in keep]
+            # Add the final frame, so the end state is a candidate
+            last_frames = _gray_frames(
+                _run_ffmpeg(
+                    [
+                        "-sseof", "-1",
+                        "-i", video_path,
+                        "-vf", f"scale={width}:{height}",
+                        "-pix_fmt", "gray",
+                        "-f", "rawvideo",
+                        "-",
+                    ]
+                ),
+                width,
+                height,
+            )
+            if len(last_frames):
+                frames = np.concatenate([frames, last_frames[-1:]])
+                timestamps = [*timestamps, duration]
+            return frames, timestamps
+        print(f"Only {len(frames)} keyframes in {duration:.0f}s; decoding every frame")
+
+    return read_sampled_frames(video_path, metadata, max_frames, width, height)
+
+
+def read_sampled_frames(
+    video_path: str, metadata: dict[str, Any], max_frames: int, width: int, height: int
+) -> tuple[np.ndarray, list[float]]:
+    """Frames sampled at a fixed rate, decoding the whole video.
+
+    ffmpeg does the sampling, scaling and grayscale conversion in one pass,
+    so only a few KB per candidate cross the pipe.
+    """
+    duration = float(metadata.get("duration") or 0)
+    # At least CANDIDATE_FPS (and max_frames candidates), at most MAX_CANDIDATES
+    fps = float(metadata.get("fps") or CANDIDATE_FPS)
+    if duration:
+        fps = min(fps, max(CANDIDATE_FPS, max_frames / duration), MAX_CANDIDATES / duration)
+
+    data = _run_ffmpeg(
+        [
+            "-i", video_path,
+            "-vf", f"fps={fps:.4f},scale={width}:{height}",
+            "-pix_fmt", "gray",
+            "-f", "rawvideo",
+            "-",
+        ]
+    )
+    frames = _gray_frames(data, width, height)
+    return frames, [i / fps for i in range(len(frames))]
+
+
+PTS_TIME_RE = re.compile(rb"\bpts_time:\s*(-?[\d.]+)")
+
+
+def read_keyframes(
+    video_path: str, width: int, height: int
+) -> tuple[np.ndarray, list[float]]:
+    """The video's keyframes, small and grayscale, with their timestamps.
+
+    Other frames are skipped by the decoder, so this reads a fraction of
+    the video. Timestamps come from the showinfo filter's log.
+    """
+    result = subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-loglevel", "info",
+            "-skip_frame", "nokey",
+            "-i", video_path,
+            "-vf", f"showinfo,scale={width}:{height}",
+            "-vsync", "passthrough",
+            "-pix_fmt", "gray",
+            "-f", "rawvideo",
+            "-",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    frames = _gray_frames(result.stdout, width, height)
+    timestamps = [float(t) for t in PTS_TIME_RE.findall(result.stderr)]
+    count = min(len(frames), len(timestamps))
+    return frames[:count], timestamps[:count]
 
-        # Close the video file to release resources
-        clip.close()
 
-        return images
+def _gray_frames(data: bytes, width: int, height: int) -> np.ndarray:
+    frame_size = width * height
+    num_frames = len(data) // frame_size
+    frames = np.frombuffer(data[: num_frames * frame_size], dtype=np.uint8).reshape(
+        num_frames, height, width
+    )
+    return frames.astype(np.float32)
 
 
-# Save a list of PIL images to a random temporary directory
-def save_images_to_tmp(images: list[Image.Image]):
+# Save a list of JPEG frames to a random temporary directory
+def save_frames_to_tmp(frames: list[bytes]):
 
     # Create a unique temporary directory
     unique_dir_name = f"screenshots_{uuid.uuid4()}"
     tmp_screenshots_dir = os.path.join(tempfile.gettempdir(), unique_dir_name)
     os.makedirs(tmp_screenshots_dir, exist_ok=True)
 
-    for idx, image in enumerate(images):
+    for idx, frame in enumerate(frames):
         # Generate a unique image filename using index
         image_filename = f"screenshot_{idx}.jpg"
         tmp_filepath = os.path.join(tmp_screenshots_dir, image_filename)
-        image.save(tmp_filepath, format="JPEG")
+        with open(tmp_filepath, "wb") as f:
+            f.write(frame)
 
     print("Saved to " + tmp_screenshots_dir)
 
@@ -0,0 +1,356 @@
+"""
+Webpage-to-video as a background job.
+
+Turning a webpage into a narrated slideshow takes minutes: fetching the
+page, two LLM calls, image generation, text-to-speech, image downloads and
+a video encode. Run inline in the request handler this pinned the server
+worker for the whole time, so the request now only starts a job and
+returns its ID; clients poll the job for status and progress.
+
+Independent steps run concurrently (text-to-speech alongside image prompt
+and image generation, image downloads in parallel), blocking work runs in
+threads, and the encode runs in the video process pool. A job runs in the
+server process that started it, and its state is also written to a small
+JSON file in WEBPAGE_VIDEO_JOB_DIR, so a poll that lands on another server
+worker still finds the job.
+
+Each job works in its own temporary directory, and the finished video is
+kept in the media store under a key derived from the page's text, so a
+request for a page that was already rendered (or is being rendered) reuses
+that video instead of generating it again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Literal, Optional, Set
+
+import httpx
+from gtts import gTTS  # type: ignore
+
+from config import OPENAI_API_KEY, WEBPAGE_VIDEO_JOB_DIR
+from image_generation.blob_store import MAX_IMAGE_BYTES, get_blob_store, read_limited
+from image_generation.core import process_tasks
+from llm import Llm
+from models.openai_client import stream_openai_response
+from video.media_store import get_media_store, media_key
+from video.page_text import extract_readable_text
+from video.workers import run_in_pool
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+# Finished jobs are forgotten after this long
+JOB_RETENTION_SECONDS = 3600
+# Largest webpage we are willing to download
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+SCRIPT_MODEL = Llm.GPT_4O_2024_05_13
+IMAGE_MODEL = "dalle3"
+JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class WebpageVideoJob:
+    id: str
+    url: str
+    status: JobStatus = "queued"
+    step: str = "Queued"
+    progress: float = 0.0
+    video_path: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def update(self, step: str, progress: float) -> None:
+        self.step, self.progress, self.updated_at = step, progress, time.time()
+        print(f"Webpage video {self.id}: {step} ({progress:.0%})")
+        _save_job(self)
+
+
+_jobs: Dict[str, WebpageVideoJob] = {}
+# Keep references so running jobs aren't garbage collected
+_tasks: Set["asyncio.Task[None]"] = set()
+# Videos being rendered, by media key, so identical jobs share one render
+_renders: Dict[str, "asyncio.Future[str]"] = {}
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=30, follow_redirects=True)
+    return _client
+
+
+async def close_webpage_video_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+
+def get_job(job_id: str) -> Optional[WebpageVideoJob]:
+    """The job with this ID, whichever server worker is running it"""
+    if not JOB_ID_RE.fullmatch(job_id):
+        return None
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    try:
+        with open(_job_path(job_id)) as f:
+            return WebpageVideoJob(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(WEBPAGE_VIDEO_JOB_DIR, f"{job_id}.json")
+
+
+def _save_job(job: WebpageVideoJob) -> None:
+    """Write the job's state for the other server workers"""
+    path = _job_path(job.id)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(WEBPAGE_VIDEO_JOB_DIR, exist_ok=True)
+        with open(temp_path, "w") as f:
+            json.dump(asdict(job), f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        # Polls on this worker still work from memory
+        print(f"Error saving webpage video job {job.id}: {e}")
+
+
+def start_job(url: str) -> WebpageVideoJob:
+    """Create a job for `url` and start it in the background"""
+    _prune_jobs()
+    job = WebpageVideoJob(id=uuid.uuid4().hex, url=url)
+    _jobs[job.id] = job
+    _save_job(job)
+    task = asyncio.create_task(_run_job(job))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+def _prune_jobs() -> None:
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id, job in list(_jobs.items()):
+        if job.status in ("completed", "failed") and job.updated_at < cutoff:
+            del _jobs[job_id]
+    # Running jobs are saved at every step, so a file this old belongs to a
+    # finished job or to a worker that went away
+    try:
+        names = os.listdir(WEBPAGE_VIDEO_JOB_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(WEBPAGE_VIDEO_JOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+async def _run_job(job: WebpageVideoJob) -> None:
+    job.status = "running"
+    _save_job(job)
+    try:
+        job.video_path = await generate_webpage_video(job)
+        job.status = "completed"
+        job.update("Video ready", 1.0)
+    except Exception as e:
+        print(f"Error during video generation: {str(e)}")
+        job.error = str(e)
+        job.status = "failed"
+        job.updated_at = time.time()
+        _save_job(job)
+
+
+async def generate_webpage_video(job: WebpageVideoJob) -> str:
+    """Render the job's page as a video, or reuse an earlier render; returns its path"""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is not set.")
+
+    job.update("Fetching page", 0.05)
+    text = await fetch_page_text(job.url)
+
+    key = media_key(
+        "webpage_video",
+        {
+            "text": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "script_model": SCRIPT_MODEL.value,
+            "image_model": IMAGE_MODEL,
+        },
+    )
+    stored_path = get_media_store().get(key)
+    if stored_path:
+        print(f"Webpage video {job.id}: reusing {stored_path}")
+        return stored_path
+
+    render = _renders.get(key)
+    if render is not None:
+        job.update("Waiting for an identical video to finish", 0.1)
+        return await asyncio.shield(render)
+
+    render = asyncio.get_running_loop().create_future()
+    _renders[key] = render
+    try:
+        path = await render_webpage_video(job, text, key)
+        render.set_result(path)
+        return path
+    except Exception as e:
+        render.set_exception(e)
+        # Nobody else may be waiting for it
+        render.exception()
+        raise
+    finally:
+        del _renders[key]
+
+
+async def render_webpage_video(job: WebpageVideoJob, text: str, key: str) -> str:
+    store = get_media_store()
+    partial_path = store.partial_path(key)
+    # Intermediate files go in a directory of the job's own
+    work_dir = tempfile.mkdtemp(prefix=f"webpage_video_{job.id}_")
+    try:
+        job.update("Writing script", 0.15)
+        script = await complete(
+            f"""Summarize the following text into a short video script:
+
+{text}"""
+        )
+
+        job.update("Generating images and narration", 0.3)
+        audio_path = os.path.join(work_dir, "audio.mp3")
+        image_paths, _ = await asyncio.gather(
+            generate_images(script, work_dir),
+            asyncio.to_thread(synthesize_speech, script, audio_path),
+        )
+        if not image_paths:
+            raise ValueError("No image clips were created for the video.")
+
+        job.update("Encoding video", 0.8)
+        await run_in_pool(render_slideshow, image_paths, audio_path, partial_path)
+        return store.put(key, partial_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+async def fetch_page_text(url: str) -> str:
+    print(f"Attempting to fetch URL: {url}")
+    # Streamed, so an oversized page is abandoned instead of read into memory
+    async with _get_client().stream("GET", url) as response:
+        response.raise_for_status()
+        html = await read_limited(response, MAX_PAGE_BYTES)
+
+    # Parsing a large page takes a while; keep it off the event loop
+    text = await asyncio.to_thread(extract_readable_text, html)
+    print(f"Extracted text: {text[:100]}...")  # Log first 100 chars
+    return text
+
+
+async def complete(prompt: str) -> str:
+    assert OPENAI_API_KEY is not None
+
+    async def ignore_chunk(_: str) -> None:
+        pass
+
+    completion = await stream_openai_response(
+        messages=[{"role": "user", "content": prompt}],
+        api_key=OPENAI_API_KEY,
+        base_url=None,
+        callback=ignore_chunk,
+        model_name=SCRIPT_MODEL.value,
+    )
+    return completion["code"]
+
+
+def parse_image_prompts(completion: str) -> List[str]:
+    """The JSON list of prompts in a completion, tolerating surrounding text or code fences"""
+    match = re.search(r"\[.*\]", completion, re.DOTALL)
+    prompts = json.loads(match.group(0) if match else completion)
+    return [prompt for prompt in prompts if isinstance(prompt, str) and prompt.strip()]
+
+
+async def generate_images(script: str, work_dir: str) -> List[str]:
+    """Generate one image per scene of the script and download them; returns their paths"""
+    assert OPENAI_API_KEY is not None
+    image_prompts = parse_image_prompts(
+        await complete(
+            f'''Create a list of image prompts for a video based on the following script. Each prompt should describe a single image. Output the prompts as a JSON list of strings. For example: ["A person sitting at a computer.", "A group of people talking."]:
+
+{script}'''
+        )
+    )
+    print(f"Generated image prompts: {image_prompts}")
+
+    image_urls = await process_tasks(
+        prompts=image_prompts,
+        api_key=OPENAI_API_KEY,
+        base_url=None,
+        model=IMAGE_MODEL,
+    )
+    print(f"Generated image URLs: {image_urls}")
+
+    paths = await asyncio.gather(
+        *(
+            download_image(url, os.path.join(work_dir, f"image_{index}"))
+            for index, url in enumerate(image_urls)
+            if url
+        )
+    )
+    return list(paths)
+
+
+async def download_image(url: str, path_without_extension: str) -> str:
+    store = get_blob_store()
+    name = store.name_from_url(url) if store else None
+    stored_path = store.path_for(name) if store and name else None
+    extension = os.path.splitext(stored_path or url.split("?")[0])[1] or ".png"
+    path = path_without_extension + extension
+
+    if stored_path:
+        # Already in our own image store; no need to go through HTTP
+        await asyncio.to_thread(shutil.copyfile, stored_path, path)
+        return path
+
+    async with _get_client().stream("GET", url) as response:
+        response.raise_for_status()
+        data = await read_limited(response, MAX_IMAGE_BYTES)
+    await asyncio.to_thread(_write_file, path, data)
+    return path
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def synthesize_speech(script: str, audio_path: str) -> None:
+    gTTS(script).save(audio_path)
+
+
+def render_slideshow(image_paths: List[str], audio_path: str, output_path: str) -> str:
+    """Encode the images as equally long slides over the narration (runs in the process pool)"""
+    from moviepy.editor import AudioFileClip, ImageClip, concatenate_videoclips  # type: ignore
+
+    audio_clip = AudioFileClip(audio_path)
+    slide_duration = audio_clip.duration / len(image_paths)
+    clips = [ImageClip(path).set_duration(slide_duration) for path in image_paths]
+    video_clip = concatenate_videoclips(clips, method="compose").set_audio(audio_clip)
+    try:
+        video_clip.write_videofile(output_path, fps=24, logger=None)
+    finally:
+        video_clip.close()
+        audio_clip.close()
+    return output_path
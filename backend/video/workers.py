@@ -0,0 +1,68 @@
+"""
+Process pool for CPU-bound video work.
+
+Decoding frames and encoding JPEGs takes seconds per video. Run on the event
+loop it freezes every other request in the server worker, so it runs in a
+shared process pool instead. Each server worker also caps how many video
+requests it processes at once, so one busy worker can't monopolise the pool.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from config import VIDEO_MAX_CONCURRENT_JOBS, VIDEO_WORKER_PROCESSES
+
+T = TypeVar("T")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_job_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_video_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Spawn rather than fork: forking a process that runs threads
+        # (the event loop's executors, HTTP clients) can deadlock
+        _executor = ProcessPoolExecutor(
+            max_workers=VIDEO_WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_video_executor() -> None:
+    """Stop the worker processes (called on app shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+@asynccontextmanager
+async def video_job_slot() -> AsyncIterator[None]:
+    """Wait for one of this server worker's VIDEO_MAX_CONCURRENT_JOBS slots"""
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(VIDEO_MAX_CONCURRENT_JOBS)
+    async with _job_slots:
+        yield
+
+
+async def run_in_pool(fn: Callable[..., T], *args: object) -> T:
+    """Run a picklable function in the video process pool.
+
+    Cancelling the caller cancels the call if it hasn't started yet.
+    """
+    global _executor
+    executor = get_video_executor()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        if _executor is executor:
+            _executor = None
+        raise
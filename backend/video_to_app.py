@@ -117,4 +117,5 @@ async def main():
     subprocess.run(["osascript", "-e", 'display notification "Coding Complete"'])
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
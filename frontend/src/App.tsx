@@ -25,6 +25,7 @@ import StartPane from "./components/start-pane/StartPane";
 import { WebpageToVideoInput } from "./components/WebpageToVideoInput";
 import { Commit } from "./components/commits/types";
 import { createCommit } from "./components/commits/utils";
+import { uploadVideo } from "./lib/uploadVideo";
 import GenerateFromText from "./components/generate-from-text/GenerateFromText";
 
 // Import authentication components
@@ -200,7 +201,7 @@ function App() {
     }
   };
 
-  function doGenerateCode(params: CodeGenerationParams) {
+  async function doGenerateCode(params: CodeGenerationParams) {
     // CRITICAL: Always check authentication and credits regardless of environment
     if (!user) {
       toast.error("Please sign in to generate code");
@@ -257,6 +258,20 @@ function App() {
     addCommit(commit);
     setHead(commit.hash);
 
+    // Upload recordings separately instead of sending them in the WebSocket params
+    const videoDataUrl = params.prompt.images[0];
+    if (params.inputMode === "video" && videoDataUrl?.startsWith("data:")) {
+      try {
+        const videoAssetId = await uploadVideo(videoDataUrl);
+        updatedParams.prompt = { text: params.prompt.text, images: [], videoAssetId };
+      } catch (error) {
+        console.error("Error uploading video", error);
+        toast.error("Error uploading video. Please try again.");
+        cancelCodeGenerationAndReset(commit);
+        return;
+      }
+    }
+
     generateCode(wsRef, updatedParams, {
       onChange: (token, variantIndex) => {
         appendCommitCode(commit.hash, variantIndex, token);
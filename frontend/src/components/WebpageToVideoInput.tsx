@@ -1,14 +1,46 @@
-
 import { useState } from "react";
 import { HTTP_BACKEND_URL } from "../config";
 import { Button } from "./ui/button";
 import { Input } from "./ui/input";
 import { toast } from "react-hot-toast";
+import { useAuth } from "./auth/AuthContext";
+
+// How often to check on a running video job
+const POLL_INTERVAL_MS = 2000;
+
+type VideoJobStatus = {
+  jobId: string;
+  status: "queued" | "running" | "completed" | "failed";
+  step: string;
+  progress: number;
+  video_path: string | null;
+  error: string | null;
+};
+
+async function waitForVideoJob(
+  jobId: string,
+  onProgress: (job: VideoJobStatus) => void
+): Promise<VideoJobStatus> {
+  for (;;) {
+    const response = await fetch(`${HTTP_BACKEND_URL}/api/webpage-to-video/${jobId}`);
+    if (!response.ok) {
+      throw new Error(`Failed to get video status: ${response.status}`);
+    }
+    const job: VideoJobStatus = await response.json();
+    onProgress(job);
+    if (job.status === "completed" || job.status === "failed") {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+}
 
 export function WebpageToVideoInput() {
+  const { user } = useAuth();
   const [isLoading, setIsLoading] = useState(false);
   const [referenceUrl, setReferenceUrl] = useState("");
   const [videoUrl, setVideoUrl] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
 
   async function generateVideo() {
     if (!referenceUrl) {
@@ -24,6 +56,7 @@ export function WebpageToVideoInput() {
           method: "POST",
           body: JSON.stringify({
             url: referenceUrl,
+            userId: user?.id,
           }),
           headers: {
             "Content-Type": "application/json",
@@ -34,8 +67,14 @@ export function WebpageToVideoInput() {
           throw new Error("Failed to generate video");
         }
 
-        const res = await response.json();
-        setVideoUrl(`${HTTP_BACKEND_URL}/video/${res.video_path.split('/').pop()}`);
+        const { jobId } = await response.json();
+        const job = await waitForVideoJob(jobId, (job) =>
+          setProgress(`${job.step} (${Math.round(job.progress * 100)}%)`)
+        );
+        if (job.status === "failed" || !job.video_path) {
+          throw new Error(job.error || "Video generation failed");
+        }
+        setVideoUrl(`${HTTP_BACKEND_URL}/video/${job.video_path.split('/').pop()}`);
       } catch (error) {
         console.error(error);
         toast.error(
@@ -43,6 +82,7 @@ export function WebpageToVideoInput() {
         );
       } finally {
         setIsLoading(false);
+        setProgress(null);
       }
     }
   }
@@ -62,6 +102,7 @@ export function WebpageToVideoInput() {
       >
         {isLoading ? "Generating..." : "Generate Video"}
       </Button>
+      {progress && <div className="text-gray-500 text-sm">{progress}</div>}
 
       {videoUrl && (
         <div className="mt-4">
@@ -0,0 +1,38 @@
+import { HTTP_BACKEND_URL } from "../config";
+import { authenticatedFetch } from "../utils/authenticatedFetch";
+
+// Recordings are uploaded in chunks of this size
+const CHUNK_SIZE = 4 * 1024 * 1024;
+
+type VideoAssetResponse = {
+  assetId: string;
+  size: number;
+};
+
+async function postChunk(url: string, chunk: Blob): Promise<VideoAssetResponse> {
+  const response = await authenticatedFetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/octet-stream" },
+    body: chunk,
+  });
+  if (!response.ok) {
+    throw new Error(`Video upload failed: ${response.status} ${await response.text()}`);
+  }
+  return response.json();
+}
+
+// Uploads a recording (data URL) to the backend and returns its asset ID,
+// so the generation request doesn't have to carry the whole video
+export async function uploadVideo(videoDataUrl: string): Promise<string> {
+  const video = await (await fetch(videoDataUrl)).blob();
+  const baseUrl = `${HTTP_BACKEND_URL}/api/video-assets`;
+
+  const { assetId } = await postChunk(baseUrl, video.slice(0, CHUNK_SIZE));
+  for (let offset = CHUNK_SIZE; offset < video.size; offset += CHUNK_SIZE) {
+    await postChunk(
+      `${baseUrl}/${assetId}?offset=${offset}`,
+      video.slice(offset, offset + CHUNK_SIZE)
+    );
+  }
+  return assetId;
+}
@@ -34,6 +34,7 @@ export enum ScreenRecorderState {
 export interface PromptContent {
   text: string;
   images: string[]; // Array of data URLs
+  videoAssetId?: string; // Video mode: recording uploaded to /api/video-assets
 }
 
 export interface CodeGenerationParams {